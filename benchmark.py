@@ -0,0 +1,385 @@
+# benchmark.py
+
+import argparse
+import glob
+import json
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+import collect_dates
+from document import Document
+import fetch_playerstatistics
+import filter_urls
+import normalize_urls
+import requesting_urls
+import time_planner
+
+# Folders of recorded pages (get_html() output files) served by the FixtureServer. Later folders override earlier ones.
+FIXTURE_FOLDERS = ('requesting_urls', 'benchmark_fixtures')
+
+# The Wikipedia the fixtures are served as
+ORIGIN = 'https://en.wikipedia.org'
+
+# Urls of the pages the extraction entry points are timed on (synthetic, unless recorded in a fixture folder)
+EVENTS_URL = f'{ORIGIN}/wiki/2019%E2%80%9320_FIS_Alpine_Ski_World_Cup'
+PLAYOFFS_URL = f'{ORIGIN}/wiki/2020_NBA_playoffs'
+
+def load_pages(folder='requesting_urls'):
+    '''
+    Loads the html of the saved pages in a folder of get_html() output files (formatted as 'URL: <url>\\nTEXT:\\n<html>').
+
+    Args:
+        folder: (Optional) The folder of output files. Defaults to 'requesting_urls'.
+    Returns:
+        <Array<Tuple<String, String>>> pages:   A list of (url, html) tuples.
+    '''
+    pages = []
+    for path in sorted(glob.glob(f'./{folder}/*.txt')):
+        with open(path, encoding='utf-8') as f:
+            (header, _, html) = f.read().partition('\nTEXT:\n')
+        pages.append((header[len('URL: '):], html))
+    return pages
+
+def _four_pass_dates(html):
+    '''
+    Reference implementation of collect_dates.find_dates() as it was before the single-pass scanner:
+    one full pass over html per format, and regex based month and day formatting per match.
+    '''
+    months = {'January': '01', 'Jan': '01', 'February': '02', 'Feb': '02', 'March': '03', 'Mar': '03', 'April': '04', 'Apr': '04',
+              'May': '05', 'June': '06', 'Jun': '06', 'July': '07', 'Jul': '07', 'August': '08', 'Aug': '08',
+              'September': '09', 'Sep': '09', 'October': '10', 'Oct': '10', 'November': '11', 'Nov': '11', 'December': '12', 'Dec': '12'}
+    dates = []
+    for format in collect_dates.FORMATS:
+        for match in re.finditer(collect_dates._REGEXES[format], html, flags=re.VERBOSE):
+            (d, m, y) = match.group(f'{format}_d', f'{format}_m', f'{format}_y')
+            if re.match(r"\b\d{1}\b", m):
+                m = f'0{m}'
+            else:
+                m = re.compile('(' + '|'.join(months.keys()) + ')').sub(lambda n: months[n.group()], m)
+                if re.match(r"(?m)^[a-zA-Z]*$", m):
+                    continue
+            if d is None:
+                dates.append(f'{y}/{m}')
+            else:
+                if re.match(r"\b\d{1}\b", d):
+                    d = f'0{d}'
+                dates.append(f'{y}/{m}/{d}')
+    return dates
+
+def _per_url_sub(url, urls):
+    '''
+    Reference implementation of the relative url resolution in filter_urls.find_urls() as it was before normalize_urls:
+    one re.sub call per url, prefixing root-relative urls with the base url.
+    '''
+    baseurl = re.findall(r"^(.*://[A-Za-z0-9\-\.]+).*", url)[0]
+    urls = list(urls)
+    for i in range(len(urls)):
+        urls[i] = re.sub(r"^/", baseurl+'/', urls[i], flags=re.MULTILINE | re.VERBOSE)
+    return urls
+
+def _time(function, *args, repeat=5):
+    '''
+    Returns the best wall clock time in seconds of 'repeat' calls to function(*args).
+    '''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_dates(copies=4):
+    '''
+    Times collect_dates.find_dates() against the four-pass reference on a multi-megabyte page,
+    made by concatenating the saved pages 'copies' times. Checks that both give identical output.
+
+    Args:
+        copies: (Optional) The number of times to repeat the saved pages. Defaults to 4.
+    '''
+    html = ''.join(html for (_, html) in load_pages()) * copies
+    assert collect_dates.find_dates(html) == _four_pass_dates(html)
+
+    size = len(html.encode('utf-8')) / 1024 ** 2
+    reference = _time(_four_pass_dates, html)
+    scanner = _time(collect_dates.find_dates, html)
+    print(f'find_dates on {size:.1f} MB:')
+    print(f'  four-pass reference:  {reference * 1000:8.1f} ms  {size / reference:6.1f} MB/s')
+    print(f'  single-pass scanner:  {scanner * 1000:8.1f} ms  {size / scanner:6.1f} MB/s  ({reference / scanner:.1f}x)')
+
+def benchmark_urls():
+    '''
+    Times normalize_urls.resolve_urls() against the per-url re.sub reference on the links of the saved pages.
+    '''
+    pages = load_pages()
+    hrefs = [(url, filter_urls._REGEX_ALLURLS.findall(html)) for (url, html) in pages]
+    count = sum(len(urls) for (_, urls) in hrefs)
+
+    reference = _time(lambda: [_per_url_sub(url, urls) for (url, urls) in hrefs])
+    resolver = _time(lambda: [normalize_urls.resolve_urls(url, urls) for (url, urls) in hrefs])
+    print(f'url resolution of {count} links:')
+    print(f'  per-url re.sub reference:  {reference * 1000:8.2f} ms  {count / reference / 1000:7.1f} k urls/s')
+    print(f'  resolve_urls:              {resolver * 1000:8.2f} ms  {count / resolver / 1000:7.1f} k urls/s  ({reference / resolver:.1f}x)')
+
+def load_fixtures(folders=FIXTURE_FOLDERS):
+    '''
+    Loads the recorded pages to serve, keyed by the path (and query) of their url on ORIGIN.
+
+    Args:
+        folders:    (Optional) The folders of get_html() output files. Defaults to FIXTURE_FOLDERS.
+    Returns:
+        <Dict<String, bytes>> pages:    The html of each page, by path.
+    '''
+    pages = {}
+    for folder in folders:
+        for (url, html) in load_pages(folder):
+            (_, _, path, query, _) = urlsplit(url)
+            pages[path + (f'?{query}' if query else '')] = html.encode('utf-8')
+    return pages
+
+def _wiki_page(title, body):
+    '''
+    Returns a minimal Wikipedia style page, as bytes.
+    '''
+    return f'<!DOCTYPE html><html><head><meta charset="UTF-8"/><title>{title} - Wikipedia</title></head><body>{body}</body></html>'.encode('utf-8')
+
+def synthetic_fixtures(races=400, players=15):
+    '''
+    Builds deterministic stand-ins for the pages extract_events() and extract_teams() read, for when they are not recorded:
+    a World Cup calendar of 'races' races (venues spanning two races each), a playoff bracket of 8 teams,
+    a roster page per team and a statistics page per player.
+
+    Args:
+        races:      (Optional) The number of races in the calendar. Defaults to 400.
+        players:    (Optional) The number of players per team. Defaults to 15.
+    Returns:
+        <Dict<String, bytes>> pages:    The html of each page, by path.
+    '''
+    months = ['October', 'November', 'December', 'January', 'February', 'March']
+    disciplines = ['DH', 'SL', 'GS', 'SG', 'AC', 'PG']
+    rows = ['<tr><th>#</th><th>Event</th><th>Date</th><th>Venue</th><th>Type</th><th>Winner</th><th>Second</th><th>Third</th></tr>']
+    for race in range(races):
+        venue = f'<td rowspan="2"><a href="/wiki/Venue_{race // 2}">Venue {race // 2}</a></td>' if race % 2 == 0 else ''
+        podium = ''.join(f'<td><a href="/wiki/Skier_{(race * 3 + place) % 97}">Skier {(race * 3 + place) % 97}</a></td>' for place in range(3))
+        rows.append(f'<tr><th scope="row">{1600 + race}</th><td>{race + 1}</td><td>{race % 28 + 1} {months[race % 6]} {2019 + (race % 6 > 2)}</td>'
+                    f'{venue}<td>{disciplines[race % 6]}<small>{race:03d}</small></td>{podium}</tr>')
+    pages = {urlsplit(EVENTS_URL).path: _wiki_page('World Cup', f'<table class="wikitable plainrowheaders">{"".join(rows)}</table>')}
+
+    # Bracket rows 4, 6, 16, 18, 28, 30, 40 and 42 hold the teams of the conference semifinals
+    teams = {4: 0, 6: 1, 16: 2, 18: 3, 28: 4, 30: 5, 40: 6, 42: 7}
+    bracket = ''.join(f'<tr><td><a href="/wiki/Team_{teams[row]}">Team {teams[row]}</a></td></tr>' if row in teams else '<tr><td></td></tr>'
+                      for row in range(48))
+    pages[urlsplit(PLAYOFFS_URL).path] = _wiki_page('Playoffs', f'<table border="0" cellpadding="0" cellspacing="0">{bracket}</table>')
+
+    for team in range(8):
+        roster = ''.join(f'<tr><td>G</td><td>{number}</td><td><a href="/wiki/Player_{team}_{number}">Player {team}-{number}</a> (C)</td></tr>'
+                         for number in range(players))
+        pages[f'/wiki/Team_{team}'] = _wiki_page(f'Team {team}', f'<table class="toccolours"><caption>Roster listing\n</caption><tr><td>'
+                                                 f'<table class="sortable"><tr><th>Pos.</th><th>No.</th><th>Name</th></tr>{roster}</table></td></tr></table>')
+        for number in range(players):
+            seasons = ''.join(f'<tr><td><a href="/wiki/{year}">{year}</a></td>' + ''.join(f'<td>{(team + number + cell) % 30}.{cell}</td>' for cell in range(13)) + '</tr>'
+                              for year in ('2017–18', '2018–19', '2019–20'))
+            pages[f'/wiki/Player_{team}_{number}'] = _wiki_page(f'Player {team}-{number}', '<p>' + 'Career. ' * 2000 + '</p>'
+                                                                f'<table class="wikitable sortable">{seasons}</table>')
+    return pages
+
+class _StandInAdapter(HTTPAdapter):
+    '''
+    Transport adapter sending every request to the FixtureServer instead of ORIGIN, keeping the path and query.
+    '''
+    def __init__(self, base):
+        super().__init__()
+        self.base = base
+
+    def send(self, request, **kwargs):
+        request.url = self.base + request.path_url
+        return super().send(request, **kwargs)
+
+class FixtureServer:
+    '''
+    Local HTTP stand-in for Wikipedia. Serves pages by path from a thread, and reroutes requests to ORIGIN made over
+    the shared requesting_urls session to it, so the entry points fetch over real sockets with their real urls.
+    Use as a context manager.
+
+    Args:
+        pages:  The html of each page (bytes), by path (and query). A page may also be a function from the path and query
+                of a request to a (status, headers, body) tuple, answering each request (of any query) differently, e.g. as a flaky server.
+    '''
+    def __init__(self, pages):
+        self.pages = pages
+        self.served = 0
+        self.requests = []
+
+    def __enter__(self):
+        pages = self.pages
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                page = pages.get(self.path)
+                if page is None and callable(pages.get(self.path.split('?')[0])):
+                    # Functions answer every query of their path
+                    page = pages[self.path.split('?')[0]]
+                if callable(page):
+                    (status, headers, body) = page(self.path)
+                else:
+                    (status, headers, body) = (200 if page is not None else 404, {}, page or b'')
+                self.send_response(status)
+                headers = {'Content-Type': 'text/html; charset=UTF-8', **headers}
+                for (name, value) in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.served += len(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        requesting_urls.get_session().mount(f'{ORIGIN}/', _StandInAdapter(f'http://127.0.0.1:{self._server.server_port}'))
+        return self
+
+    def __exit__(self, *exc):
+        requesting_urls.get_session().adapters.pop(f'{ORIGIN}/', None)
+        self._server.shutdown()
+        self._server.server_close()
+
+def _measure(function, repeat):
+    '''
+    Returns the best wall clock time in seconds of 'repeat' calls to function(), and the peak of traced memory in bytes during one more call.
+    '''
+    seconds = _time(function, repeat=repeat)
+    tracemalloc.start()
+    try:
+        function()
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (seconds, peak)
+
+def run_suite(repeat=5):
+    '''
+    Times every extraction entry point offline, against the fixtures served by a FixtureServer.
+    For each entry point, records the best time, throughput (pages/s and MB/s of html), peak traced memory of the main process,
+    and the split of the time between fetching (get_html() of the same pages) and parsing (the entry point on pages already fetched).
+
+    Args:
+        repeat: (Optional) The number of timed runs of each entry point (the best is kept). Defaults to 5.
+    Returns:
+        <Dict<String, Dict>> results:   The metrics ('seconds', 'fetch_seconds', 'parse_seconds', 'pages_per_second', 'mb_per_second', 'peak_mb') by entry point.
+    '''
+    pages = synthetic_fixtures()
+    pages.update(load_fixtures())
+    recorded = [(f'{ORIGIN}{path}', html) for (path, html) in load_fixtures().items()]
+    playoffs = [f'{ORIGIN}{path}' for path in pages if path.startswith(('/wiki/Team_', '/wiki/Player_'))] + [PLAYOFFS_URL]
+
+    def fetch(urls):
+        return lambda: [requesting_urls.get_html(url) for url in urls]
+
+    def texts(items):
+        return [(url, html.decode('utf-8')) for (url, html) in items]
+
+    recordedTexts = texts(recorded)
+    # (fetch, parse, whole) functions and the pages each entry point reads
+    benchmarks = {
+        'find_urls': (None, lambda: [filter_urls.find_urls(url, html) for (url, html) in recordedTexts], None, recorded),
+        'find_dates': (None, lambda: [collect_dates.find_dates(html) for (_, html) in recordedTexts], None, recorded),
+        'find_articles': (fetch([url for (url, _) in recorded]),
+                          lambda: [filter_urls.find_articles(Document(url, html=html)) for (url, html) in recordedTexts],
+                          lambda: [filter_urls.find_articles(url) for (url, _) in recorded], recorded),
+        'extract_events': (fetch([EVENTS_URL]),
+                           lambda: time_planner.extract_events(Document(EVENTS_URL, content=pages[urlsplit(EVENTS_URL).path]), createSlip=False),
+                           lambda: time_planner.extract_events(EVENTS_URL, createSlip=False),
+                           [(EVENTS_URL, pages[urlsplit(EVENTS_URL).path])]),
+        'extract_teams': (fetch(playoffs), None,
+                          lambda: fetch_playerstatistics.extract_teams(PLAYOFFS_URL, plot=False),
+                          [(url, pages[urlsplit(url).path]) for url in playoffs]),
+    }
+
+    results = {}
+    with FixtureServer(pages):
+        for (name, (fetcher, parser, whole, items)) in benchmarks.items():
+            size = sum(len(html) for (_, html) in items) / 1024 ** 2
+            fetchSeconds = _time(fetcher, repeat=repeat) if fetcher is not None else 0.0
+            (seconds, peak) = _measure(whole or parser, repeat)
+            if whole is None:
+                parseSeconds = seconds
+            elif parser is not None:
+                parseSeconds = _time(parser, repeat=repeat)
+            else:
+                parseSeconds = max(seconds - fetchSeconds, 0.0)
+            results[name] = {'pages': len(items), 'mb': round(size, 3), 'seconds': seconds, 'fetch_seconds': fetchSeconds,
+                             'parse_seconds': parseSeconds, 'pages_per_second': len(items) / seconds, 'mb_per_second': size / seconds,
+                             'peak_mb': peak / 1024 ** 2}
+    return results
+
+def print_results(results):
+    '''
+    Prints the results of run_suite() as a table.
+    '''
+    print(f'{"entry point":<16}{"pages":>6}{"MB":>8}{"ms":>10}{"fetch ms":>10}{"parse ms":>10}{"pages/s":>10}{"MB/s":>8}{"peak MB":>9}')
+    for (name, r) in results.items():
+        print(f'{name:<16}{r["pages"]:>6}{r["mb"]:>8.2f}{r["seconds"] * 1000:>10.1f}{r["fetch_seconds"] * 1000:>10.1f}'
+              f'{r["parse_seconds"] * 1000:>10.1f}{r["pages_per_second"]:>10.1f}{r["mb_per_second"]:>8.1f}{r["peak_mb"]:>9.1f}')
+
+def compare(results, baseline, tolerance=0.25):
+    '''
+    Compares results against a baseline of earlier results, and returns the regressions:
+    entry points that got slower, or used more peak memory, by more than 'tolerance' (a fraction).
+
+    Args:
+        results:    The results of run_suite().
+        baseline:   Earlier results of run_suite() (e.g. loaded from a file saved with --save).
+        tolerance:  (Optional) The allowed relative increase. Defaults to 0.25.
+    Returns:
+        <Array<String>> regressions:    A description of each regression.
+    '''
+    regressions = []
+    for (name, result) in results.items():
+        if name not in baseline:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            (before, after) = (baseline[name][metric], result[metric])
+            if before > 0 and after > before * (1 + tolerance):
+                regressions.append(f'{name} {metric}: {before:.4g} -> {after:.4g} (+{(after / before - 1) * 100:.0f}%)')
+    return regressions
+
+def main(argv=None):
+    '''
+    Command line interface: runs the offline benchmark suite, and optionally saves the results or fails on regressions against a baseline.
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark the extraction entry points offline, against recorded and synthetic pages.')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='timed runs per entry point, the best is kept (default: 5)')
+    parser.add_argument('--save', help='JSON file to save the results to, as a baseline')
+    parser.add_argument('--compare', help='JSON file of baseline results to check for regressions against (exit status 1 on regression)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown or memory growth (default: 0.25)')
+    parser.add_argument('--reference', action='store_true', help='also compare find_dates and url resolution against their reference implementations')
+    args = parser.parse_args(argv)
+
+    if args.reference:
+        benchmark_dates()
+        benchmark_urls()
+
+    results = run_suite(repeat=args.repeat)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), tolerance=args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# cli.py
+
+import argparse
+import sys
+
+# Default pages of the commands that have one (as in the scripts)
+EVENTS_URL = 'https://en.wikipedia.org/wiki/2019%E2%80%9320_FIS_Alpine_Ski_World_Cup'
+PLAYOFFS_URL = 'https://en.wikipedia.org/wiki/2020_NBA_playoffs'
+
+# Commands that hand all their arguments to the main() of a module (see e.g. 'python corpus.py -h'), by the module name
+DELEGATED = {'corpus': 'corpus', 'crawl': 'crawler', 'benchmark': 'benchmark'}
+
+def _fetch(args):
+    '''
+    Prints (or saves) the html of a page.
+    '''
+    import requesting_urls
+    response = requesting_urls.get_html(args.url, output=args.output, saveToFolder=args.folder or 'requesting_urls')
+    if args.output is None:
+        sys.stdout.write(response.text)
+
+def _urls(args):
+    '''
+    Prints (or saves) the Wikipedia articles linked from a page.
+    '''
+    import filter_urls
+    articles = filter_urls.find_articles(args.url, output=args.output, saveToFolder=args.folder or 'filter_urls')
+    if args.output is None:
+        print('\n'.join(articles))
+
+def _dates(args):
+    '''
+    Prints (or saves) the dates found on a page.
+    '''
+    import collect_dates
+    import requesting_urls
+    dates = collect_dates.find_dates(requesting_urls.get_html(args.url).text, output=args.output, saveToFolder=args.folder or 'filter_dates_regex')
+    if args.output is None:
+        print('\n'.join(dates))
+
+def _events(args):
+    '''
+    Creates the betting slip of the events of a World Cup season.
+    '''
+    import time_planner
+    data = time_planner.extract_events(args.url, createSlip=False)
+    time_planner.createBettingSlip(data, output=args.output or 'betting_slip_empty.md', saveToFolder=args.folder or 'datetime_filter')
+
+def _calendar(args):
+    '''
+    Extracts the events of many World Cup seasons into one index, and exports the seasons that changed as calendar files.
+    '''
+    import time_planner
+    from event_calendar import CalendarExport
+    store = None
+    if not args.no_store:
+        from revision_store import RevisionStore
+        store = RevisionStore()
+    index = time_planner.extract_seasons(args.urls, maxWorkers=args.workers, store=store)
+    exported = CalendarExport(args.folder, formats=args.formats).export(index, force=args.force)
+    print(f'{len(index)} events in {len(index.seasons())} seasons, {len(exported)} seasons exported to {args.folder}', file=sys.stderr)
+
+def _nba(args):
+    '''
+    Extracts the statistics of the top players of the playoff teams, and plots them.
+    '''
+    import fetch_playerstatistics
+    store = None
+    if not args.no_store:
+        from revision_store import RevisionStore
+        store = RevisionStore()
+    fetch_playerstatistics.extract_teams(args.url, plot=not args.no_plot, showPlot=args.show, maxWorkers=args.workers, store=store)
+
+def _race(args):
+    '''
+    Prints a shortest path of links between two Wikipedia articles.
+    '''
+    import wiki_race_challenge
+    try:
+        path = wiki_race_challenge.race(args.start, args.goal)
+    except wiki_race_challenge.RaceError as error:
+        sys.exit(f'No path from {args.start} to {args.goal}: {error}')
+    if path is None:
+        print(f'No path from {args.start} to {args.goal}')
+    else:
+        print(f'Shortest path ({len(path) - 1} clicks):')
+        for url in path:
+            print(url)
+
+def _parser():
+    '''
+    Returns the argument parser of the commands. Only the module of the command that is run is imported.
+    '''
+    parser = argparse.ArgumentParser(prog='python -m cli', description='Fetch and extract data from Wikipedia pages.')
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--profile', action='store_true', help='print a per-stage time breakdown to stderr at the end')
+    common.add_argument('--cache', metavar='DIR', help='keep fetched pages in an on-disk cache in DIR, and reuse them on later runs')
+    common.add_argument('--cache-ttl', type=int, default=86400, metavar='SECONDS', help='seconds a cached page is used before it is revalidated (default: 86400)')
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('-o', '--output', help='file to save to, in the format of its extension (default: print)')
+    output.add_argument('-d', '--folder', help='folder to save the output file in')
+
+    for (name, function, help) in (('fetch', _fetch, 'print the html of a page'),
+                                   ('urls', _urls, 'list the Wikipedia articles linked from a page'),
+                                   ('dates', _dates, 'list the dates found on a page')):
+        command = commands.add_parser(name, parents=[common, output], help=help)
+        command.add_argument('url')
+        command.set_defaults(run=function)
+
+    command = commands.add_parser('events', parents=[common, output], help='create the betting slip of a World Cup season')
+    command.add_argument('url', nargs='?', default=EVENTS_URL)
+    command.set_defaults(run=_events)
+
+    command = commands.add_parser('calendar', parents=[common], help='export the events of many World Cup seasons as calendars')
+    command.add_argument('urls', nargs='*', default=[EVENTS_URL], metavar='url')
+    command.add_argument('-d', '--folder', default='datetime_filter/calendars', help='folder to export to (default: datetime_filter/calendars)')
+    command.add_argument('-f', '--formats', nargs='+', default=['.ics', '.csv'], help='extensions to export each season as (default: .ics .csv)')
+    command.add_argument('--force', action='store_true', help='export every season, instead of only the ones that changed since the last export')
+    command.add_argument('--no-store', action='store_true', help='fetch every page, instead of only the ones that changed since the last run')
+    command.add_argument('-w', '--workers', type=int, default=8, help='number of pages to fetch at once (default: 8)')
+    command.set_defaults(run=_calendar)
+
+    command = commands.add_parser('nba', parents=[common], help='plot the statistics of the top players of the playoff teams')
+    command.add_argument('url', nargs='?', default=PLAYOFFS_URL)
+    command.add_argument('--no-plot', action='store_true', help='do not create plots')
+    command.add_argument('--show', action='store_true', help='display the plots')
+    command.add_argument('--no-store', action='store_true', help='fetch every page, instead of only the ones that changed since the last run')
+    command.add_argument('-w', '--workers', type=int, default=8, help='number of pages to fetch and parse at once (default: 8)')
+    command.set_defaults(run=_nba)
+
+    command = commands.add_parser('race', parents=[common], help='find a shortest path of links between two articles')
+    command.add_argument('start')
+    command.add_argument('goal')
+    command.set_defaults(run=_race)
+
+    for (name, module) in DELEGATED.items():
+        commands.add_parser(name, add_help=False, help=f"see 'python {module}.py -h'")
+    return parser
+
+def main(argv=None):
+    '''
+    Command line interface of all the scripts: 'python -m cli <command> [arguments]'.
+    '''
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in DELEGATED:
+        import importlib
+        return importlib.import_module(DELEGATED[argv[0]]).main(argv[1:])
+
+    args = _parser().parse_args(argv)
+    if args.cache:
+        import requesting_urls
+        requesting_urls.enable_cache(args.cache, ttl=args.cache_ttl)
+    import instrumentation
+    with instrumentation.profiling(args.profile):
+        args.run(args)
+
+if __name__ == '__main__':
+    main()
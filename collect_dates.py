@@ -1,114 +1,184 @@
+import itertools
+import os
 import re
-import requesting_urls
+import sys
+from document import Document
+import instrumentation
+import output_writers
+
+# Date formats, in the order their matches are listed by find_dates()
+FORMATS = ('DMY', 'MDY', 'YMD', 'ISO')
+
+# Regex patterns for each format (verbose)
+_REGEXES = {
+        'DMY': r"\b(?:(?P<DMY_d>[1-9]|[12][\d]|3[01])[\ ])?(?P<DMY_m>[ADFJMOSN][aceopu][abceghilmnoprstuvy]{1,7})[\ ](?P<DMY_y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])\b",
+        'MDY': r"\b(?P<MDY_m>[ADFJMOSN][aceopu][abceghilmnoprstuvy]{1,7})(?:[\ ](?P<MDY_d>[1-9]|[12][\d]|3[01]))?[\,][\ ](?P<MDY_y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])\b",
+        'YMD': r"\b(?P<YMD_y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])[\ ](?P<YMD_m>[ADFJMOSN][aceopu][abceghilmnoprstuvy]{1,7})[\ ](?:(?P<YMD_d>[1-9]|[12][\d]|3[01]))\b",
+        'ISO': r"\b(?P<ISO_y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])[\-](?P<ISO_m>(?:0?[1-9])|(?:1[0-2]))[\-](?:(?P<ISO_d>0?[1-9]|[12][\d]|3[01]))\b"
+        }
+
+# Combined pattern, compiled once. It only stops at word boundaries where a date can start (a non-zero digit or a month-like word),
+# and tries every format there in an optional lookahead, so a single pass reports the matches of all formats.
+# The trailing conditionals reject positions where no format matched, so only actual dates reach Python.
+_SCANNER = re.compile(r"\b(?=[1-9]|[ADFJMOSN][aceopu][abceghilmnoprstuvy])"
+                      + ''.join(f"(?=(?P<{format}>{_REGEXES[format]}))?" for format in FORMATS)
+                      + ''.join(f"(?({format})|" for format in FORMATS) + "(?!)" + ")" * len(FORMATS),
+                      flags=re.VERBOSE)
+
+# Month names and abbreviations, and their two-digit month numbers
+_MONTHS = {
+    'January': '01', 'Jan': '01',
+    'February': '02', 'Feb': '02',
+    'March': '03', 'Mar': '03',
+    'April': '04', 'Apr': '04',
+    'May': '05',
+    'June': '06', 'Jun': '06',
+    'July': '07', 'Jul': '07',
+    'August': '08', 'Aug': '08',
+    'September': '09', 'Sep': '09',
+    'October': '10', 'Oct': '10',
+    'November': '11', 'Nov': '11',
+    'December': '12', 'Dec': '12'
+}
+_MONTHS_REGEX = re.compile(f'({ "|".join(_MONTHS.keys()) })')
+
+# Formatted month for each month string seen so far
+_month_cache = {}
+
+class DateMatch:
+    '''
+    A date found by scan_dates().
+
+    Attributes:
+        start:  The offset in the text where the match starts.
+        end:    The offset in the text where the match ends.
+        format: The format the date was written in ('DMY' | 'MDY' | 'YMD' | 'ISO').
+        date:   The date formatted as 'YYYY/MM/DD', or 'YYYY/MM' if the day is missing.
+    '''
+    __slots__ = ('start', 'end', 'format', 'date')
+
+    def __init__(self, start, end, format, date):
+        self.start = start
+        self.end = end
+        self.format = format
+        self.date = date
+
+    def __repr__(self):
+        return f'DateMatch({self.start}, {self.end}, {self.format!r}, {self.date!r})'
+
+def format_month(text):
+    '''
+    Takes a string of text and formats as a two-digit month number.
+    If no matches are found, the string remains the same.
+    If text is not a number or a month represtented as a dict key, it's a false positive case and None is returned.
+    Results are memoized, as the same few month strings make up almost all matches.
+
+    Args:
+        text:   The string to match and potentially substitute
+    Returns:
+        <String>:   The formatted string. None if false positive case.
+    '''
+    try:
+        return _month_cache[text]
+    except KeyError:
+        pass
+
+    # Add '0' at start if one-digit number
+    if len(text) == 1:
+        string = f'0{text}'
+    else:
+        # For each month name in text, look-up corresponding value in dictionary
+        string = _MONTHS_REGEX.sub(lambda m: _MONTHS[m.group()], text)
+
+        # If the string still has only word characters, it's a case of false positive. Return None
+        if string.isascii() and string.isalpha():
+            string = None
+
+    _month_cache[text] = string
+    return string
+
+def format_day(text):
+    '''
+    Takes a string of text and checks if it's a one-digit number.
+    Add '0' to start if match, else return the original.
+
+    Args:
+        text:   The string to match
+    Retruns:
+        <String>:   The formatted string
+    '''
+    if len(text) == 1:
+        return f'0{text}'
+    return text
+
+def scan_dates(html):
+    '''
+    Scans a string of html once, and returns all dates found in it in order of their position.
+    Within each format, matches never overlap, like repeated searches with that format's regex alone.
+    Matches of different formats may overlap.
+
+    Args:
+        html:   The string of html to search
+    Returns:
+        <Array<DateMatch>> matches: The dates found, with their offsets and format.
+    '''
+    matches = []
+    # Offset where the previous match of each format ended
+    ends = dict.fromkeys(FORMATS, 0)
+
+    with instrumentation.stage('find_dates.scan'):
+        for candidate in _SCANNER.finditer(html):
+            for format in FORMATS:
+                start = candidate.start(format)
+                if start < 0 or start < ends[format]:
+                    continue
+                end = candidate.end(format)
+                ends[format] = end
+
+                (d, m, y) = candidate.group(f'{format}_d', f'{format}_m', f'{format}_y')
+                m = format_month(m)
+                if m is None:
+                    continue
+                if d is None:
+                    date = f'{y}/{m}'
+                else:
+                    date = f'{y}/{m}/{format_day(d)}'
+                matches.append(DateMatch(start, end, format, date))
+
+    instrumentation.observe('find_dates.matches', len(matches))
+    return matches
 
 def find_dates(html, output=None, saveToFolder='filter_dates_regex'):
     '''
     Receives a string of html and returns a list of all dates found in the text.
+    Dates are listed by format (DMY, MDY, YMD, then ISO), and in order of position within each format.
     If argument 'output' is specified, the list will be saved to a text file with a specified name output.txt.
+    Other extensions of output save one {'index', 'date'} record per date in that format instead (see output_writers), e.g. 'output.csv'.
+    If html is a Document, its (memoized) dates are used.
 
     Args:
-        html:           The string of html to search
+        html:           The string of html to search, or a Document
         output:         (Optional) The filename (format as 'output.txt') for where to save the list. Defaults to None.
         saveToFolder:   (Optional) The folder for where to save the output file. Defaults to 'filter_dates_regex'
     Returns:
         <Array> dates:  A list of date items, where each item is a string formatted as 'YYYY/MM/DD'
     '''
-    # List to hold matches
-    matches = []
-
-    # List to hold formatted dates
-    dates = []
-
-    # Regex patterns
-    regexes = {
-            'DMY': r"(?xm)\b(?:(?P<d>[1-9]|[12][\d]|3[01])[\ ])?(?P<m>[ADFJMOSN][aceopu][abceghilmnoprstuvy]{1,7})[\ ](?P<y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])\b",
-            'MDY': r"(?x)\b(?P<m>[ADFJMOSN][aceopu][abceghilmnoprstuvy]{1,7})(?:[\ ](?P<d>[1-9]|[12][\d]|3[01]))?[\,][\ ](?P<y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])\b",
-            'YMD': r"(?x)\b(?P<y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])[\ ](?P<m>[ADFJMOSN][aceopu][abceghilmnoprstuvy]{1,7})[\ ](?:(?P<d>[1-9]|[12][\d]|3[01]))\b",
-            'ISO': r"(?x)\b(?P<y>[1-9][\d]{2,3}|[4-9][\d]|3[2-9])[\-](?P<m>(?:0?[1-9])|(?:1[0-2]))[\-](?:(?P<d>0?[1-9]|[12][\d]|3[01]))\b"
-            }
-
-    # Use regex to search for matches and append to dates list
-    for format in regexes:
-        r = re.compile(regexes[format])
-        for match in r.finditer(html):
-            matches.append(match.groupdict())
-
-    def format_month(text):
-        '''
-        Takes a string of text and formats as a two-digit month number.
-        If no matches are found, the string remains the same.
-        If text is not a number or a month represtented as a dict key, it's a false positive case and None is returned.
-
-        Args:
-            text:   The string to match and potentially substitute
-        Returns:
-            <String>:   The formatted string. None if false positive case.
-        '''
-        # Add '0' at start if one-digit number, then return
-        if re.match(r"\b\d{1}\b", text):
-            return f'0{text}'
-
-        # Dict of expressions to match and corresponding substitute strings
-        dict = {
-            'January': '01', 'Jan': '01',
-            'February': '02', 'Feb': '02',
-            'March': '03', 'Mar': '03',
-            'April': '04', 'Apr': '04',
-            'May': '05',
-            'June': '06', 'Jun': '06',
-            'July': '07', 'Jul': '07',
-            'August': '08', 'Aug': '08',
-            'September': '09', 'Sep': '09',
-            'October': '10', 'Oct': '10',
-            'November': '11', 'Nov': '11',
-            'December': '12', 'Dec': '12'
-        }
-        # Create a regular expression  from the dictionary keys
-        regex = re.compile(f'({ "|".join(dict.keys()) })')
-
-        # For each match, look-up corresponding value in dictionary
-        string = regex.sub(lambda m: dict[m.string[m.start():m.end()]], text)
-
-        # If the string still has word characters, it's a case of false positive. Return None
-        if re.match(r"(?m)^[a-zA-Z]*$", string):
-            return None
-
-        return string
-
-    def format_day(text):
-        '''
-        Takes a string of text and uses regex to check if it's a one-digit number.
-        Add '0' to start if match, else return the original.
-
-        Args:
-            text:   The string to match
-        Retruns:
-            <String>:   The formatted string
-        '''
-        # Add '0' at start if one-digit number
-        if re.match(r"\b\d{1}\b", text):
-            return f'0{text}'
-        return text
-
-    # Format date strings as YYYY/MM[/DD]
-    for match in matches:
-        (d, m, y) = (match['d'], match['m'], match['y'])
-        m = format_month(m)
-        if m is not None:
-            if d is None:
-                dates.append( f'{y}/{m}' )
-            else:
-                d = format_day(d)
-                dates.append( f'{y}/{m}/{d}' )
-
+    if isinstance(html, Document):
+        dates = html.dates
+    else:
+        matches = scan_dates(html)
 
+        # Group the dates by format, keeping the order of position within each format
+        dates = {format: [] for format in FORMATS}
+        for match in matches:
+            dates[match.format].append(match.date)
+        dates = [date for format in FORMATS for date in dates[format]]
 
     # Write to file if output is specified
     if output is not None:
-        with open (f'./{saveToFolder}/{output}', 'w', encoding='utf-8') as f:
-            f.write('DATES ON PAGE:\n\n')
-            for index, line in enumerate(dates):
-                f.write(f'{index+1}) {line}\n')
+        lines = itertools.chain(['DATES ON PAGE:', ''], (f'{index+1}) {line}' for index, line in enumerate(dates)))
+        records = ({'index': index + 1, 'date': line} for index, line in enumerate(dates))
+        output_writers.save(os.path.join(saveToFolder, output), lines, records)
 
 
     # Always return dates list
@@ -124,10 +194,12 @@ def test():
             ['https://en.wikipedia.org/wiki/Richard_Feynman', 'Richard_Feynman_output.txt'],
             ['https://en.wikipedia.org/wiki/Hans_Rosling', 'Hans_Rosling_output.txt']]
 
+    import requesting_urls
     for test in tests:
         html = requesting_urls.get_html(test[0]).text
         output = test[1]
         find_dates(html, output=output)
 
 if __name__ == '__main__':
-    test()
+    with instrumentation.profiling('--profile' in sys.argv):
+        test()
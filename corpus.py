@@ -0,0 +1,153 @@
+# corpus.py
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import threading
+from urllib.parse import quote
+import collect_dates
+import filter_urls
+import instrumentation
+import output_writers
+
+# File extensions of saved pages in a corpus directory or tarball
+EXTENSIONS = ('.txt', '.html', '.htm')
+
+def iter_corpus(path):
+    '''
+    Yields the saved pages of a corpus, which is either a directory (searched recursively) or a tarball (optionally compressed).
+    Pages in a directory are yielded as paths, to be read by the worker; pages in a tarball are read here, as tarballs can only be read in order.
+
+    Args:
+        path:   The corpus directory or tarball.
+    Yields:
+        <Tuple<String, String, bytes>> (source, filepath, content): The name of the page in the corpus, and either its path or its content.
+    '''
+    if os.path.isdir(path):
+        for (root, dirs, files) in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(EXTENSIONS):
+                    filepath = os.path.join(root, name)
+                    yield (os.path.relpath(filepath, path), filepath, None)
+    else:
+        with tarfile.open(path) as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith(EXTENSIONS):
+                    yield (member.name, None, tar.extractfile(member).read())
+
+def read_page(source, content, baseUrl):
+    '''
+    Decodes a saved page, and finds its url.
+    Pages saved by requesting_urls.get_html() (formatted as 'URL: <url>\\nTEXT:\\n<html>') carry their url,
+    other pages get the url baseUrl + their file name (without extension).
+
+    Args:
+        source:     The name of the page in the corpus.
+        content:    The saved page, as bytes.
+        baseUrl:    The url to prefix file names with.
+    Returns:
+        <Tuple<String, String>> (url, html):    The url and html of the page.
+    '''
+    text = content.decode('utf-8', errors='replace')
+    if text.startswith('URL: '):
+        (header, separator, html) = text.partition('\nTEXT:\n')
+        if separator:
+            return (header[len('URL: '):].strip(), html)
+    name = os.path.splitext(os.path.basename(source))[0]
+    return (baseUrl + quote(name), text)
+
+def process_page(task):
+    '''
+    Extracts the Wikipedia articles (as filter_urls.find_articles()) and dates (as collect_dates.find_dates()) of one saved page.
+    Module level, so it can run on a process pool.
+
+    Args:
+        task:   A (source, filepath, content, baseUrl) tuple; content is read from filepath if None.
+    Returns:
+        <Dict> record:  The page's {'source', 'url', 'articles', 'dates'}, or {'source', 'error'} if the page could not be read.
+    '''
+    (source, filepath, content, baseUrl) = task
+    try:
+        if content is None:
+            with open(filepath, 'rb') as f:
+                content = f.read()
+        (url, html) = read_page(source, content, baseUrl)
+        articles = filter_urls.filter_articles(filter_urls.find_urls(url, html))
+        dates = collect_dates.find_dates(html)
+    except Exception as error:
+        return {'source': source, 'error': repr(error)}
+    return {'source': source, 'url': url, 'articles': articles, 'dates': dates}
+
+def process_corpus(path, workers=None, chunkSize=8, baseUrl='https://en.wikipedia.org/wiki/'):
+    '''
+    Extracts the Wikipedia articles and dates of every page in a corpus, on a process pool using all CPU cores.
+    Pages are sent to the workers in chunks of chunkSize by one streaming imap over the corpus, so workers never wait for a batch to drain.
+    The pool reads ahead of the records consumed by at most workers * chunkSize * 4 pages, so memory stays flat on corpora of any size.
+    Records are yielded in corpus order as they complete.
+
+    Args:
+        path:       The corpus directory or tarball.
+        workers:    (Optional) The number of worker processes. Defaults to None (the number of CPUs).
+        chunkSize:  (Optional) The number of pages sent to a worker at a time. Defaults to 8.
+        baseUrl:    (Optional) The url to prefix file names of pages without a saved url with. Defaults to 'https://en.wikipedia.org/wiki/'.
+    Yields:
+        <Dict> record:  Each page's {'source', 'url', 'articles', 'dates'} (see process_page()).
+    '''
+    workers = workers or os.cpu_count() or 1
+    # One slot per page read ahead: taken when the pool reads a page, given back when its record is consumed
+    slots = threading.Semaphore(workers * chunkSize * 4)
+    stopped = threading.Event()
+
+    def tasks():
+        for (source, filepath, content) in iter_corpus(path):
+            slots.acquire()
+            if stopped.is_set():
+                return
+            yield (source, filepath, content, baseUrl)
+
+    with multiprocessing.Pool(workers) as pool:
+        try:
+            for record in pool.imap(process_page, tasks(), chunksize=chunkSize):
+                slots.release()
+                yield record
+        finally:
+            # Wakes the pool's reader if it waits for a slot, so the pool can shut down when the records are not all consumed
+            stopped.set()
+            slots.release()
+
+def main(argv=None):
+    '''
+    Command line interface: extracts the articles and dates of every page in a corpus, and writes one record per page (JSONL, or the format of --output).
+    '''
+    parser = argparse.ArgumentParser(description='Extract Wikipedia articles and dates from a directory or tarball of saved html pages.')
+    parser.add_argument('path', help='corpus directory or tarball')
+    parser.add_argument('-o', '--output', help='file to write, in the format of its extension, e.g. pages.jsonl.gz (default: JSONL to stdout)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=8, help='pages sent to a worker at a time (default: 8)')
+    parser.add_argument('--base-url', default='https://en.wikipedia.org/wiki/', help='url prefix for pages without a saved url')
+    parser.add_argument('--profile', action='store_true', help='print a per-stage time breakdown to stderr at the end')
+    args = parser.parse_args(argv)
+
+    sink = output_writers.open_sink(args.output) if args.output else None
+    with instrumentation.profiling(args.profile), (sink or contextlib.nullcontext()):
+        (pages, errors, articles, dates) = (0, 0, 0, 0)
+        for record in process_corpus(args.path, workers=args.workers, chunkSize=args.chunk_size, baseUrl=args.base_url):
+            if sink is None:
+                sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+            else:
+                sink.write(record)
+            pages += 1
+            if 'error' in record:
+                errors += 1
+            else:
+                articles += len(record['articles'])
+                dates += len(record['dates'])
+        print(f'{pages} pages, {errors} errors, {articles} articles, {dates} dates', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
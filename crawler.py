@@ -0,0 +1,263 @@
+# crawler.py
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests as req
+import filter_urls
+import instrumentation
+import output_writers
+import requesting_urls
+
+class BloomFilter:
+    '''
+    Memory bounded set of strings with no false negatives, and false positives at about 'errorRate' while at most 'capacity' strings are added.
+    The bits live in one bytearray, and each string sets 'hashes' bits derived from a single blake2b digest (double hashing).
+
+    Args:
+        capacity:   The number of strings the filter is sized for.
+        errorRate:  (Optional) The false positive rate at capacity. Defaults to 0.001.
+    '''
+    def __init__(self, capacity, errorRate=0.001):
+        self.capacity = capacity
+        self.errorRate = errorRate
+        self.size = max(8, int(-capacity * math.log(errorRate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        '''
+        Returns the bit positions of a string.
+        '''
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        (h1, h2) = (int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1)
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        '''
+        Adds a string to the filter.
+        '''
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def save(self, path):
+        '''
+        Saves the bits of the filter to a file.
+        '''
+        temp = f'{path}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(self.bits)
+        os.replace(temp, path)
+
+    def load(self, path):
+        '''
+        Loads the bits saved with save() by a filter of the same size. Returns whether the file could be loaded.
+        '''
+        try:
+            with open(path, 'rb') as f:
+                bits = f.read()
+        except OSError:
+            return False
+        if len(bits) != len(self.bits):
+            return False
+        self.bits = bytearray(bits)
+        return True
+
+class Crawler:
+    '''
+    Crawls outward from seed urls over the Wikipedia articles linked from each page (as filter_urls.find_articles()), up to a depth limit.
+    Pages are taken from a priority frontier (lowest priority first, breadth first by default) in batches, which are fetched concurrently.
+    Every url ever queued is deduplicated through an in-memory BloomFilter backed by an exact set on disk (sqlite),
+    so memory stays bounded on crawls of millions of urls: the Bloom filter answers for unseen urls, which are inserted without a lookup,
+    and only its positives are looked up on disk.
+    The frontier and the seen set live in 'directory', and are committed after every batch, so a crawl that stops (or crashes)
+    resumes where it left off when a Crawler is created on the same directory. Pages of an unfinished batch are crawled again on resume.
+    The Bloom filter is only saved by close(), with the size of the seen set it covers; if the crawl stopped without closing,
+    the saved filter is stale and is rebuilt from the seen set instead.
+
+    Args:
+        directory:  The folder to keep the crawl state in.
+        maxDepth:   (Optional) The number of links to follow from the seeds. Defaults to 2.
+        priority:   (Optional) A function (url, depth) -> number ordering the frontier, lowest first. Defaults to None (the depth).
+        capacity:   (Optional) The number of urls the Bloom filter is sized for. Defaults to 10 million (about 18 MiB).
+        errorRate:  (Optional) The false positive rate of the Bloom filter at capacity. Defaults to 0.001.
+        batchSize:  (Optional) The number of pages taken from the frontier at a time. Defaults to 64.
+        maxWorkers: (Optional) The number of pages to fetch at once. Defaults to 8.
+    '''
+    def __init__(self, directory, maxDepth=2, priority=None, capacity=10 ** 7, errorRate=0.001, batchSize=64, maxWorkers=8):
+        self.directory = directory
+        self.maxDepth = maxDepth
+        self.priority = priority or (lambda url, depth: depth)
+        self.batchSize = batchSize
+        self.maxWorkers = maxWorkers
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'crawl.sqlite'))
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS frontier (id INTEGER PRIMARY KEY, priority REAL, depth INTEGER, url TEXT);
+            CREATE INDEX IF NOT EXISTS frontier_priority ON frontier (priority, id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+        ''')
+
+        # Size the Bloom filter as when the crawl was started, and rebuild it from the seen set unless it was saved with all of the seen set in it
+        meta = dict(self._db.execute('SELECT key, value FROM meta'))
+        self.bloom = BloomFilter(meta.get('capacity', capacity), meta.get('errorRate', errorRate))
+        self._db.executemany('INSERT OR IGNORE INTO meta VALUES (?, ?)', (('capacity', self.bloom.capacity), ('errorRate', self.bloom.errorRate)))
+        self._db.commit()
+        (seen,) = self._db.execute('SELECT COUNT(*) FROM seen').fetchone()
+        if meta.get('bloomSeen') != seen or not self.bloom.load(self._bloom_path()):
+            for (url,) in self._db.execute('SELECT url FROM seen'):
+                self.bloom.add(url)
+
+    def _bloom_path(self):
+        '''
+        Returns the path of the Bloom filter checkpoint.
+        '''
+        return os.path.join(self.directory, 'bloom.bin')
+
+    def __len__(self):
+        '''
+        Returns the number of pages left in the frontier.
+        '''
+        return self._db.execute('SELECT COUNT(*) FROM frontier').fetchone()[0]
+
+    def seen(self, url):
+        '''
+        Returns whether url has been queued by the crawl.
+        '''
+        return url in self.bloom and self._db.execute('SELECT 1 FROM seen WHERE url = ?', (url,)).fetchone() is not None
+
+    def add(self, url, depth=0):
+        '''
+        Queues url at the given depth, unless it has been queued before. Takes effect at the next checkpoint.
+
+        Args:
+            url:    The url to crawl.
+            depth:  (Optional) The number of links followed to reach url. Defaults to 0 (a seed).
+        Returns:
+            <bool>: Whether url was queued.
+        '''
+        # Urls not in the Bloom filter are new (it holds every url of the seen set), and only its positives need the lookup of the insert
+        if url in self.bloom:
+            if self._db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (url,)).rowcount == 0:
+                return False
+        else:
+            self._db.execute('INSERT INTO seen VALUES (?)', (url,))
+        self.bloom.add(url)
+        self._db.execute('INSERT INTO frontier (priority, depth, url) VALUES (?, ?, ?)', (self.priority(url, depth), depth, url))
+        return True
+
+    def checkpoint(self):
+        '''
+        Commits the frontier and the seen set to disk. The Bloom filter is not saved (see close()), as it can be rebuilt from the seen set.
+        '''
+        self._db.commit()
+
+    def close(self):
+        '''
+        Checkpoints the crawl, saves the Bloom filter with the size of the seen set it holds, and closes the crawl state.
+        '''
+        self.checkpoint()
+        self.bloom.save(self._bloom_path())
+        (seen,) = self._db.execute('SELECT COUNT(*) FROM seen').fetchone()
+        self._db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('bloomSeen', seen))
+        self._db.commit()
+        self._db.close()
+
+    def _fetch(self, url):
+        '''
+        Fetches the Wikipedia articles linked from a page, without duplicates. Returns None if the page could not be fetched.
+        '''
+        try:
+            response = requesting_urls.get_html(url)
+        except req.exceptions.RequestException:
+            return None
+        if not response.ok:
+            return None
+        return list(dict.fromkeys(filter_urls.filter_articles(filter_urls.find_urls(url, response.text))))
+
+    def crawl(self, seeds=(), maxPages=None):
+        '''
+        Crawls from the seeds (and whatever is left in the frontier from before), and yields every page crawled.
+        Links found on pages at maxDepth are not followed.
+
+        Args:
+            seeds:      (Optional) The urls to start from. Defaults to () (only resume).
+            maxPages:   (Optional) The maximum number of pages to crawl in this call. Defaults to None (until the frontier is empty).
+        Yields:
+            <Tuple<String, int, Array<String>>> (url, depth, articles): A crawled page, its depth, and the articles linked from it (None if the page could not be fetched).
+        '''
+        for seed in seeds:
+            self.add(seed)
+        self.checkpoint()
+
+        crawled = 0
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            while maxPages is None or crawled < maxPages:
+                limit = self.batchSize if maxPages is None else min(self.batchSize, maxPages - crawled)
+                batch = self._db.execute('SELECT id, depth, url FROM frontier ORDER BY priority, id LIMIT ?', (limit,)).fetchall()
+                if not batch:
+                    break
+
+                futures = {executor.submit(self._fetch, url): (depth, url) for (_, depth, url) in batch}
+                for future in as_completed(futures):
+                    (depth, url) = futures[future]
+                    articles = future.result()
+                    if articles is not None and depth < self.maxDepth:
+                        for article in articles:
+                            self.add(article, depth + 1)
+                    yield (url, depth, articles)
+
+                self._db.executemany('DELETE FROM frontier WHERE id = ?', ((id,) for (id, _, _) in batch))
+                self.checkpoint()
+                crawled += len(batch)
+
+def main(argv=None):
+    '''
+    Command line interface: crawls from seed urls, and writes one record per page crawled (JSONL, or the format of --output).
+    Running it again with the same state folder resumes the crawl.
+    '''
+    parser = argparse.ArgumentParser(description='Crawl Wikipedia articles outward from seed urls, resumably.')
+    parser.add_argument('seeds', nargs='*', help='urls to start from (none to resume)')
+    parser.add_argument('-s', '--state', default='crawler', help='folder to keep the crawl state in (default: crawler)')
+    parser.add_argument('-d', '--depth', type=int, default=2, help='number of links to follow from the seeds (default: 2)')
+    parser.add_argument('-n', '--max-pages', type=int, default=None, help='maximum number of pages to crawl (default: no limit)')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='number of pages to fetch at once (default: 8)')
+    parser.add_argument('-o', '--output', help='file to append to, in the format of its extension, e.g. crawl.jsonl.gz (default: JSONL to stdout)')
+    parser.add_argument('--profile', action='store_true', help='print a per-stage time breakdown to stderr at the end')
+    parser.add_argument('--cache', metavar='DIR', help='keep fetched pages in an on-disk cache in DIR, and reuse them on later crawls')
+    parser.add_argument('--cache-ttl', type=int, default=86400, metavar='SECONDS', help='seconds a cached page is used before it is revalidated (default: 86400)')
+    args = parser.parse_args(argv)
+    if args.cache:
+        requesting_urls.enable_cache(args.cache, ttl=args.cache_ttl)
+
+    with instrumentation.profiling(args.profile):
+        crawler = Crawler(args.state, maxDepth=args.depth, maxWorkers=args.workers)
+        sink = output_writers.open_sink(args.output, append=True) if args.output else None
+        (pages, remaining) = (0, 0)
+        try:
+            for (url, depth, articles) in crawler.crawl(args.seeds, maxPages=args.max_pages):
+                record = {'url': url, 'depth': depth, 'articles': articles}
+                if sink is None:
+                    sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+                else:
+                    sink.write(record)
+                pages += 1
+            remaining = len(crawler)
+        finally:
+            # The records are kept even if the crawl stops half way: the crawl state keeps those pages as crawled, so a resumed crawl does not write them again
+            if sink is not None:
+                sink.close()
+            crawler.close()
+        print(f'{pages} pages crawled, {remaining} left in the frontier', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# document.py
+
+from functools import cached_property
+import instrumentation
+
+class Document:
+    '''
+    A page that is fetched once, and parsed into each view (lxml tree, BeautifulSoup tree, text, links, articles, dates) on first access.
+    Every view is memoized, so tools that share a Document share the fetch and the parsing.
+    filter_urls.find_urls(), filter_urls.find_articles(), collect_dates.find_dates(), time_planner.extract_events()
+    and fetch_playerstatistics.extract_teams() all accept a Document in place of their url or html argument.
+    A Document can also be made from html that is already at hand, in which case nothing is fetched.
+
+    Args:
+        url:        The url of the page.
+        params:     (Optional) Parameters to pass to the get request. Defaults to None.
+        html:       (Optional) The html of the page as a string, if already fetched. Defaults to None.
+        content:    (Optional) The html of the page as bytes, if already fetched. Defaults to None.
+    '''
+    def __init__(self, url, params=None, html=None, content=None):
+        self.url = url
+        self.params = params
+        # Html given as a string is encoded here as utf-8, which lxml cannot tell from the bytes without a <meta charset>
+        self._encoding = 'utf-8' if html is not None and content is None else None
+        if html is not None:
+            self.text = html
+        if content is not None:
+            self.content = content
+
+    def __repr__(self):
+        return f'Document({self.url!r})'
+
+    @cached_property
+    def response(self):
+        '''
+        The response of the request on the url.
+        '''
+        import requesting_urls
+        return requesting_urls.get_html(self.url, params=self.params)
+
+    @cached_property
+    def content(self):
+        '''
+        The raw html of the page, as bytes.
+        '''
+        if 'text' in self.__dict__:
+            return self.text.encode('utf-8')
+        return self.response.content
+
+    @cached_property
+    def text(self):
+        '''
+        The decoded html of the page, as a string.
+        '''
+        if 'content' in self.__dict__ and 'response' not in self.__dict__:
+            return self.content.decode('utf-8', errors='replace')
+        return self.response.text
+
+    @cached_property
+    def tree(self):
+        '''
+        The lxml html tree of the page. The bytes are parsed in the encoding of the response (or of the html given), so lxml does not detect it.
+        '''
+        import lxml.html
+        content = self.content
+        encoding = self.response.encoding if 'response' in self.__dict__ else self._encoding
+        parser = lxml.html.HTMLParser(encoding=encoding) if encoding is not None else None
+        with instrumentation.stage('parse.lxml'):
+            return lxml.html.document_fromstring(content, parser=parser)
+
+    @cached_property
+    def soup(self):
+        '''
+        The BeautifulSoup tree of the page (parsed with lxml).
+        '''
+        from bs4 import BeautifulSoup
+        content = self.content
+        with instrumentation.stage('parse.soup'):
+            return BeautifulSoup(content, 'lxml')
+
+    @cached_property
+    def links(self):
+        '''
+        All urls found on the page (see filter_urls.find_urls()). Searched in the raw bytes unless the page was already decoded.
+        '''
+        import filter_urls
+        if 'text' not in self.__dict__:
+            content = self.content
+            if 'response' not in self.__dict__:
+                return filter_urls.find_urls(self.url, content)
+            import requesting_urls
+            if requesting_urls.ascii_compatible(self.response.encoding):
+                return filter_urls.find_urls(self.url, content, self.response.encoding)
+        return filter_urls.find_urls(self.url, self.text)
+
+    @cached_property
+    def articles(self):
+        '''
+        The urls to Wikipedia articles found on the page (see filter_urls.find_articles()).
+        '''
+        import filter_urls
+        return filter_urls.filter_articles(self.links)
+
+    @cached_property
+    def dates(self):
+        '''
+        The dates found on the page, formatted as 'YYYY/MM/DD' (see collect_dates.find_dates()).
+        '''
+        import collect_dates
+        return collect_dates.find_dates(self.text)
@@ -0,0 +1,298 @@
+# event_calendar.py
+
+import datetime
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+import output_writers
+
+# An event of a season: its day (datetime.date), venue, discipline (e.g. 'DH') and the season (page title) it is from.
+# Events sort by day, then venue, discipline and season.
+Event = namedtuple('Event', ['date', 'venue', 'discipline', 'season'])
+
+# Name of the file CalendarExport keeps the digest of each exported season in
+MANIFEST = 'manifest.json'
+
+# Maximum length of an iCalendar content line, in octets (RFC 5545), before it is folded
+_ICS_LINE_OCTETS = 75
+
+# Characters escaped in iCalendar text values
+_REGEX_ICS_ESCAPE = re.compile(r"([\\;,])")
+
+# Characters replaced in season names to make file names
+_REGEX_FILENAME = re.compile(r"[^\w]+")
+
+def _filename(season):
+    '''
+    Returns the file name (without extension) of a season. A name that had characters replaced ends in a short hash of the season,
+    so seasons differing only in those characters (e.g. '2019–20' and '2019-20') get different files.
+    '''
+    name = _REGEX_FILENAME.sub('_', season).strip('_')
+    if name == season:
+        return name
+    return f"{name or 'season'}-{hashlib.blake2b(season.encode('utf-8'), digest_size=4).hexdigest()}"
+
+def _extension(path):
+    '''
+    Returns the extension of a path, past any compression suffix (e.g. '.ics' for 'calendar.ics.gz').
+    '''
+    (root, extension) = os.path.splitext(path)
+    if output_writers.output_format(path)[1] is not None:
+        extension = os.path.splitext(root)[1]
+    return extension.lower()
+
+def _day(value):
+    '''
+    Returns a date or datetime as a date, so it compares with the days of events.
+    '''
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+class EventIndex:
+    '''
+    In-memory index of the events of many seasons, sorted by day and without duplicates.
+    Range queries bisect the sorted days, and lookups by venue, discipline or season bisect a sorted sub-index,
+    built on the first lookup of that key and kept until the events change.
+
+    Args:
+        events: (Optional) The Events to start with. Defaults to ().
+    '''
+    def __init__(self, events=()):
+        self.events = []
+        self._days = []
+        self._groups = {}
+        self.add(events)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __repr__(self):
+        return f'EventIndex({len(self)} events, {len(self.seasons())} seasons)'
+
+    def _set(self, events):
+        '''
+        Replaces the events of the index with a set of events.
+        '''
+        self.events = sorted(events)
+        self._days = [event.date for event in self.events]
+        self._groups = {}
+
+    def add(self, events):
+        '''
+        Adds events, skipping the ones already in the index.
+
+        Returns:
+            <int>:  The number of events added.
+        '''
+        merged = set(self.events)
+        merged.update(events)
+        added = len(merged) - len(self.events)
+        if added:
+            self._set(merged)
+        return added
+
+    def update(self, seasons):
+        '''
+        Replaces the events of whole seasons (e.g. the seasons re-extracted after their pages changed), so races removed from a page leave the index too.
+
+        Args:
+            seasons:    The new Events of each season, by season. Seasons not in it keep their events.
+        '''
+        kept = [event for event in self.events if event.season not in seasons]
+        self._set(set(kept).union(*seasons.values()))
+
+    def seasons(self):
+        '''
+        Returns the seasons in the index, sorted.
+        '''
+        return sorted({event.season for event in self.events})
+
+    def _group(self, venue, discipline, season):
+        '''
+        Returns the (days, events) of the events with the given venue, discipline and season (None matching any), sorted by day.
+        '''
+        key = (venue, discipline, season)
+        group = self._groups.get(key)
+        if group is None:
+            events = [event for event in self.events
+                      if (venue is None or event.venue == venue) and (discipline is None or event.discipline == discipline)
+                      and (season is None or event.season == season)]
+            group = self._groups[key] = ([event.date for event in events], events)
+        return group
+
+    def between(self, start=None, end=None, venue=None, discipline=None, season=None):
+        '''
+        Returns the events from start to end (both included), optionally only the ones at a venue, of a discipline or of a season.
+
+        Args:
+            start:      (Optional) The first day (a date or datetime). Defaults to None (from the first event).
+            end:        (Optional) The last day (a date or datetime). Defaults to None (to the last event).
+            venue:      (Optional) The venue of the events. Defaults to None (any).
+            discipline: (Optional) The discipline of the events, e.g. 'SL'. Defaults to None (any).
+            season:     (Optional) The season of the events. Defaults to None (any).
+        Returns:
+            <Array<Event>> events:  The events, sorted by day.
+        '''
+        if venue is None and discipline is None and season is None:
+            (days, events) = (self._days, self.events)
+        else:
+            (days, events) = self._group(venue, discipline, season)
+        low = 0 if start is None else bisect_left(days, _day(start))
+        high = len(days) if end is None else bisect_right(days, _day(end))
+        return events[low:high]
+
+    def on(self, day, venue=None, discipline=None):
+        '''
+        Returns the events of one day (a date or datetime), optionally only the ones at a venue or of a discipline.
+        '''
+        return self.between(day, day, venue=venue, discipline=discipline)
+
+    def next(self, after, venue=None, discipline=None):
+        '''
+        Returns the first event after a day (a date or datetime), optionally at a venue or of a discipline. None if there is none.
+        '''
+        (days, events) = self._group(venue, discipline, None) if venue is not None or discipline is not None else (self._days, self.events)
+        position = bisect_right(days, _day(after))
+        return events[position] if position < len(events) else None
+
+def _ics_text(text):
+    '''
+    Escapes a text value for iCalendar.
+    '''
+    return _REGEX_ICS_ESCAPE.sub(r'\\\1', text)
+
+def _ics_fold(line):
+    '''
+    Folds an iCalendar content line into lines of at most 75 octets, continued lines starting with a space (RFC 5545).
+    '''
+    if len(line.encode('utf-8')) <= _ICS_LINE_OCTETS:
+        return [line]
+    lines = []
+    (current, octets) = ('', 0)
+    for character in line:
+        size = len(character.encode('utf-8'))
+        if octets + size > _ICS_LINE_OCTETS:
+            lines.append(current)
+            (current, octets) = (' ', 1)
+        current += character
+        octets += size
+    lines.append(current)
+    return lines
+
+def ics_lines(events, name, stamp=None):
+    '''
+    Formats events as an iCalendar (RFC 5545) calendar of all-day events, one line at a time.
+    Each event gets a UID derived from its season, day, venue and discipline, so calendar clients update events in place on re-import.
+    Lines end in '\\r', so a text sink (which adds '\\n') writes the CRLF line endings iCalendar requires.
+
+    Args:
+        events: The Events.
+        name:   The name of the calendar.
+        stamp:  (Optional) The time the calendar is created at, a UTC datetime. Defaults to None (now).
+    Yields:
+        <String> line:  The lines of the calendar.
+    '''
+    stamp = (stamp or datetime.datetime.now(datetime.timezone.utc)).strftime('%Y%m%dT%H%M%SZ')
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//time_planner//Event calendar//EN', 'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{_ics_text(name)}']
+    for event in events:
+        uid = hashlib.blake2b('\n'.join([event.season, event.date.isoformat(), event.venue, event.discipline]).encode('utf-8'), digest_size=12).hexdigest()
+        lines.extend(['BEGIN:VEVENT', f'UID:{uid}@time_planner', f'DTSTAMP:{stamp}',
+                      f'DTSTART;VALUE=DATE:{event.date:%Y%m%d}', f'DTEND;VALUE=DATE:{event.date + datetime.timedelta(days=1):%Y%m%d}',
+                      f'SUMMARY:{_ics_text(f"{event.discipline} – {event.venue}")}', f'LOCATION:{_ics_text(event.venue)}',
+                      f'CATEGORIES:{_ics_text(event.discipline)}', 'END:VEVENT'])
+    lines.append('END:VCALENDAR')
+    for line in lines:
+        for folded in _ics_fold(line):
+            yield folded + '\r'
+
+def csv_records(events):
+    '''
+    Formats events as {'date', 'venue', 'discipline', 'season'} records, with ISO dates.
+    '''
+    return ({'date': event.date.isoformat(), 'venue': event.venue, 'discipline': event.discipline, 'season': event.season} for event in events)
+
+class CalendarExport:
+    '''
+    Exports the events of an EventIndex as one file per season and format, re-exporting only the seasons whose events changed since the last export.
+    A digest of each season's events is kept in a manifest in the folder, and a season is written again only if its digest differs
+    (or one of its files is missing). Each file is written through an output_writers sink, so it is replaced atomically.
+
+    Args:
+        folder:     (Optional) The folder to export to. Defaults to 'datetime_filter/calendars'.
+        formats:    (Optional) The extensions of the files to export each season as: '.ics' (iCalendar), '.md' (betting slip,
+                    see time_planner.createBettingSlip()) or any output_writers format (e.g. '.csv', '.jsonl'), each optionally compressed
+                    (e.g. '.ics.gz'). Defaults to ('.ics', '.csv').
+    '''
+    def __init__(self, folder='datetime_filter/calendars', formats=('.ics', '.csv')):
+        self.folder = folder
+        self.formats = tuple(formats)
+        self.manifestPath = os.path.join(folder, MANIFEST)
+        try:
+            with open(self.manifestPath, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    @staticmethod
+    def digest(events):
+        '''
+        Returns a digest of the events of a season.
+        '''
+        data = '\n'.join(f'{event.date.isoformat()}\t{event.venue}\t{event.discipline}' for event in events)
+        return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+    def paths(self, season):
+        '''
+        Returns the paths of the files of a season, one per format.
+        '''
+        name = _filename(season)
+        return [os.path.join(self.folder, name + extension) for extension in self.formats]
+
+    def _write(self, path, season, events):
+        '''
+        Writes the file of a season in the format of its extension, compressed if it ends in a compression suffix (e.g. '.ics.gz').
+        '''
+        extension = _extension(path)
+        if extension == '.ics':
+            output_writers.save(path, ics_lines(events, season), ())
+        elif extension == '.md':
+            import time_planner
+            data = [[f'{event.date.day} {event.date:%B %Y}', event.venue, event.discipline] for event in events]
+            time_planner.createBettingSlip(data, output=os.path.basename(path), saveToFolder=os.path.dirname(path))
+        else:
+            output_writers.save(path, (), csv_records(events))
+
+    def export(self, index, force=False):
+        '''
+        Exports the seasons of an index whose events changed since the last export (all of them if force is True), and saves the manifest.
+
+        Args:
+            index:  The EventIndex.
+            force:  (Optional) Whether to export every season, changed or not. Defaults to False.
+        Returns:
+            <Array<String>> seasons:    The seasons that were exported.
+        '''
+        exported = []
+        for season in index.seasons():
+            events = index.between(season=season)
+            digest = self.digest(events)
+            paths = self.paths(season)
+            if not force and self.manifest.get(season) == digest and all(os.path.exists(path) for path in paths):
+                continue
+            for path in paths:
+                self._write(path, season, events)
+            self.manifest[season] = digest
+            exported.append(season)
+
+        if exported:
+            os.makedirs(self.folder, exist_ok=True)
+            temp = f'{self.manifestPath}.tmp'
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temp, self.manifestPath)
+        return exported
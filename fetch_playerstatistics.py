@@ -1,253 +1,385 @@
-from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from document import Document
+import instrumentation
 import re
-import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
+import sys
+import threading
+from lxml import etree
 import requesting_urls
+import wikitables
 
-def extract_teams(url, plot=True, showPlot=False, savePlot=True):
+# Patterns of the opening tags of the tables read on each page. Only these tables are parsed (see wikitables.parse_table()).
+_REGEX_BRACKET = re.compile(rb'^(?=[^>]*\bborder="0")(?=[^>]*\bcellpadding="0")(?=[^>]*\bcellspacing="0")')
+_REGEX_SORTABLE = re.compile(rb'class="[^"]*\bsortable\b')
+_REGEX_STATISTICS = re.compile(rb'class="wikitable sortable"')
+
+# Regex to find the caption of the roster table on a team page
+_REGEX_ROSTER_CAPTION = re.compile(rb"<caption\b[^>]*>Roster listing\s*</caption>")
+
+# Regex matching the season link of a player's 2019-20 statistics row
+_REGEX_SEASON = re.compile(r".*2019.*20.*")
+
+# Rows of a table (including nested tables), links in an element, and data cells of a row
+_XPATH_ALL_ROWS = etree.XPath(".//tr")
+_XPATH_LINKS = etree.XPath(".//a[@href]")
+_XPATH_TDS = etree.XPath(".//td")
+
+class _LazyProcessPool:
+    '''
+    Process pool started on the first map() that has pages to parse, so runs where no page needs parsing (e.g. all unchanged in a store)
+    start no processes. Safe to share between threads.
+
+    Args:
+        maxWorkers: The number of processes.
+    '''
+    def __init__(self, maxWorkers):
+        self.maxWorkers = maxWorkers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def map(self, fn, *iterables):
+        '''
+        Maps fn over iterables on the pool, like Executor.map().
+        '''
+        iterables = [list(iterable) for iterable in iterables]
+        if not all(iterables):
+            return iter(())
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.maxWorkers)
+        return self._pool.map(fn, *iterables)
+
+    def shutdown(self):
+        '''
+        Shuts the pool down, if it was started.
+        '''
+        if self._pool is not None:
+            self._pool.shutdown()
+
+def extract_teams(url, plot=True, showPlot=False, savePlot=True, maxWorkers=8, store=None, parsePool=None):
     '''
     Takes a url to a NBA season playoff wikipedia site and extracts the (8) teams in the Conference Semifinals column in the season bracket.
+    The teams are extracted in parallel, and within each team the player pages are fetched in parallel and parsed on a shared process pool
+    (parsePool if given, else one started only if some page needs parsing).
+    The result does not depend on the order in which pages finish.
     If plot is True (defualt), plots graphs showing top 3 players from each team with respect to their statistics in PPG, BPG and RPG (2019-20 season).
     If showPlot is True (defaults to False), the plots are displayed.
     If savePlot is True (default), the plots are saved to the folder ./NBA_player_statistics as png's.
+    Only the bracket table is parsed, out of the raw html of the page (see wikitables.parse_table()).
+    If store is given, rosters and player statistics are kept in it, and only the team and player pages that changed since the last run are fetched again.
 
     Args:
-        url:        The url to the NBA playoff wikipedia site (any season)
+        url:        The url to the NBA playoff wikipedia site (any season), or a Document
         plot:       (Optional) Whether to create plots. Defaults to True.
         showPlot:   (Optional) Whether to display plots. Defaults to False.
         savePlot:   (Optional) Whether to save plots. Defaults to True
-
+        maxWorkers: (Optional) The number of teams, page fetches per team and parsing processes to run at once. Defaults to 8.
+        store:      (Optional) A revision_store.RevisionStore to reuse rosters and player statistics from. Defaults to None (fetch every page).
+        parsePool:  (Optional) An executor to parse the player pages on, e.g. a ProcessPoolExecutor, left running for the caller to reuse.
+                    Defaults to None (a process pool of maxWorkers processes, for this call).
+    Returns:
+        <StatisticsTable> teams_comparison: The top 3 players (by ppg) of each team.
     '''
+    from statistics_table import StatisticsTable
+    if not isinstance(url, Document):
+        url = Document(url)
+    (url, content) = (url.url, url.content)
+
     # Use regex to extract base url (to use in relative urls)
     regex_baseurl = r"^(.*://[A-Za-z0-9\-\.]+).*"
     baseurl = re.findall(regex_baseurl, url)[0]
+    with instrumentation.stage('extract_teams.bracket'):
+        bracket = wikitables.parse_table(content, _REGEX_BRACKET)
 
-    response = requesting_urls.get_html(url)
-    document = BeautifulSoup(response.content, 'lxml')
-    bracket = document.find('table', {'border': '0', 'cellpadding': '0', 'cellspacing': '0'})
-
-    bracket_rows = np.array(bracket.find_all('tr'))
-    rows = bracket_rows[[4, 6, 16, 18, 28, 30, 40, 42]]
+    bracket_rows = _XPATH_ALL_ROWS(bracket)
+    rows = [bracket_rows[i] for i in (4, 6, 16, 18, 28, 30, 40, 42)]
 
 
-    teams = []
+    a_tags = [_XPATH_LINKS(row)[0] for row in rows]
 
-    for row in rows:
-        a_tag = row.find(['a'], href=True)
-        teamstatistics = extract_url(a_tag, baseurl)
-        teams.append(teamstatistics)
+    # Extract teams in parallel. map() keeps the teams in bracket order.
+    pool = parsePool if parsePool is not None else _LazyProcessPool(maxWorkers)
+    try:
+        with ThreadPoolExecutor(max_workers=maxWorkers) as teamPool:
+            teams = list(teamPool.map(lambda a_tag: extract_url(a_tag, baseurl, maxWorkers=maxWorkers, parsePool=pool, store=store), a_tags))
+    finally:
+        if parsePool is None:
+            pool.shutdown()
 
-    # Sort
-    teams_comparison = []
-
-    def get_ppg(player):
-        '''
-        Helper method to return a player's ppg as float
-
-        Args:
-            player:     The player dict
-        Returns:
-            <float>:    ppg as float, or 0 if empty
-        '''
-        if player.get('ppg') != '':
-            return float(player.get('ppg'))
-        else:
-            return 0
-
-    for team in teams:
-        if team is not None:
-            team_best = sorted(team, key=get_ppg, reverse=True)[:3]
-            teams_comparison.append(team_best)
+    # Keep the top 3 players (by ppg) of each team
+    teams_comparison = StatisticsTable.concat(teams).top_k('ppg', 3, by='team')
 
     # Plot
     if plot:
-        createPlot(teams_comparison, 'ppg', show=showPlot, save=savePlot)
-        createPlot(teams_comparison, 'bpg', show=showPlot, save=savePlot)
-        createPlot(teams_comparison, 'rpg', show=showPlot, save=savePlot)
+        with instrumentation.stage('extract_teams.plots'):
+            createPlots(teams_comparison, ('ppg', 'bpg', 'rpg'), show=showPlot, save=savePlot)
+    return teams_comparison
 
 
-def extract_url(a_tag, baseurl):
+def extract_url(a_tag, baseurl, maxWorkers=8, parsePool=None, store=None):
     '''
     Takes 'a' tag and baseurl from a team's html a-tag cell, and extracts the team Roster listing and each players NBA Regular Season statistics.
-    Returns the statistics as an array of dict items, where each item represents a player and their statistics for the 2019-20 regular season.
+    Returns the statistics as a StatisticsTable, where each row represents a player and their statistics for the 2019-20 regular season.
+    The player pages are fetched concurrently, and parsed on parsePool if given. Players are always returned in roster order.
+    Only the roster table of the team page, and the statistics table of each player page, are parsed (see wikitables.parse_table()).
+    If store is given, the roster and the player statistics are looked up in it by page revision, and only pages that changed are fetched.
+    Pages that cannot be fetched (see requesting_urls.FetchFailure) do not abort the run: without the team page the team is left out (None),
+    and players whose page failed are left out of the table.
 
     Args:
-        a_tag:      The html 'a'-tag cell for the team.
+        a_tag:      The html 'a'-tag cell for the team (an lxml element).
         baseurl:    The base url for the page.
+        maxWorkers: (Optional) The number of player pages to fetch at once. Defaults to 8.
+        parsePool:  (Optional) An executor to parse the player pages on, e.g. a ProcessPoolExecutor. Defaults to None (parse in this thread).
+        store:      (Optional) A revision_store.RevisionStore to reuse the roster and player statistics from. Defaults to None (fetch every page).
     Returns:
-        <Array<Dict>> teamstatistics:   Array of dict items, where each item represents a player's {'team', 'name', 'ppg', 'bpg', 'rpg'}
+        <StatisticsTable> teamstatistics:   Table with a row per player, with columns 'team', 'name', 'ppg', 'bpg' and 'rpg' (NaN if missing)
     '''
-    teamUrl = baseurl + a_tag['href']
-    teamName = a_tag.getText(strip=True)
-
-    # Extract html
-    response = requesting_urls.get_html(teamUrl)
-    document = BeautifulSoup(response.content, 'lxml')
+    from statistics_table import StatisticsTable
+    teamUrl = baseurl + a_tag.get('href')
+    teamName = wikitables.cell_text(a_tag)
 
-    # Navigate to table
-    for text in document.find_all('caption', text="Roster listing\n"):
-        rostertable = text.findParents('table')[0]
+    # Extract the roster, from the store if the team page did not change
+    if store is not None:
+        (roster,) = store.refresh('roster', [teamUrl], _parse_roster)
+    else:
+        try:
+            response = requesting_urls.get_html(teamUrl)
+        except requesting_urls.FetchError:
+            return None
+        with instrumentation.stage('extract_url.parse', page='roster'):
+            roster = _parse_roster(response.content)
+    if roster is None or isinstance(roster, requesting_urls.FetchFailure):
+        return None
 
-    playertable = rostertable.find_all('table', {'class': 'sortable'})[0]
+    # Array of (name, url) tuples of all players on the team
+    players = [(playername, baseurl + href) for (playername, href) in roster]
+    playerurls = [playerurl for (_, playerurl) in players]
 
-    if (playertable is not None):
-        playerrows = playertable.find_all("tr")
+    # Fetch all player pages concurrently (only the changed ones if there is a store), and parse them (in roster order) on the parse pool
+    if store is not None:
+        statistics = store.refresh('player_statistics', playerurls, _parse_player_statistics, parsePool=parsePool, concurrency=maxWorkers)
     else:
-        return None
+        playerresponses = requesting_urls.get_many(playerurls, concurrency=maxWorkers)
+        fetched = [index for (index, playerresponse) in enumerate(playerresponses) if not isinstance(playerresponse, requesting_urls.FetchFailure)]
+        contents = [playerresponses[index].content for index in fetched]
+        with instrumentation.stage('extract_url.parse', page='player_statistics'):
+            if parsePool is not None:
+                parsed = list(parsePool.map(_parse_player_statistics, contents))
+            else:
+                parsed = [_parse_player_statistics(content) for content in contents]
+        statistics = list(playerresponses)
+        for (index, playerstatistics) in zip(fetched, parsed):
+            statistics[index] = playerstatistics
 
     # Array of Dicts holding the statistics of all players on the team, formatted like {'team', 'name', 'ppg', 'bpg', 'rpg'}
     teamstatistics = []
 
-    # Extract player statistics and fill teamstatistics
+    for ((playername, _), playerstatistics) in zip(players, statistics):
+        if isinstance(playerstatistics, requesting_urls.FetchFailure):
+            continue
+        if playerstatistics is None:
+            return
+        (PPG, BPG, RPG) = playerstatistics
+        teamstatistics.append({'team': teamName, 'name': playername, 'ppg': PPG, 'bpg': BPG, 'rpg': RPG})
+
+    return StatisticsTable.from_records(teamstatistics)
+
+
+def _parse_roster(content):
+    '''
+    Parses a team's wikipedia page and extracts the players of its roster listing.
+    Only the roster table is parsed, out of the raw html of the page (see wikitables.parse_table()).
+
+    Args:
+        content:    The html of the team page, as bytes.
+    Returns:
+        <Array<Tuple<String>>> roster:  The (name, href) of each player, in roster order. None if the page has no roster table.
+    '''
+    # Navigate to table: the (first) sortable table after the roster caption
+    captions = list(_REGEX_ROSTER_CAPTION.finditer(content))
+    if not captions:
+        return None
+    playertable = wikitables.parse_table(content, _REGEX_SORTABLE, start=captions[-1].end())
+
+    if (playertable is not None):
+        playerrows = _XPATH_ALL_ROWS(playertable)
+    else:
+        return None
+
+    roster = []
     for row in playerrows[1:]:
-        cells = row.find_all(["td"])
+        cells = _XPATH_TDS(row)
         namecell = cells[2]
-        player_atag = namecell.find('a', href=True)
-        playername = re.sub(r"(\([\w]*\))", '', namecell.getText(strip=True))
-        playerurl = baseurl + player_atag['href']
+        player_atag = _XPATH_LINKS(namecell)[0]
+        playername = re.sub(r"(\([\w]*\))", '', wikitables.cell_text(namecell))
+        roster.append((playername, player_atag.get('href')))
+    return roster
 
-        playerresponse = requesting_urls.get_html(playerurl)
-        playerdocument = BeautifulSoup(playerresponse.content, 'lxml')
+def _parse_player_statistics(content):
+    '''
+    Parses a player's wikipedia page and extracts the player's 2019-20 regular season statistics.
+    Only the statistics table is parsed, out of the raw html of the page (see wikitables.parse_table()).
+    Module level (and only taking bytes) so it can run on a process pool.
 
-        statisticstables = playerdocument.find_all('table', {'class': 'wikitable sortable'})
+    Args:
+        content:    The html of the player page, as bytes.
+    Returns:
+        <Tuple<String>> (PPG, BPG, RPG):    The statistics, as strings stripped of formatting. Empty strings if there is no 2019-20 row.
+                                            None if the page has no statistics table.
+    '''
+    statisticstable = wikitables.parse_table(content, _REGEX_STATISTICS)
 
-        if len(statisticstables) > 0:
-            statisticstable = statisticstables[0]
-        else:
-            return
+    if statisticstable is None:
+        return None
 
-        nodata = True
-        for text in statisticstable.find_all("a", text=re.compile(r".*2019.*20.*")):
+    nodata = True
+    for link in _XPATH_LINKS(statisticstable):
+        if _REGEX_SEASON.match(link.text_content()):
             nodata = False
-            statisticsrow = text.findParents('tr')[0]
+            statisticsrow = next(link.iterancestors('tr'))
 
-        if nodata:
-            (PPG, BPG, RPG) = ('', '', '')
-        else:
-            statisticscells = statisticsrow.find_all(["td"])
+    if nodata:
+        return ('', '', '')
 
-            (PPG, BPG, RPG) = np.array(statisticscells)[[12, 11, 8]]
-            # Strip of formatting and extra characters (* and -)
-            (PPG, BPG, RPG) = (re.sub(r"[\*\-]", '', PPG.getText(strip=True)), re.sub(r"[\*\-]", '', BPG.getText(strip=True)), re.sub(r"[\*\-]", '', RPG.getText(strip=True)))
+    statisticscells = _XPATH_TDS(statisticsrow)
 
-        playerstatistics = {'team': teamName, 'name': playername, 'ppg': PPG, 'bpg': BPG, 'rpg': RPG}
-        teamstatistics.append(playerstatistics)
+    (PPG, BPG, RPG) = (statisticscells[12], statisticscells[11], statisticscells[8])
+    # Strip of formatting and extra characters (* and -)
+    return tuple(re.sub(r"[\*\-]", '', wikitables.cell_text(cell)) for cell in (PPG, BPG, RPG))
 
-    return teamstatistics
 
+# Title and file name of the plot of each type of statistics
+PLOT_TYPES = {'ppg': ('Points per game', 'players_over_ppg'),
+              'bpg': ('Blocks per game', 'players_over_bpg'),
+              'rpg': ('Rebounds per game', 'players_over_rpg')}
 
 def createPlot(teams, type, show=False, save=True):
     '''
-    Creates plots displaying statistics based on the giving 'teams' array, showing statistics for top 3 players over 'type' (ppg, bpg or rpg) for each team.
+    Creates plots displaying statistics based on the giving 'teams' table, showing statistics for top 3 players over 'type' (ppg, bpg or rpg) for each team.
     If show is True (defaults to False), the plots are displayed.
     If save is True (deault), the plots are saved to folder ./NBA_player_statistics as png's
+    Same as createPlots(teams, [type], show=show, save=save).
 
     Args:
-        teams:  Array holding statistics from top 3 players from each team.
+        teams:  StatisticsTable holding statistics from top 3 players from each team, ordered by team (as StatisticsTable.top_k() returns).
         type:   Type of statistics to plot ('ppg' | 'bpg' | 'rpg')
         show:   (Optional) Whether to display plots. Defaults to False.
         save:   (Optional) Whether to save plots. Defaults to True.
 
     '''
-    saveLocation = './NBA_player_statistics/'
-    # Set title and file name based on type
-    if type == 'ppg':
-        title = 'Points per game'
-        fname = 'players_over_ppg'
-    elif type == 'bpg':
-        title = 'Blocks per game'
-        fname = 'players_over_bpg'
-    elif type == 'rpg':
-        title = 'Rebounds per game'
-        fname = 'players_over_rpg'
+    createPlots(teams, [type], show=show, save=save)
+
+def createPlots(teams, types=('ppg', 'bpg', 'rpg'), show=False, save=True, saveLocation='./NBA_player_statistics/', prefix='', pool=None):
+    '''
+    Creates the plots of several types of statistics (see createPlot()) in one pass.
+    Unless show is True, the plots are rendered headless with the Agg backend, without pyplot or a GUI backend:
+    one figure is drawn, saved and cleared for each type in turn, so memory stays flat however many plots are rendered.
+    If pool is given (e.g. a ProcessPoolExecutor), the types are rendered in parallel on it instead, each on its own headless figure.
+    Shown plots are closed after they are displayed.
+
+    Args:
+        teams:          StatisticsTable holding statistics from top 3 players from each team, ordered by team (as StatisticsTable.top_k() returns).
+        types:          (Optional) The types of statistics to plot. Defaults to ('ppg', 'bpg', 'rpg').
+        show:           (Optional) Whether to display plots. Defaults to False.
+        save:           (Optional) Whether to save plots. Defaults to True.
+        saveLocation:   (Optional) The folder to save the plots in. Defaults to './NBA_player_statistics/'.
+        prefix:         (Optional) A prefix for the file names, e.g. to render several seasons to one folder. Defaults to ''.
+        pool:           (Optional) An executor to render the plots on. Ignored if show is True. Defaults to None (render in this thread).
+    Returns:
+        <Array<String>> paths:  The paths of the saved plots (empty if save is False).
+    '''
+    fnames = [PLOT_TYPES.get(type, ('NBA Statistics', 'nba_statistics'))[1] for type in types]
+    paths = [f'{saveLocation}{prefix}{fname}.png' for fname in fnames]
+
+    if show:
+        import matplotlib.pyplot as plt
+        for (type, path) in zip(types, paths):
+            fig = plt.figure(figsize=(16, 12), dpi=80, facecolor='w', edgecolor='k')
+            fig.canvas.manager.set_window_title('NBA conference semifinals statistics')
+            _draw_plot(fig, teams, type)
+            # Save before showing, as closing the window discards the drawing
+            if save:
+                fig.savefig(path)
+            plt.show()
+            plt.close(fig)
+    elif not save:
+        return []
+    elif pool is not None:
+        list(pool.map(_render_plot, [(teams, type, path) for (type, path) in zip(types, paths)]))
     else:
-        title = 'NBA Statistics'
-        fname = 'nba_statistics'
+        fig = _headless_figure()
+        for (type, path) in zip(types, paths):
+            _draw_plot(fig, teams, type)
+            fig.savefig(path)
+        fig.clear()
 
-    # Sort
-    def get_points(player, p):
-        '''
-        Helper method to return a player's points in category 'p' as float
+    return paths if save else []
 
-        Args:
-            player:     The player dict
-            p:          Point type ('ppg' | 'bpg' | 'rpg')
-        Returns:
-            <float>:    Point as float, or 0 if empty
-        '''
-        if player.get(p) != '':
-            return float(player.get(p))
-        else:
-            return 0
-
-    labels_teams = []
-    first = {'names': [], 'points': []}
-    second = {'names': [], 'points': []}
-    third = {'names': [], 'points': []}
-
-    # Set labels and values to use in plot
-    for team in teams:
-        labels_teams.append(team[0]['team'])
-        first['names'].append(team[0]['name'])
-        first['points'].append(get_points(team[0], type))
-        second['names'].append(team[1]['name'])
-        second['points'].append(get_points(team[1], type))
-        third['names'].append(team[2]['name'])
-        third['points'].append(get_points(team[2], type))
+def _headless_figure():
+    '''
+    Returns a figure rendered by the Agg backend, which pyplot does not keep track of (so it is freed as soon as it is dropped).
+    '''
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(16, 12), dpi=80, facecolor='w', edgecolor='k')
+    FigureCanvasAgg(fig)
+    return fig
+
+def _render_plot(task):
+    '''
+    Renders and saves one plot on its own headless figure. Module level so it can run on a process pool.
+
+    Args:
+        task:   A (teams, type, path) tuple.
+    '''
+    (teams, type, path) = task
+    fig = _headless_figure()
+    _draw_plot(fig, teams, type)
+    fig.savefig(path)
+    fig.clear()
+
+def _draw_plot(fig, teams, type):
+    '''
+    Draws the plot of one type of statistics on a figure, replacing whatever the figure showed before.
+
+    Args:
+        fig:    The figure to draw on.
+        teams:  StatisticsTable holding statistics from top 3 players from each team, ordered by team.
+        type:   Type of statistics to plot ('ppg' | 'bpg' | 'rpg')
+    '''
+    import numpy as np
+    title = PLOT_TYPES.get(type, ('NBA Statistics', None))[0]
+
+    # Set labels and values to use in plot: the players ranked first, second and third of each team. Missing points are plotted as 0.
+    labels_teams = list(dict.fromkeys(teams['team']))
+    (ranks, names, points) = (teams.ranks('team'), teams['name'], np.nan_to_num(teams[type]))
+    positions = np.cumsum(ranks == 0) - 1
 
     # Plot init and formatting
     x = np.arange(len(labels_teams))
     width = 0.2
 
-    fig, ax = plt.subplots(num=None, figsize=(16, 12), dpi=80, facecolor='w', edgecolor='k')
-    fig.canvas.set_window_title('NBA conference semifinals statistics')
-    rects1 = ax.bar(x - width, first['points'], width)
-    rects2 = ax.bar(x, second['points'], width)
-    rects3 = ax.bar(x + width, third['points'], width)
-
-    def autolabel(rects, pos):
-        '''
-        Auto labels rectangles with the name of the player
-        Args:
-            rects:  Set of rectangles (ax)
-            pos:    [1 | 2 | 3] rectangle group (first, second, third)
-        '''
-        for index, rect in enumerate(rects):
-            if pos == 1:
-                name = first['names'][index]
-            elif pos == 2:
-                name = second['names'][index]
-            elif pos == 3:
-                name = third['names'][index]
-            else:
-                break
-            height = rect.get_height()
-            ax.text(rect.get_x() + rect.get_width(), 0, name,
-                    ha='center', va='bottom', rotation='60', fontsize=10)
-            ax.text(rect.get_x() + rect.get_width() / 2, height, height,
-                    ha='center', va='bottom', rotation='0', fontsize=12)
+    fig.clear()
+    ax = fig.add_subplot()
+    for (rank, offset) in ((0, -width), (1, 0), (2, width)):
+        selected = ranks == rank
+        rects = ax.bar(positions[selected] + offset, points[selected], width)
+        # Label each group of bars at once: the player names across the bars, and the points on top
+        ax.bar_label(rects, labels=names[selected].tolist(), label_type='center', rotation=60, fontsize=10)
+        ax.bar_label(rects, fontsize=12)
 
     ax.set_ylabel(type)
     ax.set_title(f'{title} by top players from each team')
     ax.set_xticks(x)
     ax.set_xticklabels(labels_teams)
 
-    autolabel(rects1, 1)
-    autolabel(rects2, 2)
-    autolabel(rects3, 3)
-
     fig.tight_layout()
 
-    if show:
-        # Display plot
-        plt.show()
-    if save:
-        # Save plot
-        plt.savefig(fname=saveLocation+fname)
-
 
 # Run as script
 if __name__ == '__main__':
     url = 'https://en.wikipedia.org/wiki/2020_NBA_playoffs'
-    extract_teams(url)
+    from revision_store import RevisionStore
+    with instrumentation.profiling('--profile' in sys.argv):
+        extract_teams(url, store=RevisionStore())
@@ -1,69 +1,213 @@
+import itertools
+import os
 import re
-import requesting_urls
+import sys
+from document import Document
+import instrumentation
+import normalize_urls
+import output_writers
 
-def find_urls(url, html):
+# Regex to find all urls (a href) on the page, and the same regex for html as bytes
+_REGEX_ALLURLS = re.compile(r"<a [^>] href=['\"]([^#'\"]+)['\"#]", flags=re.VERBOSE)
+_REGEX_ALLURLS_BYTES = re.compile(_REGEX_ALLURLS.pattern.encode('ascii'), flags=re.VERBOSE)
+
+# Regex matching the start of an a href at the end of a chunk of html, which may still become a url when the next chunk is read
+_REGEX_PARTIAL = re.compile(r"<(?:a(?:[^>](?:h(?:r(?:e(?:f(?:=(?:['\"][^#'\"]*)?)?)?)?)?)?)?)?\Z")
+
+# Regex to find wikipedia articles in a url
+_REGEX_WIKIARTICLES = re.compile(r"(https*://[\w]+.wikipedia.org/[^|:]*)", flags=re.VERBOSE)
+
+def find_urls(url, html, encoding='utf-8'):
     '''
     Receives a string of html and returns a list of all urls found in the text.
+    Relative urls are resolved against the page url (or the page's <base href>), and all urls are normalized (see normalize_urls).
+    If html is a Document, its (memoized) links are returned.
+    Html may also be given as bytes in an ASCII compatible encoding (see requesting_urls.ascii_compatible()), e.g. response.content:
+    the markup is then searched without decoding the page, and only the urls found are decoded.
 
     Args:
-        url:    The url from which the html is retrieved.
-        html:   A string of html to filter.
+        url:        The url from which the html is retrieved.
+        html:       A string of html to filter, the html as bytes, or a Document.
+        encoding:   (Optional) The encoding of html, if bytes. Defaults to 'utf-8'.
     Returns:
         <Array<String>> urls:  A list of all urls found in the text.
     '''
-    # Use regex to extract base url (to use in relative urls)
-    regex_baseurl = r"^(.*://[A-Za-z0-9\-\.]+).*"
-    baseurl = re.findall(regex_baseurl, url)[0]
+    if isinstance(html, Document):
+        return html.links
 
-    # Use regex to find all urls (a href) on the page
-    regex_allurls = r"<a [^>] href=['\"]([^#'\"]+)['\"#]"
-    urls = re.findall(regex_allurls, html, flags=re.VERBOSE)
+    with instrumentation.stage('find_urls'):
+        baseurl = normalize_urls.find_base(url, html, encoding)
+        if isinstance(html, str):
+            refs = _REGEX_ALLURLS.findall(html)
+        else:
+            refs = _REGEX_ALLURLS_BYTES.findall(html)
+            decoded = {ref: bytes(ref).decode(encoding, errors='replace') for ref in set(refs)}
+            refs = [decoded[ref] for ref in refs]
+        return normalize_urls.resolve_urls(baseurl, refs)
 
-    # Use regex to substitute all relative urls (starts with /) with the full url (replace / with baseurl + /)
-    for i in range(len(urls)):
-        urls[i] = re.sub(r"^/", baseurl+'/', urls[i], flags=re.MULTILINE | re.VERBOSE)
+def iter_urls(url, params=None, chunkSize=65536):
+    '''
+    Streaming version of find_urls(). Requests the url, and yields the urls found on the page while it is being downloaded.
+    Only a small tail of the html (an a tag cut by a chunk boundary, or the head until the <base href> is known) is kept between chunks,
+    so memory stays flat on very large pages. Raises requesting_urls.FetchError before yielding anything if the page cannot be fetched.
+
+    Args:
+        url:        The url from which the html is retrieved.
+        params:     (Optional) Parameters to pass to the get function. Defaults to None.
+        chunkSize:  (Optional) The number of bytes to read at a time. Defaults to 65536.
+    Yields:
+        <String> url:   The next url found on the page.
+    '''
+    import requesting_urls
+    baseurl = None
+    resolved = {}
+    tail = ''
+    chunks = requesting_urls.iter_text(url, params=params, chunkSize=chunkSize)
+    for chunk in chunks:
+        html = tail + chunk
+
+        # Hold on to the head until it is complete, to know the page's base url
+        if baseurl is None:
+            if not normalize_urls.head_complete(html):
+                tail = html
+                continue
+            baseurl = normalize_urls.find_base(url, html)
+
+        end = 0
+        for match in _REGEX_ALLURLS.finditer(html):
+            href = match.group(1)
+            link = resolved.get(href)
+            if link is None:
+                link = resolved[href] = normalize_urls.resolve_url(baseurl, href)
+            yield link
+            end = match.end()
+
+        # Keep the unfinished a tag at the end of the chunk, if any
+        partial = _REGEX_PARTIAL.search(html, end)
+        tail = html[partial.start():] if partial is not None else ''
+
+    # A page without a head end: resolve against url
+    if baseurl is None:
+        yield from find_urls(url, tail)
+
+def iter_articles(url, params=None, chunkSize=65536):
+    '''
+    Streaming version of find_articles(). Requests the url, and yields the urls to Wikipedia articles found on the page while it is being downloaded.
+    Each url is classified as it is found, so consumers can start work before the download finishes.
 
-    return urls
+    Args:
+        url:        The url from which the html is retrieved.
+        params:     (Optional) Parameters to pass to the get function. Defaults to None.
+        chunkSize:  (Optional) The number of bytes to read at a time. Defaults to 65536.
+    Yields:
+        <String> wiki_url:  The next url to a Wikipedia article found on the page.
+    '''
+    for link in iter_urls(url, params=params, chunkSize=chunkSize):
+        yield from _REGEX_WIKIARTICLES.findall(link)
 
 def find_articles(url, params=None, output=None, saveToFolder='filter_urls'):
     '''
     Receives a url and returns a list of all urls to Wikipedia articles found on the page.
     If argument 'params' is specified, parameters are passed in the get request.
     If argument 'output' is specified, lists of all urls and wikipedia articles found will be saved to a text file with a specified name output.txt.
+    Other extensions of output save one {'list', 'url'} record per url in that format instead (see output_writers), e.g. 'output.jsonl' or 'output.csv'.
     If the specified output filename already exists, it overwrites the content.
     Output folder can be specified as saveToFolder, but defaults to filter_urls
     If no output argument is given, the list of wikipedia articles is simply returned.
+    If url is a Document, its (memoized) links and articles are used, and nothing is fetched.
 
     Args:
-        url:            The url from which the html is retrieved.
+        url:            The url from which the html is retrieved, or a Document.
         params:         (Optional) Parameters to pass to the get function. Defaults to None.
         output:         (Optional) The filename (format as 'output.txt') for where to save the url lists. Defaults to None.
         saveToFolder:   (Optional) The folder for where to save the output file. Defaults to 'filter_urls'
     Returns:
         <Array<String>> wiki_urls:  A list of the urls found of Wikipedia articles.
     '''
-    # Call requesting_urls.get_html() with url and optional params. Save response.text to variable html, and pass to find_urls to get a list of all urls.
+    if isinstance(url, Document):
+        _save_urls(url.links, url.articles, output, saveToFolder)
+        return url.articles
+
+    import requesting_urls
+    # Call requesting_urls.get_html() with url and optional params, and filter the articles from the html (as bytes, if it need not be decoded)
     response = requesting_urls.get_html(url, params=params)
-    html = response.text
-    all_urls = find_urls(url, html)
+    return _filter_articles(url, _html(response), output, saveToFolder, response.encoding)
 
-    # Use regex to find all wikipedia articles in the list of all urls (join iterable all_urls to one string with separator |)
-    regex_wikiarticles = r"(https*://[\w]+.wikipedia.org/[^|:]*)"
-    wiki_urls = re.findall(regex_wikiarticles, '|'.join(all_urls), flags=re.VERBOSE)
+async def find_articles_async(url, params=None, output=None, saveToFolder='filter_urls', semaphore=None, limiter=None):
+    '''
+    Coroutine version of find_articles(). The page is fetched with requesting_urls.get_html_async(), so many pages can be filtered inside one event loop.
 
-    # Save output to file if output is specified.
-    if output is not None:
-        with open (f'./{saveToFolder}/{output}', 'w', encoding='utf-8') as f:
-            f.write('ALL URLS:\n')
-            for url in all_urls:
-                f.write(f'{url}\n')
-            f.write('\nWIKIPEDIA ARTICLES:\n')
-            for url in wiki_urls:
-                f.write(f'{url}\n')
+    Args:
+        url:            The url from which the html is retrieved.
+        params:         (Optional) Parameters to pass to the get function. Defaults to None.
+        output:         (Optional) The filename (format as 'output.txt') for where to save the url lists. Defaults to None.
+        saveToFolder:   (Optional) The folder for where to save the output file. Defaults to 'filter_urls'
+        semaphore:      (Optional) An asyncio.Semaphore bounding concurrent requests. Defaults to None.
+        limiter:        (Optional) A requesting_urls.RateLimiter spacing out requests per host. Defaults to None.
+    Returns:
+        <Array<String>> wiki_urls:  A list of the urls found of Wikipedia articles.
+    '''
+    import requesting_urls
+    response = await requesting_urls.get_html_async(url, params=params, semaphore=semaphore, limiter=limiter)
+    return _filter_articles(url, _html(response), output, saveToFolder, response.encoding)
+
+def filter_articles(urls):
+    '''
+    Receives a list of urls and returns the urls to Wikipedia articles among them.
+
+    Args:
+        urls:   A list of urls (as returned by find_urls()).
+    Returns:
+        <Array<String>> wiki_urls:  A list of the urls of Wikipedia articles.
+    '''
+    # Use regex to find all wikipedia articles in each of the urls
+    return [wiki_url for link in urls for wiki_url in _REGEX_WIKIARTICLES.findall(link)]
+
+def _html(response):
+    '''
+    Returns the html of a response to search for urls: its raw bytes if their encoding is ASCII compatible, else its decoded text.
+    '''
+    import requesting_urls
+    return response.content if requesting_urls.ascii_compatible(response.encoding) else response.text
+
+def _filter_articles(url, html, output, saveToFolder, encoding='utf-8'):
+    '''
+    Finds all urls in html, and returns the ones to Wikipedia articles. Saves both lists to file if output is specified.
+
+    Args:
+        url:            The url from which the html is retrieved.
+        html:           A string of html to filter, or the html as bytes.
+        output:         The filename for where to save the url lists, or None to not save.
+        saveToFolder:   The folder for where to save the output file.
+        encoding:       (Optional) The encoding of html, if bytes. Defaults to 'utf-8'.
+    Returns:
+        <Array<String>> wiki_urls:  A list of the urls found of Wikipedia articles.
+    '''
+    # Pass html to find_urls to get a list of all urls.
+    all_urls = find_urls(url, html, encoding)
+    wiki_urls = filter_articles(all_urls)
+
+    _save_urls(all_urls, wiki_urls, output, saveToFolder)
 
     # Always return the list of wikipedia articles
     return wiki_urls
 
+def _save_urls(all_urls, wiki_urls, output, saveToFolder):
+    '''
+    Saves the lists of all urls and wikipedia articles to ./saveToFolder/output, if output is specified.
+    Text files list the urls under 'ALL URLS:' and 'WIKIPEDIA ARTICLES:' headings, structured files have a {'list': 'all' | 'articles', 'url'} record per url.
+
+    Args:
+        all_urls:       The list of all urls.
+        wiki_urls:      The list of urls of Wikipedia articles.
+        output:         The filename for where to save the url lists, or None to not save.
+        saveToFolder:   The folder for where to save the output file.
+    '''
+    if output is not None:
+        lines = itertools.chain(['ALL URLS:'], all_urls, ['', 'WIKIPEDIA ARTICLES:'], wiki_urls)
+        records = itertools.chain(({'list': 'all', 'url': url} for url in all_urls), ({'list': 'articles', 'url': url} for url in wiki_urls))
+        output_writers.save(os.path.join(saveToFolder, output), lines, records)
+
 def test():
     """
     Makes a set of calls to find_articles() with parameters given in a 2D-array of test arguments, 'tests'.
@@ -77,4 +221,5 @@ def test():
         find_articles(url, output=output)
 
 if __name__ == '__main__':
-    test()
+    with instrumentation.profiling('--profile' in sys.argv):
+        test()
@@ -0,0 +1,237 @@
+# instrumentation.py
+
+import bisect
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the histogram buckets of stage durations
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+class _NullStage:
+    '''
+    Context manager that does nothing, shared by every stage of the NullRecorder.
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class NullRecorder:
+    '''
+    The default recorder: records nothing, at the cost of a function call per stage, counter or observation.
+    '''
+    def stage(self, name, **attributes):
+        '''
+        Returns a context manager timing a stage of work (e.g. 'fetch' with host='en.wikipedia.org').
+        '''
+        return _NULL_STAGE
+
+    def count(self, name, value=1, **attributes):
+        '''
+        Adds value to a counter (e.g. 'cache.hit').
+        '''
+
+    def observe(self, name, value, **attributes):
+        '''
+        Adds a value to a histogram (e.g. 'fetch.bytes').
+        '''
+
+class _Histogram:
+    '''
+    Count, total, min, max and bucket counts of observed values.
+    '''
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        '''
+        Returns the upper bound of the bucket holding the q-quantile (e.g. 0.95), capped at the largest value seen.
+        '''
+        rank = q * self.count
+        seen = 0
+        for (bound, count) in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+def _key(name, attributes):
+    '''
+    Returns the name a stage, counter or histogram is reported under, e.g. 'fetch[host=en.wikipedia.org]'.
+    '''
+    if not attributes:
+        return name
+    return f"{name}[{','.join(f'{key}={value}' for (key, value) in sorted(attributes.items()))}]"
+
+class StatsRecorder:
+    '''
+    Recorder keeping, in memory, a duration histogram per stage, a total per counter and a histogram per observed value.
+    Stages, counters and histograms with attributes are kept apart per attribute values (e.g. per host). Thread safe.
+
+    Args:
+        buckets:    (Optional) The upper bounds of the histogram buckets, for durations and observations. Defaults to DURATION_BUCKETS.
+    '''
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **attributes):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(self.stages, _key(name, attributes), time.perf_counter() - start)
+
+    def count(self, name, value=1, **attributes):
+        key = _key(name, attributes)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **attributes):
+        self._add(self.histograms, _key(name, attributes), value)
+
+    def _add(self, histograms, key, value):
+        with self._lock:
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = _Histogram(self.buckets)
+            histogram.add(value)
+
+    def report(self, file=None):
+        '''
+        Prints the per-stage breakdown (calls, total, mean, p50, p95 and max time, slowest first), the counters and the histograms.
+
+        Args:
+            file:   (Optional) The stream to print to. Defaults to None (sys.stderr).
+        '''
+        file = file or sys.stderr
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: item[1].total, reverse=True)
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+
+        if stages:
+            width = max(len(key) for (key, _) in stages)
+            print(f'{"stage":<{width}}  {"calls":>7}  {"total s":>9}  {"mean ms":>9}  {"p50 ms":>8}  {"p95 ms":>8}  {"max ms":>8}', file=file)
+            for (key, h) in stages:
+                print(f'{key:<{width}}  {h.count:>7}  {h.total:>9.3f}  {h.total / h.count * 1000:>9.2f}  {h.quantile(0.5) * 1000:>8.1f}  '
+                      f'{h.quantile(0.95) * 1000:>8.1f}  {h.max * 1000:>8.1f}', file=file)
+        for (key, value) in counters:
+            print(f'{key}: {value}', file=file)
+        # Hit rate of every 'x.hit' counter, over all the counters of x with the same attributes
+        # (e.g. cache.hit, cache.revalidated and cache.miss, or revision_store.hit[kind=roster] and revision_store.miss[kind=roster])
+        for (key, hits) in counters:
+            (name, bracket, attributes) = key.partition('[')
+            if name.endswith('.hit'):
+                prefix = name[:-len('hit')]
+                total = sum(value for (other, value) in counters if other.startswith(prefix) and other.partition('[')[2] == attributes)
+                print(f'{prefix}hit rate{bracket}{attributes}: {hits / total if total else 0.0:.1%}', file=file)
+        for (key, h) in histograms:
+            print(f'{key}: count {h.count}, mean {h.total / h.count:.4g}, min {h.min:.4g}, max {h.max:.4g}', file=file)
+
+class OpenTelemetryRecorder:
+    '''
+    Recorder emitting each stage as an OpenTelemetry span (with its attributes), and counters and observations as span events
+    of the current span. Requires the opentelemetry-api package; spans go wherever the application configured its tracer provider.
+
+    Args:
+        name:   (Optional) The name of the tracer. Defaults to 'python-filter-urls'.
+    '''
+    def __init__(self, name='python-filter-urls'):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(name)
+
+    def stage(self, name, **attributes):
+        return self._tracer.start_as_current_span(name, attributes=attributes)
+
+    def count(self, name, value=1, **attributes):
+        self._trace.get_current_span().add_event(name, dict(attributes, value=value))
+
+    def observe(self, name, value, **attributes):
+        self._trace.get_current_span().add_event(name, dict(attributes, value=value))
+
+_recorder = NullRecorder()
+
+def get_recorder():
+    '''
+    Returns the recorder all instrumented code reports to.
+    '''
+    return _recorder
+
+def set_recorder(recorder):
+    '''
+    Sets the recorder all instrumented code reports to (a NullRecorder, StatsRecorder, OpenTelemetryRecorder, or any object with the same methods).
+
+    Args:
+        recorder:   The recorder, or None for the no-op default.
+    Returns:
+        <Recorder> previous:    The recorder that was set before.
+    '''
+    global _recorder
+    (previous, _recorder) = (_recorder, recorder if recorder is not None else NullRecorder())
+    return previous
+
+def stage(name, **attributes):
+    '''
+    Returns a context manager timing a stage of work with the current recorder.
+    '''
+    return _recorder.stage(name, **attributes)
+
+def count(name, value=1, **attributes):
+    '''
+    Adds value to a counter of the current recorder.
+    '''
+    _recorder.count(name, value, **attributes)
+
+def observe(name, value, **attributes):
+    '''
+    Adds a value to a histogram of the current recorder.
+    '''
+    _recorder.observe(name, value, **attributes)
+
+@contextmanager
+def profiling(enabled=True, file=None):
+    '''
+    Records everything run inside the block with a StatsRecorder, and prints its per-stage breakdown at the end (used by the --profile flag of the scripts).
+    Work done in other processes (e.g. on a ProcessPoolExecutor) is only seen from the outside.
+
+    Args:
+        enabled:    (Optional) Whether to profile; if False, the block runs with the current recorder. Defaults to True.
+        file:       (Optional) The stream to print the breakdown to. Defaults to None (sys.stderr).
+    Yields:
+        <StatsRecorder> recorder:   The recorder, or None if not enabled.
+    '''
+    if not enabled:
+        yield None
+        return
+    recorder = StatsRecorder()
+    previous = set_recorder(recorder)
+    try:
+        with recorder.stage('total'):
+            yield recorder
+    finally:
+        set_recorder(previous)
+        recorder.report(file)
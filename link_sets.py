@@ -0,0 +1,272 @@
+# link_sets.py
+
+import json
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+from document import Document
+import filter_urls
+
+# Smallest unsigned dtypes the gaps between the ids of a serialized LinkSet are packed in, by their code in the header
+_GAP_DTYPES = (np.uint8, np.uint16, np.uint32)
+
+# Header of a serialized LinkSet: the dtype code of the gaps, and the number of ids
+_HEADER = struct.Struct('<BI')
+
+# Number of columns of the incidence matrix multiplied at a time by intersection_counts()
+_CHUNK_COLUMNS = 65536
+
+class TitleIndex:
+    '''
+    Interned dictionary of Wikipedia article titles to dense integer ids, shared by the LinkSets built with it.
+    Article urls on the index's Wikipedia are keyed by their title (as in the canonical url), other urls by the whole url.
+    Thread safe.
+
+    Args:
+        origin: (Optional) The 'scheme://host' of the Wikipedia the titles belong to. Defaults to 'https://en.wikipedia.org'.
+    '''
+    def __init__(self, origin='https://en.wikipedia.org'):
+        self.origin = origin
+        self.titles = []
+        self.ids = {}
+        self._prefix = f'{origin}/wiki/'
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def key(self, url):
+        '''
+        Returns the key a url is interned under: its title if it is an article on the index's Wikipedia, else the url itself.
+        '''
+        return url[len(self._prefix):] if url.startswith(self._prefix) else url
+
+    def url(self, id):
+        '''
+        Returns the url of the title with the given id.
+        '''
+        title = self.titles[id]
+        return title if '://' in title else self._prefix + title
+
+    def id(self, url):
+        '''
+        Returns the integer id of a url, assigning the next id to urls not seen before.
+        '''
+        return self.ids_of([url])[0]
+
+    def ids_of(self, urls):
+        '''
+        Returns the integer ids of urls, assigning new ids to urls not seen before.
+
+        Args:
+            urls:   The urls.
+        Returns:
+            <ndarray> ids:  The int32 id of each url, in the same order as 'urls'.
+        '''
+        keys = [self.key(url) for url in urls]
+        ids = self.ids
+        with self._lock:
+            for key in keys:
+                if key not in ids:
+                    ids[key] = len(self.titles)
+                    self.titles.append(key)
+            return np.fromiter((ids[key] for key in keys), dtype=np.int32, count=len(keys))
+
+    def save(self, path):
+        '''
+        Saves the index to a json file (origin and titles, in id order).
+        '''
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp = f'{path}.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'origin': self.origin, 'titles': self.titles}, f, ensure_ascii=False)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Loads an index saved with save().
+
+        Args:
+            path:   The file to load from.
+        Returns:
+            <TitleIndex> index: The loaded index.
+        '''
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls(data['origin'])
+        index.titles = data['titles']
+        index.ids = {title: id for (id, title) in enumerate(index.titles)}
+        return index
+
+class LinkSet:
+    '''
+    Immutable set of linked articles, as a sorted array of unique int32 title ids (see TitleIndex).
+    Union (|), intersection (&), difference (-) and symmetric difference (^) are merges of sorted arrays in NumPy,
+    and a page's links take 4 bytes each instead of a Python string per url.
+    Sets built with different indexes must not be combined.
+
+    Args:
+        ids:        The title ids. They are sorted and made unique unless isSorted is True.
+        isSorted:   (Optional) Whether ids are already sorted and unique. Defaults to False.
+    '''
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=(), isSorted=False):
+        ids = np.asarray(ids, dtype=np.int32)
+        self.ids = ids if isSorted else np.unique(ids)
+        self.ids.flags.writeable = False
+
+    @classmethod
+    def from_urls(cls, urls, index):
+        '''
+        Builds the set of a list of urls (e.g. the output of filter_urls.find_articles()), interning them in index.
+        '''
+        return cls(index.ids_of(urls))
+
+    @classmethod
+    def from_articles(cls, url, index, params=None):
+        '''
+        Builds the set of the Wikipedia articles linked from a page (see filter_urls.find_articles()).
+
+        Args:
+            url:    The url of the page, or a Document.
+            index:  The TitleIndex to intern the articles in.
+            params: (Optional) Parameters to pass to the get request. Defaults to None.
+        Returns:
+            <LinkSet> links:    The set of articles linked from the page.
+        '''
+        if isinstance(url, Document):
+            return cls.from_urls(url.articles, index)
+        return cls.from_urls(filter_urls.find_articles(url, params=params), index)
+
+    def urls(self, index):
+        '''
+        Returns the urls of the set, in id order.
+        '''
+        return [index.url(id) for id in self.ids.tolist()]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __contains__(self, id):
+        position = np.searchsorted(self.ids, id)
+        return bool(position < len(self.ids) and self.ids[position] == id)
+
+    def __eq__(self, other):
+        return isinstance(other, LinkSet) and np.array_equal(self.ids, other.ids)
+
+    def __hash__(self):
+        return hash(self.ids.tobytes())
+
+    def __repr__(self):
+        return f'LinkSet({len(self)} links)'
+
+    def __or__(self, other):
+        return LinkSet(np.union1d(self.ids, other.ids), isSorted=True)
+
+    def __and__(self, other):
+        return LinkSet(np.intersect1d(self.ids, other.ids, assume_unique=True), isSorted=True)
+
+    def __sub__(self, other):
+        return LinkSet(np.setdiff1d(self.ids, other.ids, assume_unique=True), isSorted=True)
+
+    def __xor__(self, other):
+        return LinkSet(np.setxor1d(self.ids, other.ids, assume_unique=True), isSorted=True)
+
+    def diff(self, other):
+        '''
+        Compares the set with a newer one (e.g. the links of a later revision of the page).
+
+        Returns:
+            <Tuple<LinkSet, LinkSet>> (added, removed): The links only in other, and the links only in this set.
+        '''
+        return (other - self, self - other)
+
+    def jaccard(self, other):
+        '''
+        Returns the Jaccard similarity (size of the intersection over size of the union) of two sets. 0.0 if both are empty.
+        '''
+        shared = len(np.intersect1d(self.ids, other.ids, assume_unique=True))
+        total = len(self) + len(other) - shared
+        return shared / total if total else 0.0
+
+    @property
+    def nbytes(self):
+        '''
+        The number of bytes the ids take in memory.
+        '''
+        return self.ids.nbytes
+
+    def to_bytes(self):
+        '''
+        Serializes the set compactly: the gaps between consecutive ids, packed in the smallest unsigned dtype that holds them, zlib compressed.
+        '''
+        gaps = np.diff(self.ids, prepend=0).astype(np.int64)
+        largest = int(gaps.max()) if len(gaps) else 0
+        code = next(code for (code, dtype) in enumerate(_GAP_DTYPES) if largest <= np.iinfo(dtype).max)
+        return _HEADER.pack(code, len(gaps)) + zlib.compress(gaps.astype(_GAP_DTYPES[code]).tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        '''
+        Loads a set serialized with to_bytes().
+        '''
+        (code, count) = _HEADER.unpack_from(data)
+        gaps = np.frombuffer(zlib.decompress(data[_HEADER.size:]), dtype=_GAP_DTYPES[code], count=count)
+        return cls(np.cumsum(gaps, dtype=np.int64).astype(np.int32), isSorted=True)
+
+def intersection_counts(sets):
+    '''
+    Returns the sizes of the pairwise intersections of a list of sets, as one matrix product instead of a loop over pairs.
+    Only ids in at least two of the sets take part, and the incidence matrix is multiplied a chunk of columns at a time to bound memory.
+
+    Args:
+        sets:   The LinkSets (built with the same index).
+    Returns:
+        <ndarray> counts:   An n x n int64 matrix, where counts[i, j] is the number of links sets i and j share (the diagonal holds the set sizes).
+    '''
+    n = len(sets)
+    sizes = np.array([len(links) for links in sets], dtype=np.int64)
+    counts = np.zeros((n, n), dtype=np.int64)
+    if n == 0 or not sizes.sum():
+        np.fill_diagonal(counts, sizes)
+        return counts
+
+    ids = np.concatenate([links.ids for links in sets])
+    owners = np.repeat(np.arange(n), sizes)
+    (_, inverse, occurrences) = np.unique(ids, return_inverse=True, return_counts=True)
+    shared = occurrences[inverse] > 1
+    (columns, owners) = (np.unique(inverse[shared], return_inverse=True)[1], owners[shared])
+
+    order = np.argsort(columns, kind='stable')
+    (columns, owners) = (columns[order], owners[order])
+    width = int(columns[-1]) + 1 if len(columns) else 0
+    for start in range(0, width, _CHUNK_COLUMNS):
+        (lo, hi) = np.searchsorted(columns, [start, start + _CHUNK_COLUMNS])
+        incidence = np.zeros((n, min(_CHUNK_COLUMNS, width - start)), dtype=np.float32)
+        incidence[owners[lo:hi], columns[lo:hi] - start] = 1.0
+        counts += np.rint(incidence @ incidence.T).astype(np.int64)
+
+    np.fill_diagonal(counts, sizes)
+    return counts
+
+def jaccard_matrix(sets):
+    '''
+    Returns the pairwise Jaccard similarities of a list of sets (see intersection_counts()).
+
+    Args:
+        sets:   The LinkSets (built with the same index).
+    Returns:
+        <ndarray> similarities: An n x n float64 matrix. Pairs of empty sets have similarity 0.0.
+    '''
+    counts = intersection_counts(sets)
+    sizes = np.diag(counts)
+    unions = sizes[:, None] + sizes[None, :] - counts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(unions > 0, counts / unions, 0.0)
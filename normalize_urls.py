@@ -0,0 +1,210 @@
+# normalize_urls.py
+
+import re
+import sys
+from functools import lru_cache
+from html import unescape
+from urllib.parse import quote, urljoin, urlsplit, urlunsplit
+
+# Default ports, dropped from canonical urls
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# Characters left as they are in canonical paths and queries (RFC 3986 reserved and unreserved characters, and escapes)
+_PATH_SAFE = "/:@!$&'()*+,;=-._~%"
+_QUERY_SAFE = "/?:@!$&'()*+,;=-._~%"
+
+# Percent signs, with the two hex digits of their escape (none if the '%' does not start a valid escape), and the unreserved characters that should not be escaped
+_REGEX_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})?")
+_UNRESERVED = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+# Regexes matching urls that are already canonical once joined to a canonical origin: a root-relative path or an http(s) url with a lowercase host,
+# made of characters allowed in paths and queries and escapes of characters that must stay escaped.
+# Wikipedia article paths must also have a canonical title, so one regex is used for pages on Wikipedia and one for pages elsewhere.
+_PCHARS = r"A-Za-z0-9\-._~!$&'()*+,;=:@/"
+_ESCAPE = r"%(?:[0189A-F][0-9A-F]|2[0-9A-CF]|3[A-F]|40|5[B-E]|60|7[B-DF])"
+_WIKI_TITLE = r"(?!/wiki/(?:[a-z]|[^?]*%20))"
+_CANONICAL = (r"(?:https?://(?:[a-z0-9\-.]*[a-z0-9](?<!\.wikipedia\.org)|[a-z0-9\-.]*\.wikipedia\.org" + _WIKI_TITLE + ")|{relative})"
+              rf"/(?!/)[{_PCHARS}]*(?:{_ESCAPE}[{_PCHARS}]*)*"
+              rf"(?:\?(?=.)[?{_PCHARS}]*(?:{_ESCAPE}[?{_PCHARS}]*)*)?")
+_REGEX_CANONICAL = re.compile(_CANONICAL.format(relative=''))
+_REGEX_CANONICAL_WIKI = re.compile(_CANONICAL.format(relative=_WIKI_TITLE))
+
+# Regexes to find the <base href> of a page, and the end of the head where it must appear
+_REGEX_BASE = re.compile(r"<base\s[^>]*?href\s*=\s*['\"]([^'\"]*)['\"]", flags=re.IGNORECASE)
+_REGEX_HEAD_END = re.compile(r"</head\s*>|<body[\s>]", flags=re.IGNORECASE)
+
+# The same regexes, to search html as bytes (in an ASCII compatible encoding) without decoding it
+_REGEX_BASE_BYTES = re.compile(_REGEX_BASE.pattern.encode('ascii'), flags=re.IGNORECASE)
+_REGEX_HEAD_END_BYTES = re.compile(_REGEX_HEAD_END.pattern.encode('ascii'), flags=re.IGNORECASE)
+
+def _unescape(match):
+    '''
+    Returns the character of an escape if it is unreserved, else the escape with uppercase hex digits.
+    A '%' that does not start a valid escape is escaped itself ('%25'), so it cannot form an escape with the characters after it.
+    '''
+    if match.group(1) is None:
+        return '%25'
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else match.group().upper()
+
+def _normalize_percent(text, safe):
+    '''
+    Normalizes the percent-encoding of a url component: unreserved characters are unescaped, escapes get uppercase hex digits,
+    and characters that are not allowed in the component (spaces, non-ASCII, '%' not starting an escape, ...) are escaped.
+    Normalizing a normalized component leaves it as it is.
+
+    Args:
+        text:   The url component (path or query).
+        safe:   The characters allowed unescaped in the component.
+    Returns:
+        <String>:   The normalized component.
+    '''
+    if '%' in text:
+        text = _REGEX_ESCAPE.sub(_unescape, text)
+    return quote(text, safe=safe)
+
+@lru_cache(maxsize=4096)
+def _normalize_netloc(scheme, netloc):
+    '''
+    Lowercases the host of a netloc and drops the port if it is the default port of the scheme.
+    Memoized and interned, as a page links to only a few hosts.
+
+    Args:
+        scheme: The (lowercase) scheme of the url.
+        netloc: The netloc of the url ([userinfo@]host[:port]).
+    Returns:
+        <String>:   The normalized netloc.
+    '''
+    (userinfo, at, hostport) = netloc.rpartition('@')
+    (host, colon, port) = hostport.rpartition(':') if not hostport.endswith(']') else (hostport, '', '')
+    if not colon or not port.isdigit():
+        (host, port) = (hostport, '')
+    host = host.lower().rstrip('.')
+    if port and port != _DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+    return sys.intern(f'{userinfo}{at}{host}')
+
+def _wiki_title(title):
+    '''
+    Formats a Wikipedia article title as in its canonical url: spaces as underscores, and an uppercase first letter.
+
+    Args:
+        title:  The title part of a /wiki/ path.
+    Returns:
+        <String>:   The canonical title.
+    '''
+    title = title.replace(' ', '_').replace('%20', '_')
+    if title[:1].islower():
+        title = title[0].upper() + title[1:]
+    return title
+
+def normalize_url(url, keepFragment=False):
+    '''
+    Returns the canonical form of an absolute url, so equal urls compare equal as strings.
+    Lowercases scheme and host, drops default ports, normalizes percent-encoding and empty paths,
+    and formats Wikipedia article urls (/wiki/Title) with the canonical title.
+
+    Args:
+        url:            The absolute url to normalize.
+        keepFragment:   (Optional) Whether to keep the '#fragment' of the url. Defaults to False.
+    Returns:
+        <String>:   The canonical url.
+    '''
+    (scheme, netloc, path, query, fragment) = urlsplit(url)
+    scheme = scheme.lower()
+    netloc = _normalize_netloc(scheme, netloc)
+
+    if netloc.endswith('.wikipedia.org') and path.startswith('/wiki/'):
+        path = '/wiki/' + _wiki_title(path[6:])
+    path = _normalize_percent(path, _PATH_SAFE)
+    if not path and netloc and scheme in _DEFAULT_PORTS:
+        path = '/'
+    query = _normalize_percent(query, _QUERY_SAFE)
+    fragment = _normalize_percent(fragment, _QUERY_SAFE) if keepFragment else ''
+
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+def resolve_url(base, ref):
+    '''
+    Resolves a (possibly relative) url against the url of the page it was found on, following RFC 3986,
+    and returns it in canonical form (see normalize_url()). Handles '/', '//', './', '../' and query-only ('?') references.
+    Character references in the url (as in 'a=1&amp;b=2') are unescaped first.
+
+    Args:
+        base:   The url of the page (or its <base href>, see find_base()).
+        ref:    The url as written in the page.
+    Returns:
+        <String>:   The canonical absolute url.
+    '''
+    if '&' in ref:
+        ref = unescape(ref)
+    return normalize_url(urljoin(base, ref.strip()))
+
+@lru_cache(maxsize=256)
+def _origin(base):
+    '''
+    Returns the canonical 'scheme://host' of a base url, or None if it is not an http(s) url.
+    '''
+    (scheme, netloc, _, _, _) = urlsplit(base)
+    if scheme.lower() not in _DEFAULT_PORTS or not netloc:
+        return None
+    return f'{scheme.lower()}://{_normalize_netloc(scheme.lower(), netloc)}'
+
+def resolve_urls(base, refs):
+    '''
+    Bulk version of resolve_url(). Resolves and normalizes a list of urls found on one page.
+    Each distinct url is only resolved once, as pages repeat the same links many times.
+
+    Args:
+        base:   The url of the page (or its <base href>, see find_base()).
+        refs:   The urls as written in the page.
+    Returns:
+        <Array<String>> urls:   The canonical absolute urls, in the same order as 'refs'.
+    '''
+    origin = _origin(base)
+    canonical = _REGEX_CANONICAL_WIKI if origin is not None and origin.endswith('.wikipedia.org') else _REGEX_CANONICAL
+    resolved = {}
+    urls = []
+    for ref in refs:
+        url = resolved.get(ref)
+        if url is None:
+            # Fast path: urls that only need the origin prepended (if root-relative) to be canonical
+            if origin is not None and canonical.fullmatch(ref) is not None and '/.' not in ref and '&' not in ref:
+                url = origin + ref if ref[0] == '/' else ref
+            else:
+                url = resolve_url(base, ref)
+            resolved[ref] = url
+        urls.append(url)
+    return urls
+
+def find_base(url, html, encoding='utf-8'):
+    '''
+    Returns the url relative urls on a page resolve against: the page's <base href> (itself resolved against url) if it has one, else url.
+    Only the head of the html is searched.
+
+    Args:
+        url:        The url from which the html is retrieved.
+        html:       The html of the page (or at least its head), as a string, or as bytes in an ASCII compatible encoding.
+        encoding:   (Optional) The encoding of html, if bytes. Defaults to 'utf-8'.
+    Returns:
+        <String>:   The base url of the page.
+    '''
+    (regexBase, regexHeadEnd) = (_REGEX_BASE, _REGEX_HEAD_END) if isinstance(html, str) else (_REGEX_BASE_BYTES, _REGEX_HEAD_END_BYTES)
+    headEnd = regexHeadEnd.search(html)
+    match = regexBase.search(html, 0, headEnd.start() if headEnd is not None else len(html))
+    if match is None:
+        return url
+    href = match.group(1)
+    href = (href if isinstance(href, str) else bytes(href).decode(encoding, errors='replace')).strip()
+    return urljoin(url, unescape(href)) if href else url
+
+def head_complete(html):
+    '''
+    Returns whether html contains the end of the head, i.e. whether find_base() can be called on it.
+
+    Args:
+        html:   The start of the html of a page.
+    Returns:
+        <bool>: True if the end of the head has been seen.
+    '''
+    return _REGEX_HEAD_END.search(html) is not None
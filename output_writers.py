@@ -0,0 +1,335 @@
+# output_writers.py
+
+from abc import ABC, abstractmethod
+import csv
+import glob
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import threading
+
+# Buffer size of the files written, so records reach the file system in large blocks
+BUFFER_SIZE = 1024 * 1024
+
+# Formats and compressions by file extension
+FORMATS = {'.jsonl': 'jsonl', '.json': 'jsonl', '.csv': 'csv', '.parquet': 'parquet'}
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+
+def output_format(path):
+    '''
+    Returns the (format, compression) of an output path, from its extensions.
+    Formats are 'jsonl', 'csv', 'parquet' and 'text' (any other extension); compressions are 'gzip' (.gz), 'zstd' (.zst) or None.
+
+    Args:
+        path:   The output path, e.g. 'urls.jsonl.gz'.
+    Returns:
+        <Tuple<String, String>> (format, compression):  The format and compression.
+    '''
+    (root, extension) = os.path.splitext(path)
+    compression = COMPRESSIONS.get(extension.lower())
+    if compression is not None:
+        (root, extension) = os.path.splitext(root)
+    return (FORMATS.get(extension.lower(), 'text'), compression)
+
+class Sink(ABC):
+    '''
+    Buffered, atomic writer of one output file. Abstract: the format subclasses implement write_many(). Records are written to a temporary file next to the target,
+    which replaces the target only when the sink is closed without error. When appending, the target and the new records are copied to a second
+    temporary file, which then replaces the target, so appending costs a copy of the existing file but readers never see half of it.
+    A sink that fails half way leaves the target as it was.
+
+    Args:
+        path:           The file to write.
+        append:         (Optional) Whether to append to the file if it exists, instead of replacing it. Defaults to False.
+        compression:    (Optional) 'gzip', 'zstd' or None. Defaults to None (from the extension of path).
+    '''
+    extension = ''
+
+    def __init__(self, path, append=False, compression=None):
+        self.path = path
+        self.append = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.compression = compression if compression is not None else output_format(path)[1]
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        self._raw = open(self._temp, 'wb', buffering=BUFFER_SIZE)
+        self._file = self._open_text(self._raw)
+
+    def _open_text(self, raw):
+        '''
+        Returns a text stream over the raw temporary file, compressed if the sink is.
+        '''
+        if self.compression == 'gzip':
+            stream = gzip.GzipFile(fileobj=raw, mode='wb')
+        elif self.compression == 'zstd':
+            import zstandard
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+        else:
+            stream = raw
+        return io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=False)
+
+    def write(self, record):
+        '''
+        Writes one record.
+        '''
+        self.write_many([record])
+
+    @abstractmethod
+    def write_many(self, records):
+        '''
+        Writes records.
+        '''
+
+    def close(self):
+        '''
+        Finishes the file, and moves it into place.
+        '''
+        self._finish()
+        self._file.close()
+        if self._file.buffer is not self._raw:
+            self._raw.close()
+        if self.append:
+            # Compressed streams (gzip members, zstd frames) may be concatenated, so appending is a plain byte copy
+            merged = f'{self._temp}.append'
+            try:
+                with open(merged, 'wb', buffering=BUFFER_SIZE) as target:
+                    for path in (self.path, self._temp):
+                        with open(path, 'rb') as source:
+                            shutil.copyfileobj(source, target, BUFFER_SIZE)
+                os.replace(merged, self.path)
+            finally:
+                for path in (merged, self._temp):
+                    if os.path.exists(path):
+                        os.remove(path)
+        else:
+            os.replace(self._temp, self.path)
+
+    def abort(self):
+        '''
+        Discards what was written, leaving the target as it was.
+        '''
+        try:
+            self._file.close()
+            self._raw.close()
+        finally:
+            if os.path.exists(self._temp):
+                os.remove(self._temp)
+
+    def _finish(self):
+        '''
+        Writes whatever the format needs at the end of the file.
+        '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+
+class TextSink(Sink):
+    '''
+    Sink writing records (strings) as lines of text.
+    '''
+    extension = '.txt'
+
+    def write_many(self, records):
+        for record in records:
+            self._file.write(record)
+            self._file.write('\n')
+            self.count += 1
+
+class JsonlSink(Sink):
+    '''
+    Sink writing records (anything JSON serializable) as JSON lines.
+    '''
+    extension = '.jsonl'
+
+    def write_many(self, records):
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write('\n')
+            self.count += 1
+
+class CsvSink(Sink):
+    '''
+    Sink writing records (dicts) as csv rows. The columns are the given ones, or else the keys of the first record, written as a header row
+    (unless appending to a file that already has one). With columns given, the header is written even if there are no records.
+    '''
+    extension = '.csv'
+
+    def __init__(self, path, append=False, compression=None, columns=None):
+        super().__init__(path, append=append, compression=compression)
+        self.columns = columns
+        self._writer = None
+
+    def _start(self, columns):
+        self._writer = csv.DictWriter(self._file, fieldnames=list(columns), extrasaction='ignore')
+        if not self.append:
+            self._writer.writeheader()
+
+    def write_many(self, records):
+        for record in records:
+            if self._writer is None:
+                self._start(self.columns or record)
+            self._writer.writerow(record)
+            self.count += 1
+
+    def _finish(self):
+        if self._writer is None and self.columns:
+            self._start(self.columns)
+
+class ParquetSink(Sink):
+    '''
+    Sink writing records (dicts) as a parquet file, in row groups of 'rowGroupSize' records. Requires pyarrow.
+    Parquet files cannot be appended to: use a ShardedSink to add to a parquet dataset across runs.
+    '''
+    extension = '.parquet'
+
+    def __init__(self, path, append=False, compression=None, rowGroupSize=65536):
+        if append and os.path.exists(path):
+            raise ValueError('parquet files cannot be appended to, write to a ShardedSink instead')
+        import pyarrow.parquet
+        self._parquet = pyarrow.parquet
+        self.rowGroupSize = rowGroupSize
+        self._rows = []
+        self._writer = None
+        super().__init__(path, compression=compression)
+
+    def _open_text(self, raw):
+        return raw
+
+    def write_many(self, records):
+        for record in records:
+            self._rows.append(record)
+            self.count += 1
+            if len(self._rows) >= self.rowGroupSize:
+                self._flush()
+
+    def _flush(self):
+        '''
+        Writes the buffered records as a row group.
+        '''
+        if not self._rows:
+            return
+        import pyarrow
+        table = pyarrow.Table.from_pylist(self._rows)
+        if self._writer is None:
+            self._writer = self._parquet.ParquetWriter(self._raw, table.schema, compression=self.compression or 'snappy')
+        self._writer.write_table(table)
+        self._rows = []
+
+    def _finish(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+    def close(self):
+        self._finish()
+        self._raw.close()
+        os.replace(self._temp, self.path)
+
+SINKS = {'text': TextSink, 'jsonl': JsonlSink, 'csv': CsvSink, 'parquet': ParquetSink}
+
+def open_sink(path, append=False):
+    '''
+    Opens the sink for an output path, picking the format and compression from its extensions (see output_format()).
+    Use as a context manager, so the file is only moved into place if all records were written.
+
+    Args:
+        path:   The file to write, e.g. 'dates.csv', 'urls.jsonl.gz' or 'page.txt.zst'.
+        append: (Optional) Whether to append to the file if it exists. Defaults to False.
+    Returns:
+        <Sink> sink:    The sink.
+    '''
+    (format, compression) = output_format(path)
+    if format == 'parquet':
+        return ParquetSink(path, append=append)
+    return SINKS[format](path, append=append, compression=compression)
+
+class ShardedSink:
+    '''
+    Writes records to a directory of shard files ('part-00000.jsonl', 'part-00001.jsonl', ...), starting a new shard every 'maxRecords' records.
+    Numbering continues after the shards already in the directory, so every run adds to the dataset without rewriting it.
+    Each shard is written atomically (see Sink).
+
+    Args:
+        directory:  The directory of the shards.
+        extension:  (Optional) The extension of the shards, which sets their format (see output_format()). Defaults to '.jsonl'.
+        maxRecords: (Optional) The number of records per shard. Defaults to 100000.
+    '''
+    def __init__(self, directory, extension='.jsonl', maxRecords=100000):
+        self.directory = directory
+        self.extension = extension
+        self.maxRecords = maxRecords
+        self.paths = []
+        self._sink = None
+        os.makedirs(directory, exist_ok=True)
+        numbers = [int(match.group(1)) for match in (re.match(r"part-(\d+)", os.path.basename(path))
+                   for path in glob.glob(os.path.join(directory, 'part-*'))) if match]
+        self._next = max(numbers, default=-1) + 1
+
+    def write(self, record):
+        '''
+        Writes one record.
+        '''
+        self.write_many([record])
+
+    def write_many(self, records):
+        '''
+        Writes records.
+        '''
+        for record in records:
+            if self._sink is None:
+                path = os.path.join(self.directory, f'part-{self._next:05d}{self.extension}')
+                self._sink = open_sink(path)
+                self.paths.append(path)
+                self._next += 1
+            self._sink.write(record)
+            if self._sink.count >= self.maxRecords:
+                self._sink.close()
+                self._sink = None
+
+    def close(self):
+        '''
+        Finishes the current shard.
+        '''
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def abort(self):
+        '''
+        Discards the current shard. Finished shards are kept.
+        '''
+        if self._sink is not None:
+            self._sink.abort()
+            self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.abort()
+
+def save(path, lines, records, append=False):
+    '''
+    Saves an output file in the format of its extension: 'lines' for text files, 'records' for structured (jsonl, csv, parquet) files.
+    Both are iterated lazily, so only the one the format needs is built.
+
+    Args:
+        path:       The file to write.
+        lines:      The lines of the text format (an iterable of strings, without newlines).
+        records:    The records of the structured formats (an iterable of dicts).
+        append:     (Optional) Whether to append to the file if it exists. Defaults to False.
+    '''
+    with open_sink(path, append=append) as sink:
+        sink.write_many(lines if output_format(path)[0] == 'text' else records)
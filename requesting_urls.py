@@ -1,31 +1,593 @@
 # requesting_urls.py
 
+import codecs
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 import requests as req
+from requests.adapters import HTTPAdapter
+import instrumentation
+import output_writers
+from response_cache import ResponseCache
+
+# Connection pool sizing for the shared session. POOL_MAXSIZE is the number of keep-alive connections kept per host,
+# and should be at least PER_HOST_LIMIT so concurrent requests to the same host never discard pooled connections.
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 16
+PER_HOST_LIMIT = 8
+
+# Number of worker threads shared by get_html_async() calls not given an executor, i.e. the bound on their requests in flight.
+# The coroutines are a thread-backed shim over the blocking requests session (no asyncio http client is a dependency):
+# each request in flight holds a thread. get_many_async() runs on a pool of its own, sized to its 'concurrency'.
+ASYNC_CONCURRENCY = 128
+
+# (connect, read) timeouts in seconds of every request
+TIMEOUT = (5, 30)
+
+# Retries of requests that time out, fail to connect, or get a status in RETRY_STATUSES, with jittered exponential backoff:
+# retry n waits a random time up to min(BACKOFF_MAX, BACKOFF * 2 ** n) seconds, or as long as the server's Retry-After asks.
+# A Retry-After longer than BACKOFF_MAX is not waited for: the request fails at once.
+RETRIES = 4
+BACKOFF = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# Per-host circuit breaker: after BREAKER_THRESHOLD failed requests in a row to a host (each after all its retries), requests to it fail at once for BREAKER_COOLDOWN seconds,
+# after which a single request is let through to probe whether the host recovered.
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+
+# Regexes to find the charset of a page in its Content-Type header, and in a <meta charset> or <meta http-equiv> tag of its start
+_REGEX_CHARSET = re.compile(r"charset\s*=\s*['\"]?([\w.:\-]+)", flags=re.IGNORECASE)
+_REGEX_META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*['\"]?([\w.:\-]+)", flags=re.IGNORECASE)
+
+# Number of bytes at the start of a page searched for a <meta> charset (as browsers do)
+SNIFF_BYTES = 1024
+
+_session = None
+_session_lock = threading.Lock()
+_host_semaphores = {}
+_breakers = {}
+_async_executor = None
+_cache = None
+
+def get_session():
+    '''
+    Returns the shared requests session used by all fetches in this module.
+    The session is created on first use and keeps connections alive between requests, so repeated fetches to the same host reuse one TCP/TLS connection.
+
+    Returns:
+        <Session> session:  The pooled keep-alive session.
+    '''
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = req.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+def enable_cache(directory='.cache', ttl=86400, maxBytes=512 * 1024 ** 2):
+    '''
+    Enables the on-disk response cache (see response_cache.ResponseCache) for all fetches in this module.
+    Cached pages younger than ttl are returned without a request, older ones are revalidated with a conditional get.
+
+    Args:
+        directory:  (Optional) The folder to keep the cache in. Defaults to '.cache'.
+        ttl:        (Optional) Seconds a page is served without revalidation. Defaults to 86400 (one day).
+        maxBytes:   (Optional) Byte budget for the compressed pages. Defaults to 512 MiB.
+    Returns:
+        <ResponseCache> cache:  The enabled cache.
+    '''
+    global _cache
+    _cache = ResponseCache(directory, ttl=ttl, maxBytes=maxBytes)
+    return _cache
+
+def disable_cache():
+    '''
+    Disables the response cache. The cached pages are kept on disk.
+    '''
+    global _cache
+    _cache = None
+
+class FetchFailure:
+    '''
+    A request that failed after all its retries, returned in place of its response by get_many(), iter_many() and get_many_async(),
+    so one failed page does not abort a batch. Falsy, like a response with an error status.
+
+    Attributes:
+        url:        The url requested.
+        reason:     Why the request failed: 'timeout', 'connection' (could not connect, or the connection broke), 'status' (the last
+                    response had a status in RETRY_STATUSES) or 'circuit_open' (the host failed too often recently, and was not requested).
+        status:     The status code of the last response, if reason is 'status'. Else None.
+        attempts:   The number of requests made.
+        error:      The exception of the last attempt, if any. Else None.
+    '''
+    __slots__ = ('url', 'reason', 'status', 'attempts', 'error')
+    ok = False
+
+    def __init__(self, url, reason, status=None, attempts=0, error=None):
+        self.url = url
+        self.reason = reason
+        self.status = status
+        self.attempts = attempts
+        self.error = error
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        detail = f' {self.status}' if self.status is not None else ''
+        return f'FetchFailure({self.url!r}, {self.reason}{detail}, attempts={self.attempts})'
+
+    def raise_for_status(self):
+        '''
+        Raises the failure as a FetchError (like Response.raise_for_status()).
+        '''
+        raise FetchError(self)
+
+class FetchError(req.exceptions.RequestException):
+    '''
+    Raised by get_html() (and get_html_async()) when a request failed after all its retries. Carries the FetchFailure.
+    '''
+    def __init__(self, failure):
+        super().__init__(f'{failure.reason} fetching {failure.url} after {failure.attempts} attempts' + (f' (status {failure.status})' if failure.status else ''))
+        self.failure = failure
+
+class CircuitBreaker:
+    '''
+    Circuit breaker of the requests to one host. Closed, it lets requests through and counts failures in a row;
+    after 'threshold' of them it opens, and refuses requests for 'cooldown' seconds. Then it lets a single probe through per 'cooldown':
+    the circuit closes again if the probe succeeds, and stays open if it fails. Thread safe.
+
+    Args:
+        threshold:  The number of failures in a row that open the circuit.
+        cooldown:   The number of seconds the circuit stays open.
+    '''
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._openUntil = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        '''
+        Returns whether a request may be made now.
+        '''
+        with self._lock:
+            if self._openUntil is None:
+                return True
+            now = time.monotonic()
+            if now < self._openUntil:
+                return False
+            # Let this request through as the probe, and refuse the others until the next cooldown
+            self._openUntil = now + self.cooldown
+            return True
+
+    def success(self):
+        '''
+        Records a successful request, closing the circuit.
+        '''
+        with self._lock:
+            (self.failures, self._openUntil) = (0, None)
+
+    def failure(self):
+        '''
+        Records a failed request, opening the circuit after 'threshold' failures in a row (or a failed probe).
+        '''
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self._openUntil = time.monotonic() + self.cooldown
+
+def _breaker(host):
+    '''
+    Returns the circuit breaker of a host.
+    '''
+    with _session_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+    return breaker
+
+def _retry_after(response):
+    '''
+    Returns the seconds to wait that the Retry-After header of a response asks for (in seconds or as an http date), or None.
+    '''
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def request(url, params=None, headers=None, stream=False):
+    '''
+    Requests url over the shared session with timeouts, retrying timeouts, connection errors and statuses in RETRY_STATUSES
+    with jittered exponential backoff (or after Retry-After), unless the circuit of the host is open.
+    Other responses, including 4xx errors other than 429, are returned as they are. The response cache is bypassed.
+    The encoding of the response is set from its headers or <meta> charset (see sniff_encoding()), so response.text never guesses.
+    The transfer is compressed with every encoding urllib3 can decode as it streams (gzip and deflate, and br if brotli is installed).
+
+    Args:
+        url:        The url to request.
+        params:     (Optional) Parameters to pass to the get function. Defaults to None.
+        headers:    (Optional) Headers to send. Defaults to None.
+        stream:     (Optional) Whether to return the response before its body is downloaded (as requests' stream=True).
+                    Its encoding is then left to the caller, which must close it. Defaults to False.
+    Returns:
+        <Response | FetchFailure> response: The response, or the failure if all attempts failed.
+    '''
+    session = get_session()
+    host = urlsplit(url).netloc.lower()
+    breaker = _breaker(host)
+    failure = None
+    for attempt in range(RETRIES + 1):
+        if not breaker.allow():
+            instrumentation.count('fetch.circuit_open', host=host)
+            failure = FetchFailure(url, 'circuit_open', attempts=attempt, error=failure.error if failure is not None else None)
+            break
+
+        delay = None
+        try:
+            response = session.get(url, params=params, headers=headers, stream=stream, timeout=TIMEOUT)
+        except req.exceptions.Timeout as error:
+            failure = FetchFailure(url, 'timeout', attempts=attempt + 1, error=error)
+        except req.exceptions.ConnectionError as error:
+            failure = FetchFailure(url, 'connection', attempts=attempt + 1, error=error)
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                breaker.success()
+                if not stream:
+                    response.encoding = sniff_encoding(response.headers.get('Content-Type'), response.content)
+                return response
+            failure = FetchFailure(url, 'status', status=response.status_code, attempts=attempt + 1)
+            delay = _retry_after(response)
+            response.close()
+
+        if attempt == RETRIES or (delay is not None and delay > BACKOFF_MAX):
+            break
+        instrumentation.count('fetch.retry', host=host)
+        time.sleep(delay if delay is not None else random.uniform(0, min(BACKOFF_MAX, BACKOFF * 2 ** attempt)))
+
+    # The breaker counts failed requests, not attempts, so the retries of one bad url cannot open the circuit of its whole host
+    if failure.attempts:
+        breaker.failure()
+        instrumentation.count('fetch.failure', host=host)
+    return failure
+
+def sniff_encoding(contentType, content=b''):
+    '''
+    Returns the encoding of a page: the charset of its Content-Type header, else the charset of a <meta> tag in its first SNIFF_BYTES bytes, else utf-8.
+    Never guesses from the bytes (as requests does with chardet when the header has no charset), so decoding costs a single pass.
+
+    Args:
+        contentType:    The Content-Type header of the response, or None.
+        content:        (Optional) The body of the response, or its start. Defaults to b''.
+    Returns:
+        <String> encoding:  The name of the encoding.
+    '''
+    for match in (_REGEX_CHARSET.search(contentType or ''), _REGEX_META_CHARSET.search(content[:SNIFF_BYTES])):
+        if match is not None:
+            encoding = match.group(1)
+            encoding = encoding.decode('ascii') if isinstance(encoding, bytes) else encoding
+            try:
+                return codecs.lookup(encoding).name
+            except LookupError:
+                pass
+    return 'utf-8'
+
+def ascii_compatible(encoding):
+    '''
+    Returns whether every ASCII character is encoded as its own single byte, and no other character uses bytes below 0x80 (utf-8 and single byte encodings).
+    Html in such an encoding can be searched for ASCII markup (tags, attributes, quotes) as bytes, without decoding it.
+    '''
+    try:
+        name = codecs.lookup(encoding or 'utf-8').name
+    except LookupError:
+        return False
+    return name in ('utf-8', 'ascii') or name.startswith(('iso8859-', 'cp125', 'latin', 'koi8', 'mac-'))
+
+def _host_semaphore(url, limit):
+    '''
+    Returns the semaphore limiting concurrent connections to the host of url.
+
+    Args:
+        url:    The url to be requested.
+        limit:  The maximum number of concurrent requests to the host.
+    Returns:
+        <BoundedSemaphore>: The semaphore shared by all requests to the host with the same limit.
+    '''
+    key = (urlsplit(url).netloc.lower(), limit)
+    with _session_lock:
+        semaphore = _host_semaphores.get(key)
+        if semaphore is None:
+            semaphore = _host_semaphores[key] = threading.BoundedSemaphore(limit)
+    return semaphore
 
 def get_html(url, params=None, output=None, saveToFolder='requesting_urls'):
     """
     Makes a url request of a given website.
     If argument 'params' is specified, parameters are passed in the get request.
     If argument 'output' is specified, the response url and text will be saved to a text file with a specified name output.txt.
+    Other extensions of output save the {'url', 'text'} record in that format instead (see output_writers), e.g. 'output.jsonl' or 'output.txt.gz'.
     If the specified output filename already exists, it overwrites the content.
     Output folder can be specified as saveToFolder, but defaults to requesting_urls
     If no output argument is given, the response is simply returned.
+    Requests time out after TIMEOUT, and timeouts, connection errors, 429 and 5xx responses are retried (see RETRIES).
+    If the request still fails, FetchError is raised (see get_many() for a version returning failures instead).
 
     Args:
         url:            The url from which the html is retrieved.
         params:         (Optional) Parameters to pass to the get function. Defaults to None.
-        output:         (Optional) The filename (format as 'output.txt') for where to save the response url and text. Defaults to None.
+        output:         (Optional) The filename (format as 'output.txt', or any format of output_writers) for where to save the response url and text. Defaults to None.
         saveToFolder:   (Optional) The folder for where to save the output file. Defaults to 'requesting_urls'
     Returns:
         <Response> response: The html response from the request on the url.
     """
-    response = req.get(url, params=params)
+    response = _fetch(url, params)
+    if isinstance(response, FetchFailure):
+        raise FetchError(response)
+    _save(response, output, saveToFolder)
+    return response
+
+def iter_text(url, params=None, chunkSize=65536):
+    '''
+    Makes a streaming url request of a given website, and yields the decoded text of the response as it is downloaded.
+    The whole page is never held in memory, and the response cache is bypassed.
+    The request is made with request(), so it is retried (and refused while the circuit of its host is open) like every other fetch,
+    and FetchError is raised before any text is yielded if it still fails. The text is decoded in the charset of the headers,
+    else of a <meta> tag in the first chunk (see sniff_encoding()).
+
+    Args:
+        url:        The url from which the html is retrieved.
+        params:     (Optional) Parameters to pass to the get function. Defaults to None.
+        chunkSize:  (Optional) The number of bytes to read at a time. Defaults to 65536.
+    Yields:
+        <String> text:  The next chunk of decoded text.
+    '''
+    response = request(url, params=params, stream=True)
+    if isinstance(response, FetchFailure):
+        raise FetchError(response)
+    with response:
+        chunks = response.iter_content(chunk_size=max(chunkSize, SNIFF_BYTES))
+        first = next(chunks, b'')
+        decoder = codecs.getincrementaldecoder(sniff_encoding(response.headers.get('Content-Type'), first))(errors='replace')
+        for chunk in itertools.chain([first], chunks):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield text
+
+def _fetch(url, params=None, refresh=False):
+    '''
+    Performs the request of url over the shared session (with retries, see request()), through the response cache if it is enabled.
+    This is the single fetch path used by get_html(), get_html_async() and get_many(). A cached page that could not be revalidated is served stale.
+    Reports the 'fetch' stage per host, and the 'cache.hit', 'cache.revalidated', 'cache.stale' and 'cache.miss' counters (see instrumentation).
+
+    Args:
+        url:        The url from which the html is retrieved.
+        params:     (Optional) Parameters to pass to the get function. Defaults to None.
+        refresh:    (Optional) Whether to request the page unconditionally even if it is cached (e.g. when it is known to have changed).
+                    The response still replaces the cached page, but a failed request is not served from the cache. Defaults to False.
+    Returns:
+        <Response | FetchFailure> response: The html response from the request on the url, or the failure if the request failed.
+    '''
+    with instrumentation.stage('fetch', host=urlsplit(url).netloc.lower()):
+        cache = _cache
+        if cache is None:
+            return request(url, params=params)
 
+        key = req.Request('GET', url, params=params).prepare().url
+        (cached, fresh) = cache.lookup(key) if not refresh else (None, False)
+        if fresh:
+            instrumentation.count('cache.hit')
+            return cached
+
+        headers = cache.validators(cached) if cached is not None else None
+        response = request(key, headers=headers)
+        if isinstance(response, FetchFailure):
+            if cached is not None:
+                instrumentation.count('cache.stale')
+                return cached
+            return response
+        if response.status_code == 304 and cached is not None:
+            instrumentation.count('cache.revalidated')
+            cache.refresh(key)
+            return cached
+        instrumentation.count('cache.miss')
+        if response.status_code == 200:
+            cache.store(key, response)
+        return response
+
+def _save(response, output, saveToFolder):
+    '''
+    Saves the response url and text to ./saveToFolder/output, if output is specified. Text files are formatted as 'URL: <url>\nTEXT:\n<html>'.
+    The header and the html are written as separate lines, so the html is not copied into one more string.
+
+    Args:
+        response:       The response to save.
+        output:         The filename for where to save the response, or None to not save.
+        saveToFolder:   The folder for where to save the output file.
+    '''
     if output is not None:
-        with open (f'./{saveToFolder}/{output}', 'w', encoding='utf-8') as f:
-            f.write(f'URL: {response.url}\nTEXT:\n{response.text}')
+        text = response.text
+        output_writers.save(os.path.join(saveToFolder, output), [f'URL: {response.url}\nTEXT:', text], [{'url': response.url, 'text': text}])
+
+def _get_async_executor():
+    '''
+    Returns the thread pool that runs blocking session requests on behalf of the coroutine fetches (see get_html_async()).
+    '''
+    global _async_executor
+    if _async_executor is None:
+        with _session_lock:
+            if _async_executor is None:
+                _async_executor = ThreadPoolExecutor(max_workers=ASYNC_CONCURRENCY, thread_name_prefix='requesting_urls')
+    return _async_executor
+
+class RateLimiter:
+    '''
+    Per-host rate limiter for coroutines. Spaces out the start of requests to each host so no more than 'rate' requests per second are started.
+    A limiter must only be used from one event loop.
+
+    Args:
+        rate:   The maximum number of requests per second to a single host.
+    '''
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = {}
+
+    async def wait(self, url):
+        '''
+        Waits until a request to the host of url may be started.
+
+        Args:
+            url:    The url to be requested.
+        '''
+        import asyncio
+        host = urlsplit(url).netloc.lower()
+        now = time.monotonic()
+        start = max(now, self._next.get(host, now))
+        self._next[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+async def get_html_async(url, params=None, output=None, saveToFolder='requesting_urls', semaphore=None, limiter=None, executor=None):
+    '''
+    Coroutine version of get_html(). Makes a url request of a given website without blocking the event loop.
+    This is a thread-backed shim, not a native asyncio client: the request runs on the blocking session in a worker thread
+    (of executor, or of a shared pool of ASYNC_CONCURRENCY threads), which it holds until the response is downloaded.
+    It lets coroutines share the retries, circuit breakers and cache of get_html(), but requests in flight are bounded by the worker threads.
+    If a semaphore is given, it is held for the duration of the request, bounding the number of requests in flight.
+    If a limiter (RateLimiter) is given, the request waits for its turn to the host before being started.
+    Like get_html(), raises FetchError if the request fails after all its retries.
+
+    Args:
+        url:            The url from which the html is retrieved.
+        params:         (Optional) Parameters to pass to the get function. Defaults to None.
+        output:         (Optional) The filename (format as 'output.txt', or any format of output_writers) for where to save the response url and text. Defaults to None.
+        saveToFolder:   (Optional) The folder for where to save the output file. Defaults to 'requesting_urls'
+        semaphore:      (Optional) An asyncio.Semaphore bounding concurrent requests. Defaults to None.
+        limiter:        (Optional) A RateLimiter spacing out requests per host. Defaults to None.
+        executor:       (Optional) The thread pool to run the request on. Defaults to None (the shared pool of ASYNC_CONCURRENCY threads).
+    Returns:
+        <Response> response: The html response from the request on the url.
+    '''
+    if semaphore is not None:
+        async with semaphore:
+            return await get_html_async(url, params=params, output=output, saveToFolder=saveToFolder, limiter=limiter, executor=executor)
+
+    import asyncio
+    if limiter is not None:
+        await limiter.wait(url)
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(executor or _get_async_executor(), _fetch, url, params)
+    if isinstance(response, FetchFailure):
+        raise FetchError(response)
+    _save(response, output, saveToFolder)
     return response
 
+async def get_many_async(urls, params=None, concurrency=64, perHost=PER_HOST_LIMIT, rate=None):
+    '''
+    Coroutine version of get_many(). Requests a list of urls concurrently, and returns the responses in the same order as 'urls'.
+    Like get_html_async(), it is backed by worker threads: a pool of 'concurrency' threads (at most one per url) is started for the call,
+    so that many requests are really in flight at once, each holding a thread.
+    Requests that fail after all their retries give a FetchFailure in place of their response.
+
+    Args:
+        urls:           The urls from which the html is retrieved.
+        params:         (Optional) Parameters to pass to every get request. Defaults to None.
+        concurrency:    (Optional) The maximum number of requests in flight. Defaults to 64.
+        perHost:        (Optional) The maximum number of requests in flight to a single host. Defaults to PER_HOST_LIMIT.
+        rate:           (Optional) The maximum number of requests started per second to a single host. Defaults to None (unlimited).
+    Returns:
+        <Array<Response | FetchFailure>> responses: The responses (or failures), in the same order as 'urls'.
+    '''
+    import asyncio
+    urls = list(urls)
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate) if rate else None
+    hosts = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(urls))), thread_name_prefix='requesting_urls')
+
+    async def fetch(url):
+        host = urlsplit(url).netloc.lower()
+        if host not in hosts:
+            hosts[host] = asyncio.Semaphore(perHost)
+        async with hosts[host]:
+            try:
+                return await get_html_async(url, params=params, semaphore=semaphore, limiter=limiter, executor=executor)
+            except FetchError as error:
+                return error.failure
+
+    try:
+        return await asyncio.gather(*(fetch(url) for url in urls))
+    finally:
+        executor.shutdown(wait=False)
+
+def iter_many(urls, params=None, concurrency=8, perHost=PER_HOST_LIMIT, refresh=False):
+    '''
+    Requests a list of urls concurrently over the shared session, and yields each response as soon as it completes.
+    Responses are yielded in completion order together with the index of their url in 'urls'.
+    At most 'concurrency' requests are in flight at once, and at most 'perHost' of them to the same host.
+    Requests that fail after all their retries give a FetchFailure in place of their response, so the other requests carry on.
+
+    Args:
+        urls:           The urls from which the html is retrieved.
+        params:         (Optional) Parameters to pass to every get request. Defaults to None.
+        concurrency:    (Optional) The maximum number of requests in flight. Defaults to 8.
+        perHost:        (Optional) The maximum number of requests in flight to a single host. Defaults to PER_HOST_LIMIT.
+        refresh:        (Optional) Whether to request the pages past the response cache, replacing what it holds for them. Defaults to False.
+    Yields:
+        <Tuple<int, Response | FetchFailure>> (index, response):    The index of the url in 'urls' and its response (or failure).
+    '''
+    def fetch(url):
+        with _host_semaphore(url, perHost):
+            return _fetch(url, params, refresh=refresh)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(fetch, url): index for index, url in enumerate(urls)}
+        for future in as_completed(futures):
+            yield (futures[future], future.result())
+
+def get_many(urls, params=None, concurrency=8, perHost=PER_HOST_LIMIT, refresh=False):
+    '''
+    Requests a list of urls concurrently over the shared session, and returns the responses in the same order as 'urls'.
+    Requests that fail after all their retries give a FetchFailure in place of their response, so the other requests carry on.
+
+    Args:
+        urls:           The urls from which the html is retrieved.
+        params:         (Optional) Parameters to pass to every get request. Defaults to None.
+        concurrency:    (Optional) The maximum number of requests in flight. Defaults to 8.
+        perHost:        (Optional) The maximum number of requests in flight to a single host. Defaults to PER_HOST_LIMIT.
+        refresh:        (Optional) Whether to request the pages past the response cache, replacing what it holds for them. Defaults to False.
+    Returns:
+        <Array<Response | FetchFailure>> responses: The responses (or failures), in the same order as 'urls'.
+    '''
+    urls = list(urls)
+    responses = [None] * len(urls)
+    for (index, response) in iter_many(urls, params=params, concurrency=concurrency, perHost=perHost, refresh=refresh):
+        responses[index] = response
+    return responses
+
 def test():
     """
     Makes a set of calls to get_html() with parameters given in an array of test arguments, 'tests'.
@@ -41,4 +603,5 @@ def test():
         get_html(url, params=params, output=output)
 
 if __name__ == '__main__':
-    test()
+    with instrumentation.profiling('--profile' in sys.argv):
+        test()
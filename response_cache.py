@@ -0,0 +1,190 @@
+# response_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import requests as req
+from requests.structures import CaseInsensitiveDict
+
+class ResponseCache:
+    '''
+    On-disk cache of http responses, used by requesting_urls.get_html() when enabled with requesting_urls.enable_cache().
+    Bodies are stored zlib compressed and content addressed (named by the sha256 of the body), so pages with identical bodies are stored once.
+    An index (sqlite) maps each request url to its body, validators (ETag / Last-Modified) and fetch and access times.
+    Entries younger than 'ttl' seconds are served without a request. Older entries are revalidated with a conditional get.
+    When the compressed bodies exceed 'maxBytes', the least recently used entries are evicted.
+
+    Args:
+        directory:  (Optional) The folder to keep the cache in. Defaults to '.cache'.
+        ttl:        (Optional) Seconds an entry is served without revalidation. Defaults to 86400 (one day).
+        maxBytes:   (Optional) Byte budget for the compressed bodies. Defaults to 512 MiB.
+    '''
+    def __init__(self, directory='.cache', ttl=86400, maxBytes=512 * 1024 ** 2):
+        self.directory = directory
+        self.ttl = ttl
+        self.maxBytes = maxBytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'bodies'), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY, digest TEXT NOT NULL, status INTEGER, headers TEXT, encoding TEXT,
+                etag TEXT, last_modified TEXT, fetched REAL, accessed REAL);
+            CREATE TABLE IF NOT EXISTS bodies (digest TEXT PRIMARY KEY, size INTEGER, refs INTEGER);
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+        ''')
+        self._db.commit()
+
+    def _path(self, digest):
+        '''
+        Returns the path of the compressed body with the given digest.
+        '''
+        return os.path.join(self.directory, 'bodies', digest[:2], digest + '.z')
+
+    def lookup(self, url):
+        '''
+        Looks up the cached response for url.
+
+        Args:
+            url:    The full request url (including query parameters).
+        Returns:
+            <Tuple<Response, bool>> (response, fresh):  The cached response and whether it is younger than ttl, or (None, False) if not cached.
+        '''
+        with self._lock:
+            row = self._db.execute('SELECT digest, status, headers, encoding, fetched FROM entries WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return (None, False)
+            (digest, status, headers, encoding, fetched) = row
+            try:
+                with open(self._path(digest), 'rb') as f:
+                    content = zlib.decompress(f.read())
+            except (OSError, zlib.error):
+                self._remove(url, digest)
+                self._db.commit()
+                return (None, False)
+            self._db.execute('UPDATE entries SET accessed = ? WHERE url = ?', (time.time(), url))
+            self._db.commit()
+
+        response = req.models.Response()
+        response.status_code = status
+        response.reason = 'OK'
+        response.url = url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = content
+        return (response, time.time() - fetched < self.ttl)
+
+    def validators(self, response):
+        '''
+        Returns the conditional request headers (If-None-Match / If-Modified-Since) to revalidate a cached response.
+
+        Args:
+            response:   The cached response.
+        Returns:
+            <Dict> headers: The headers to send with the revalidation request.
+        '''
+        headers = {}
+        if 'ETag' in response.headers:
+            headers['If-None-Match'] = response.headers['ETag']
+        if 'Last-Modified' in response.headers:
+            headers['If-Modified-Since'] = response.headers['Last-Modified']
+        return headers
+
+    def refresh(self, url):
+        '''
+        Marks the entry for url as fetched now, after the server answered a revalidation with 304 Not Modified.
+
+        Args:
+            url:    The full request url.
+        '''
+        with self._lock:
+            now = time.time()
+            self._db.execute('UPDATE entries SET fetched = ?, accessed = ? WHERE url = ?', (now, now, url))
+            self._db.commit()
+
+    def store(self, url, response):
+        '''
+        Stores a successful response in the cache under url, and evicts least recently used entries if over the byte budget.
+
+        Args:
+            url:        The full request url.
+            response:   The response to store.
+        '''
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        headers = {key: value for (key, value) in response.headers.items() if key.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')}
+
+        with self._lock:
+            if self._db.execute('SELECT 1 FROM bodies WHERE digest = ?', (digest,)).fetchone() is None:
+                compressed = zlib.compress(content)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp = f'{path}.{threading.get_ident()}.tmp'
+                with open(temp, 'wb') as f:
+                    f.write(compressed)
+                os.replace(temp, path)
+                self._db.execute('INSERT INTO bodies VALUES (?, ?, 0)', (digest, len(compressed)))
+
+            now = time.time()
+            old = self._db.execute('SELECT digest FROM entries WHERE url = ?', (url,)).fetchone()
+            if old is not None and old[0] == digest:
+                # Same body as before (e.g. an unchanged page fetched again after ttl): the entry keeps its reference to it
+                self._db.execute('UPDATE entries SET status = ?, headers = ?, encoding = ?, etag = ?, last_modified = ?, fetched = ?, accessed = ? WHERE url = ?',
+                                 (response.status_code, json.dumps(headers), response.encoding,
+                                  response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now, url))
+            else:
+                # Reference the new body before the old entry is removed, so a body shared with it is not deleted
+                self._db.execute('UPDATE bodies SET refs = refs + 1 WHERE digest = ?', (digest,))
+                if old is not None:
+                    self._remove(url, old[0])
+                self._db.execute('INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 (url, digest, response.status_code, json.dumps(headers), response.encoding,
+                                  response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now))
+            self._evict()
+            self._db.commit()
+
+    def _remove(self, url, digest):
+        '''
+        Removes the entry for url, and its body if no other entry refers to it. Must be called with the lock held.
+        '''
+        self._db.execute('DELETE FROM entries WHERE url = ?', (url,))
+        self._db.execute('UPDATE bodies SET refs = refs - 1 WHERE digest = ?', (digest,))
+        if self._db.execute('SELECT 1 FROM bodies WHERE digest = ? AND refs <= 0', (digest,)).fetchone() is not None:
+            self._db.execute('DELETE FROM bodies WHERE digest = ?', (digest,))
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+
+    def _evict(self):
+        '''
+        Evicts least recently used entries until the compressed bodies fit in maxBytes. Must be called with the lock held.
+        '''
+        (total,) = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()
+        if total <= self.maxBytes:
+            return
+        for (url, digest) in self._db.execute('SELECT url, digest FROM entries ORDER BY accessed').fetchall():
+            self._remove(url, digest)
+            (total,) = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()
+            if total <= self.maxBytes:
+                break
+
+    def size(self):
+        '''
+        Returns the total size in bytes of the compressed bodies in the cache.
+        '''
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM bodies').fetchone()[0]
+
+    def clear(self):
+        '''
+        Removes all entries and bodies from the cache.
+        '''
+        with self._lock:
+            for (url, digest) in self._db.execute('SELECT url, digest FROM entries').fetchall():
+                self._remove(url, digest)
+            self._db.commit()
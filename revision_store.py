@@ -0,0 +1,169 @@
+# revision_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+import instrumentation
+import requesting_urls
+
+class RevisionStore:
+    '''
+    On-disk store of values parsed out of Wikipedia pages, keyed by the page title and the revision id the value was parsed from.
+    Before pages are fetched, their current revision ids are asked from the MediaWiki API in batches (a single request per 50 pages),
+    and only the pages that changed since they were stored (or were never stored) are fetched and parsed again.
+    Values are stored as JSON, under a 'kind' naming the parser, so several parsers can share a store.
+
+    Args:
+        path:       (Optional) The sqlite file to keep the store in. Defaults to '.cache/revisions.sqlite'.
+        batchSize:  (Optional) The number of titles asked from the API per request (at most 50 for most clients). Defaults to 50.
+    '''
+    def __init__(self, path='.cache/revisions.sqlite', batchSize=50):
+        self.path = path
+        self.batchSize = batchSize
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS pages (
+                kind TEXT NOT NULL, title TEXT NOT NULL, revision INTEGER, value TEXT, stored REAL,
+                PRIMARY KEY (kind, title));
+        ''')
+        self._db.commit()
+
+    @staticmethod
+    def title(url):
+        '''
+        Returns the title of a Wikipedia article url, as the MediaWiki API writes it (spaces, not underscores).
+        '''
+        path = urlsplit(url).path
+        return unquote(path[len('/wiki/'):] if path.startswith('/wiki/') else path).replace('_', ' ')
+
+    def revisions(self, origin, titles):
+        '''
+        Asks the MediaWiki API for the current revision ids of pages. Redirects are followed, so a redirect gets the revision of its target.
+        The API is requested with requesting_urls.request(), bypassing the response cache, so the ids are always current.
+        Titles of a batch the API failed to answer are left out too, so their pages are fetched again rather than served from the store.
+
+        Args:
+            origin: The 'scheme://host' of the Wikipedia the pages are on.
+            titles: The titles of the pages.
+        Returns:
+            <Dict<String, int>> revisions:  The current revision id of each title. Missing (or unanswered) pages are left out.
+        '''
+        titles = list(dict.fromkeys(titles))
+        revisions = {}
+        for i in range(0, len(titles), self.batchSize):
+            batch = titles[i:i + self.batchSize]
+            params = {'action': 'query', 'prop': 'revisions', 'rvprop': 'ids', 'redirects': 1,
+                      'titles': '|'.join(batch), 'format': 'json', 'formatversion': 2}
+            with instrumentation.stage('revisions', host=urlsplit(origin).netloc):
+                response = requesting_urls.request(f'{origin}/w/api.php', params=params)
+            if not response:
+                continue
+            query = response.json().get('query', {})
+
+            current = {page['title']: page['revisions'][0]['revid'] for page in query.get('pages', []) if page.get('revisions')}
+            renames = {entry['from']: entry['to'] for entry in query.get('normalized', []) + query.get('redirects', [])}
+            for title in batch:
+                # Follow normalization and redirects (a chain of at most a few steps) to the page the API answered for
+                target = title
+                for _ in range(len(renames) + 1):
+                    if target not in renames:
+                        break
+                    target = renames[target]
+                if target in current:
+                    revisions[title] = current[target]
+        return revisions
+
+    def lookup(self, kind, title, revision):
+        '''
+        Looks up the value stored for a page at a revision.
+
+        Args:
+            kind:       The name of the parser the value is from.
+            title:      The title of the page.
+            revision:   The revision id the value must have been parsed from.
+        Returns:
+            <Tuple<bool, any>> (found, value):  Whether a value parsed from that revision is stored, and the value.
+        '''
+        with self._lock:
+            row = self._db.execute('SELECT revision, value FROM pages WHERE kind = ? AND title = ?', (kind, title)).fetchone()
+        if row is None or row[0] != revision:
+            return (False, None)
+        return (True, json.loads(row[1]))
+
+    def store(self, kind, title, revision, value):
+        '''
+        Stores the value parsed from a page at a revision, replacing what was stored for the page before.
+
+        Args:
+            kind:       The name of the parser the value is from.
+            title:      The title of the page.
+            revision:   The revision id the value was parsed from.
+            value:      The value (anything JSON serializable).
+        '''
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)', (kind, title, revision, json.dumps(value), time.time()))
+            self._db.commit()
+
+    def refresh(self, kind, urls, parse, parsePool=None, concurrency=8):
+        '''
+        Returns the value parse() gives for each page, re-fetching and re-parsing only the pages that changed since they were stored.
+        The current revisions are asked from the API in batches, the changed pages are fetched concurrently (see requesting_urls.get_many())
+        past the response cache, so a cached copy of an older revision is never parsed, and parsed on parsePool if given. Pages that could not be fetched give their requesting_urls.FetchFailure in place of a value, and are not stored.
+
+        Args:
+            kind:           The name of the parser, to store the values under.
+            urls:           The urls of the pages (Wikipedia articles, all on the same Wikipedia).
+            parse:          A function from the html of a page (bytes) to a JSON serializable value. Must be picklable if parsePool is given.
+            parsePool:      (Optional) An executor to parse the pages on, e.g. a ProcessPoolExecutor. Defaults to None (parse in this thread).
+            concurrency:    (Optional) The number of pages to fetch at once. Defaults to 8.
+        Returns:
+            <Array> values: The value (or FetchFailure) of each page, in the same order as 'urls'.
+        '''
+        urls = list(urls)
+        if not urls:
+            return []
+        (scheme, netloc, _, _, _) = urlsplit(urls[0])
+        titles = [self.title(url) for url in urls]
+        revisions = self.revisions(f'{scheme}://{netloc}', titles)
+
+        values = [None] * len(urls)
+        changed = []
+        for (index, title) in enumerate(titles):
+            (found, value) = self.lookup(kind, title, revisions.get(title))
+            if found and title in revisions:
+                values[index] = value
+            else:
+                changed.append(index)
+        instrumentation.count('revision_store.hit', len(urls) - len(changed), kind=kind)
+        instrumentation.count('revision_store.miss', len(changed), kind=kind)
+
+        # Changed pages are known to differ from what the response cache may hold for them, so they are requested past it
+        responses = requesting_urls.get_many([urls[index] for index in changed], concurrency=concurrency, refresh=True)
+        fetched = []
+        for (index, response) in zip(changed, responses):
+            if isinstance(response, requesting_urls.FetchFailure):
+                values[index] = response
+            else:
+                fetched.append(index)
+        contents = [response.content for response in responses if not isinstance(response, requesting_urls.FetchFailure)]
+        with instrumentation.stage('revision_store.parse', kind=kind):
+            parsed = list(parsePool.map(parse, contents) if parsePool is not None else map(parse, contents))
+        for (index, value) in zip(fetched, parsed):
+            values[index] = value
+            # Pages the API does not know the revision of are parsed every time
+            if titles[index] in revisions:
+                self.store(kind, titles[index], revisions[titles[index]], value)
+        return values
+
+    def clear(self):
+        '''
+        Removes all stored values.
+        '''
+        with self._lock:
+            self._db.execute('DELETE FROM pages')
+            self._db.commit()
@@ -0,0 +1,231 @@
+# statistics_table.py
+
+import numpy as np
+import output_writers
+
+# The columns of the player statistics extracted by fetch_playerstatistics
+CATEGORICAL = ('team', 'name')
+NUMERIC = ('ppg', 'bpg', 'rpg')
+
+class StatisticsTable:
+    '''
+    Columnar table of player statistics. Numeric columns are float64 NumPy arrays, with NaN for missing values.
+    Categorical columns (e.g. team and name) are int32 codes into a list of categories, so grouping by them is integer work.
+    Top-k, sorting and aggregation run vectorized over whole columns, so tables of thousands of players (and seasons) need no Python loops.
+
+    Args:
+        categorical:    A dict of column name to (codes, categories): an int array of codes, and the list of values they index.
+        numeric:        A dict of column name to a float array.
+    '''
+    def __init__(self, categorical, numeric):
+        self.categorical = {column: (np.asarray(codes, dtype=np.int32), list(categories)) for (column, (codes, categories)) in categorical.items()}
+        self.numeric = {column: np.asarray(values, dtype=np.float64) for (column, values) in numeric.items()}
+
+    @classmethod
+    def from_records(cls, records, categorical=CATEGORICAL, numeric=NUMERIC):
+        '''
+        Builds a table from a list of dicts (such as {'team', 'name', 'ppg', 'bpg', 'rpg'}), parsing numeric strings.
+        Empty or unparseable numeric values become NaN.
+
+        Args:
+            records:        The list of dicts.
+            categorical:    (Optional) The categorical columns. Defaults to CATEGORICAL.
+            numeric:        (Optional) The numeric columns. Defaults to NUMERIC.
+        Returns:
+            <StatisticsTable> table:    The table.
+        '''
+        records = list(records)
+        columns = {}
+        for column in categorical:
+            values = [record[column] for record in records]
+            categories = list(dict.fromkeys(values))
+            index = {value: code for (code, value) in enumerate(categories)}
+            columns[column] = ([index[value] for value in values], categories)
+        return cls(columns, {column: [_to_float(record.get(column)) for record in records] for column in numeric})
+
+    @classmethod
+    def concat(cls, tables):
+        '''
+        Concatenates tables with the same columns (e.g. the teams of a league, or several seasons), merging their categories.
+
+        Args:
+            tables: The tables. Tables that are None are skipped.
+        Returns:
+            <StatisticsTable> table:    The concatenated table.
+        '''
+        tables = [table for table in tables if table is not None]
+        if not tables:
+            return cls.from_records([])
+        categorical = {}
+        for column in tables[0].categorical:
+            categories = list(dict.fromkeys(value for table in tables for value in table.categorical[column][1]))
+            index = {value: code for (code, value) in enumerate(categories)}
+            codes = [np.array([index[value] for value in table.categorical[column][1]], dtype=np.int32)[table.categorical[column][0]]
+                     if len(table) else np.empty(0, dtype=np.int32) for table in tables]
+            categorical[column] = (np.concatenate(codes), categories)
+        numeric = {column: np.concatenate([table.numeric[column] for table in tables]) for column in tables[0].numeric}
+        return cls(categorical, numeric)
+
+    def __len__(self):
+        columns = list(self.numeric.values()) + [codes for (codes, _) in self.categorical.values()]
+        return len(columns[0]) if columns else 0
+
+    def __getitem__(self, column):
+        '''
+        Returns a column: the float array of a numeric column, or an array of the values of a categorical column.
+        '''
+        if column in self.numeric:
+            return self.numeric[column]
+        (codes, categories) = self.categorical[column]
+        return np.array(categories, dtype=object)[codes] if categories else np.empty(0, dtype=object)
+
+    def codes(self, column):
+        '''
+        Returns the codes and categories of a categorical column.
+        '''
+        return self.categorical[column]
+
+    def take(self, indices):
+        '''
+        Returns a table of the rows at the given indices (or boolean mask), in that order. Categories are kept.
+        '''
+        return StatisticsTable({column: (codes[indices], categories) for (column, (codes, categories)) in self.categorical.items()},
+                               {column: values[indices] for (column, values) in self.numeric.items()})
+
+    def _ranking(self, column):
+        '''
+        Returns the values of a numeric column to rank by: NaN (missing) ranks lowest.
+        '''
+        return np.where(np.isnan(self.numeric[column]), -np.inf, self.numeric[column])
+
+    def sort(self, column, descending=True):
+        '''
+        Returns the table sorted on a numeric column (stable, missing values last when descending).
+        '''
+        ranking = self._ranking(column)
+        order = np.argsort(-ranking if descending else ranking, kind='stable')
+        return self.take(order)
+
+    def top_k(self, column, k, by='team'):
+        '''
+        Returns the k rows with the highest values of a numeric column within each group of a categorical column.
+        Rows are ordered by group (in category order), then by descending value. Missing values rank lowest.
+
+        Args:
+            column: The numeric column to rank by.
+            k:      The number of rows to keep per group.
+            by:     (Optional) The categorical column to group by. Defaults to 'team'.
+        Returns:
+            <StatisticsTable> table:    The top rows of each group.
+        '''
+        (codes, _) = self.categorical[by]
+        ranking = self._ranking(column)
+
+        # Sort by group, then by descending value (lexsort sorts on the last key first), and keep the first k rows of each group
+        order = np.lexsort((np.arange(len(codes)), -ranking, codes))
+        sortedCodes = codes[order]
+        starts = np.searchsorted(sortedCodes, sortedCodes, side='left')
+        return self.take(order[np.arange(len(order)) - starts < k])
+
+    def top_k_overall(self, column, k):
+        '''
+        Returns the k rows with the highest values of a numeric column in the whole table, by descending value.
+        Uses partition to find the k-th highest value, so only the k selected rows are sorted. Ties keep table order (as a stable sort),
+        including among the rows tied at the k-th value.
+        '''
+        ranking = self._ranking(column)
+        if k <= 0:
+            selected = np.empty(0, dtype=np.int64)
+        elif k < len(ranking):
+            # argpartition would pick any of the rows tied at the k-th value: take all rows above it, and the first of the tied ones
+            threshold = np.partition(-ranking, k - 1)[k - 1]
+            above = np.flatnonzero(-ranking < threshold)
+            tied = np.flatnonzero(-ranking == threshold)[:k - len(above)]
+            selected = np.sort(np.concatenate([above, tied]))
+        else:
+            selected = np.arange(len(ranking))
+        return self.take(selected[np.argsort(-ranking[selected], kind='stable')])
+
+    def ranks(self, by='team'):
+        '''
+        Returns the position of each row within its group of a categorical column, for tables ordered by group (as top_k() returns).
+        '''
+        (codes, _) = self.categorical[by]
+        if not len(codes):
+            return np.empty(0, dtype=np.int64)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        return np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+
+    def aggregate(self, column, func='mean', by='team'):
+        '''
+        Aggregates a numeric column within each group of a categorical column. Missing values are ignored.
+
+        Args:
+            column: The numeric column to aggregate.
+            func:   (Optional) One of 'mean', 'sum', 'count', 'max' or 'min'. Defaults to 'mean'.
+            by:     (Optional) The categorical column to group by. Defaults to 'team'.
+        Returns:
+            <Dict<String, float>> values:   The aggregate of each group, in category order. NaN for groups with no values (except count).
+        '''
+        (codes, categories) = self.categorical[by]
+        values = self.numeric[column]
+        present = ~np.isnan(values)
+        counts = np.bincount(codes[present], minlength=len(categories)).astype(np.float64)
+        if func == 'count':
+            result = counts
+        elif func in ('sum', 'mean'):
+            sums = np.bincount(codes[present], weights=values[present], minlength=len(categories))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = sums if func == 'sum' else sums / counts
+        elif func in ('max', 'min'):
+            ufunc = np.fmax if func == 'max' else np.fmin
+            result = np.full(len(categories), np.nan)
+            ufunc.at(result, codes, values)
+        else:
+            raise ValueError(f"unknown aggregate '{func}'")
+        return dict(zip(categories, result.tolist()))
+
+    def to_records(self):
+        '''
+        Returns the rows as a list of dicts, with numeric values as floats (NaN for missing).
+        '''
+        columns = {column: self[column].tolist() for column in list(self.categorical) + list(self.numeric)}
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+    def to_csv(self, path):
+        '''
+        Writes the table to a csv file (compressed if path ends in e.g. '.csv.gz'), with a header row. Missing values are written as empty cells.
+        The file is replaced atomically (see output_writers.Sink).
+        '''
+        columns = list(self.categorical) + list(self.numeric)
+        with output_writers.CsvSink(path, columns=columns) as sink:
+            sink.write_many({column: '' if isinstance(value, float) and np.isnan(value) else value for (column, value) in record.items()}
+                            for record in self.to_records())
+
+    def to_arrow(self):
+        '''
+        Returns the table as a pyarrow Table, with categorical columns as dictionary arrays and missing values as nulls. Requires pyarrow.
+        '''
+        import pyarrow as pa
+        arrays = {}
+        for (column, (codes, categories)) in self.categorical.items():
+            arrays[column] = pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()), pa.array(categories, type=pa.string()))
+        for (column, values) in self.numeric.items():
+            arrays[column] = pa.array(values, mask=np.isnan(values))
+        return pa.table(arrays)
+
+    def to_parquet(self, path):
+        '''
+        Writes the table to a parquet file. Requires pyarrow.
+        '''
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path)
+
+def _to_float(value):
+    '''
+    Parses a statistic as a float. Returns NaN for missing or unparseable values.
+    '''
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,33 @@
+# conftest.py
+
+import os
+import sys
+import pytest
+
+# The modules live at the top of the repository, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class Responses:
+    '''
+    A page of a benchmark.FixtureServer answering its requests with the given (status, headers, body) tuples in turn,
+    and the last one to every request after them.
+    '''
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, path):
+        response = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        return response
+
+@pytest.fixture
+def fetching(monkeypatch):
+    '''
+    Makes the retries of requesting_urls fast, and gives the test fresh circuit breakers and no response cache.
+    '''
+    import requesting_urls
+    monkeypatch.setattr(requesting_urls, 'BACKOFF', 0.001)
+    monkeypatch.setattr(requesting_urls, '_breakers', {})
+    monkeypatch.setattr(requesting_urls, '_cache', None)
+    return requesting_urls
@@ -0,0 +1,47 @@
+# test_cli.py
+
+import gzip
+import json
+from benchmark import ORIGIN, FixtureServer
+from conftest import Responses
+import cli
+import crawler
+
+PAGE = (200, {'ETag': '"v1"'}, b'<html><body><a href="/wiki/Linked">Linked</a></body></html>')
+
+def test_fetch_with_cache_reuses_pages(fetching, tmp_path, capsys):
+    pages = {'/wiki/Page': Responses(PAGE)}
+    with FixtureServer(pages):
+        for _ in range(2):
+            cli.main(['fetch', f'{ORIGIN}/wiki/Page', '--cache', str(tmp_path / 'cache')])
+    assert capsys.readouterr().out.count('/wiki/Linked') == 2
+    assert pages['/wiki/Page'].calls == 1
+    assert fetching._cache is not None and fetching._cache.size() > 0
+
+def test_fetch_without_cache(fetching, tmp_path, capsys):
+    pages = {'/wiki/Page': Responses(PAGE)}
+    with FixtureServer(pages):
+        for _ in range(2):
+            cli.main(['fetch', f'{ORIGIN}/wiki/Page'])
+    assert pages['/wiki/Page'].calls == 2
+    assert fetching._cache is None
+
+def test_crawler_with_cache(fetching, tmp_path):
+    pages = {'/wiki/Page': Responses(PAGE)}
+    with FixtureServer(pages):
+        for run in range(2):
+            output = tmp_path / f'crawl{run}.jsonl'
+            crawler.main([f'{ORIGIN}/wiki/Page', '-s', str(tmp_path / f'state{run}'), '-d', '0', '-o', str(output),
+                          '--cache', str(tmp_path / 'cache')])
+            (record,) = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+            assert record['articles'] == [f'{ORIGIN}/wiki/Linked']
+    assert pages['/wiki/Page'].calls == 1
+
+def test_crawler_appends_records_of_every_run(fetching, tmp_path):
+    pages = {'/wiki/Page': Responses(PAGE), '/wiki/Other': Responses(PAGE)}
+    output = tmp_path / 'crawl.jsonl.gz'
+    with FixtureServer(pages):
+        for (run, page) in enumerate(['Page', 'Other']):
+            crawler.main([f'{ORIGIN}/wiki/{page}', '-s', str(tmp_path / f'state{run}'), '-d', '0', '-o', str(output)])
+    with gzip.open(output, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line)['url'] for line in f] == [f'{ORIGIN}/wiki/Page', f'{ORIGIN}/wiki/Other']
@@ -0,0 +1,35 @@
+# test_collect_dates.py
+
+import pytest
+import benchmark
+import collect_dates
+
+# Dates of several formats overlapping (a DMY date whose year starts a YMD date, an MDY date inside a DMY one, ...) or right next to each other
+TRICKY = [
+    '12 May 2020 June 3',
+    'On 3 March 2019, 2020 May 5 and 2021-02-03 and 2021-2-3-2022-12-31.',
+    'May 5, 2020 5 May 2020, May, 2020 June 2020 March 15, 99',
+    '<td>1 January 2000</td><td>January 1, 2000</td><td>2000 January 1</td><td>2000-01-01</td>',
+    'Mayday 2020, Maximum 12, 2020, 31 Decimal 1999, 32 May 2020, 0 May 2020, 2020-13-01, 2020-00-10, 1999-9-31',
+    '12 May 20201, 12 May 99x, 2020 May 55, Jan 2020Feb 2021, 5 Sep 1999Oct 3, 2000',
+    'Spanning 10 June 1999 8 July 2001 9 August 2003 and 1 Jan 32 2 Feb 31',
+    'Né le 7 août 1999, 7 Août 1999, 2020‑01‑01, ９ May 2020, 12 May 2020, 12 May 2020',
+    '',
+]
+
+@pytest.mark.parametrize('text', TRICKY)
+def test_find_dates_matches_four_pass_reference(text):
+    assert collect_dates.find_dates(text) == benchmark._four_pass_dates(text)
+
+def test_find_dates_matches_four_pass_reference_on_fixtures():
+    for (path, content) in benchmark.synthetic_fixtures(races=60, players=2).items():
+        html = content.decode('utf-8')
+        assert collect_dates.find_dates(html) == benchmark._four_pass_dates(html), path
+    # All fixture dates glued together, so that every date is adjacent to the next
+    html = ' '.join(TRICKY) + ''.join(TRICKY)
+    assert collect_dates.find_dates(html) == benchmark._four_pass_dates(html)
+
+def test_dates_are_grouped_by_format():
+    assert collect_dates.find_dates('2020-01-02 then 3 May 2021 then May 4, 2022 then 2023 June 5') == ['2021/05/03', '2022/05/04', '2023/06/05',
+                                                                                                        '2020/01/02']
+    assert [(match.format, match.date) for match in collect_dates.scan_dates('12 May 2020 June 3')] == [('DMY', '2020/05/12'), ('YMD', '2020/06/03')]
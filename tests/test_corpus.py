@@ -0,0 +1,68 @@
+# test_corpus.py
+
+import gzip
+import io
+import json
+import tarfile
+import time
+import corpus
+
+PAGE = '<p>Held on <b>12 January 2020</b>, see <a href="/wiki/Wengen">Wengen</a>.</p>'
+
+def write_corpus(folder, count):
+    folder.mkdir(exist_ok=True)
+    for number in range(count):
+        (folder / f'{number:03d}.html').write_text(PAGE, encoding='utf-8')
+
+def test_pages_of_directory_and_tarball(tmp_path):
+    folder = tmp_path / 'pages'
+    (folder / 'saved').mkdir(parents=True)
+    (folder / 'saved' / 'Slalom.txt').write_text(f'URL: https://en.wikipedia.org/wiki/Slalom\nTEXT:\n{PAGE}', encoding='utf-8')
+    (folder / 'Downhill.html').write_text(PAGE, encoding='utf-8')
+    (folder / 'notes.md').write_text(PAGE, encoding='utf-8')
+    tarball = tmp_path / 'pages.tar.gz'
+    with tarfile.open(tarball, 'w:gz') as tar:
+        tar.add(folder, arcname='.')
+
+    for path in (folder, tarball):
+        records = list(corpus.process_corpus(str(path), workers=2, chunkSize=1))
+        assert [record['url'] for record in records] == ['https://en.wikipedia.org/wiki/Downhill', 'https://en.wikipedia.org/wiki/Slalom']
+        assert all(record['articles'] == ['https://en.wikipedia.org/wiki/Wengen'] for record in records)
+        assert all(record['dates'] == ['2020/01/12'] for record in records)
+
+def test_unreadable_page_is_an_error_record(tmp_path):
+    (tmp_path / 'Gone.html').symlink_to(tmp_path / 'missing.html')
+    (record,) = corpus.process_corpus(str(tmp_path), workers=1)
+    assert record['source'] == 'Gone.html' and 'FileNotFoundError' in record['error']
+
+def test_records_stay_in_order_across_many_chunks(tmp_path):
+    write_corpus(tmp_path, 200)
+    records = corpus.process_corpus(str(tmp_path), workers=3, chunkSize=2)
+    assert [record['source'] for record in records] == [f'{number:03d}.html' for number in range(200)]
+
+def test_pages_read_ahead_are_bounded(tmp_path, monkeypatch):
+    read = []
+    def iter_corpus(path):
+        for number in range(1000):
+            read.append(number)
+            yield (f'{number}.html', None, PAGE.encode('utf-8'))
+    monkeypatch.setattr(corpus, 'iter_corpus', iter_corpus)
+
+    records = corpus.process_corpus('unused', workers=1, chunkSize=2)
+    next(records)
+    time.sleep(0.5)
+    # 1 * 2 * 4 pages read ahead, the one consumed, and the one read while waiting for a slot
+    assert len(read) <= 10
+    # Stopping early does not leave the pool waiting for pages
+    records.close()
+
+def test_main_writes_through_sink(tmp_path, capsys):
+    write_corpus(tmp_path / 'pages', 3)
+    corpus.main([str(tmp_path / 'pages'), '-o', str(tmp_path / 'out' / 'pages.jsonl.gz'), '-w', '1'])
+    with gzip.open(tmp_path / 'out' / 'pages.jsonl.gz', 'rt', encoding='utf-8') as f:
+        assert [json.loads(line)['source'] for line in f] == ['000.html', '001.html', '002.html']
+
+    corpus.main([str(tmp_path / 'pages'), '-w', '1'])
+    (out, err) = capsys.readouterr()
+    assert [json.loads(line)['dates'] for line in io.StringIO(out)] == [['2020/01/12']] * 3
+    assert err.endswith('3 pages, 0 errors, 3 articles, 3 dates\n')
@@ -0,0 +1,42 @@
+# test_crawler.py
+
+import os
+from crawler import Crawler
+
+def test_seen_urls_are_not_queued_again(tmp_path):
+    crawler = Crawler(str(tmp_path), capacity=1000)
+    assert crawler.add('https://en.wikipedia.org/wiki/A')
+    assert not crawler.add('https://en.wikipedia.org/wiki/A')
+    assert crawler.add('https://en.wikipedia.org/wiki/B')
+    assert len(crawler) == 2
+    crawler.close()
+
+def test_bloom_filter_is_saved_at_close_only(tmp_path):
+    crawler = Crawler(str(tmp_path), capacity=1000)
+    crawler.add('https://en.wikipedia.org/wiki/A')
+    crawler.checkpoint()
+    assert not os.path.exists(crawler._bloom_path())
+    crawler.close()
+    assert os.path.exists(os.path.join(str(tmp_path), 'bloom.bin'))
+
+    resumed = Crawler(str(tmp_path), capacity=1000)
+    assert 'https://en.wikipedia.org/wiki/A' in resumed.bloom
+    assert not resumed.add('https://en.wikipedia.org/wiki/A')
+    resumed.close()
+
+def test_stale_bloom_filter_is_rebuilt(tmp_path):
+    crawler = Crawler(str(tmp_path), capacity=1000)
+    crawler.add('https://en.wikipedia.org/wiki/A')
+    crawler.close()
+
+    # A run that stops without closing leaves a saved filter without the urls it queued
+    crashed = Crawler(str(tmp_path), capacity=1000)
+    crashed.add('https://en.wikipedia.org/wiki/B')
+    crashed.checkpoint()
+    crashed._db.close()
+
+    resumed = Crawler(str(tmp_path), capacity=1000)
+    assert 'https://en.wikipedia.org/wiki/B' in resumed.bloom
+    assert not resumed.add('https://en.wikipedia.org/wiki/B')
+    assert len(resumed) == 2
+    resumed.close()
@@ -0,0 +1,71 @@
+# test_event_calendar.py
+
+import datetime
+import gzip
+import os
+from event_calendar import CalendarExport, Event, EventIndex, ics_lines
+
+def event(day, venue, discipline='SL', season='2019–20 World Cup'):
+    return Event(datetime.date(2020, 1, day), venue, discipline, season)
+
+EVENTS = [event(12, 'Wengen'), event(5, 'Zagreb'), event(12, 'Adelboden', 'GS'), event(19, 'Kitzbühel', 'DH', '2020–21 World Cup'),
+          event(5, 'Zagreb')]
+
+def test_index_is_sorted_without_duplicates():
+    index = EventIndex(EVENTS)
+    assert list(index) == sorted(set(EVENTS))
+    assert index.add([event(5, 'Zagreb'), event(26, 'Schladming')]) == 1
+    assert len(index) == 5
+    assert index.seasons() == ['2019–20 World Cup', '2020–21 World Cup']
+
+def test_index_queries_match_filtering():
+    index = EventIndex(EVENTS)
+    (start, end) = (datetime.date(2020, 1, 6), datetime.datetime(2020, 1, 19, 8, 30))
+    assert index.between(start, end) == [e for e in sorted(set(EVENTS)) if start <= e.date <= end.date()]
+    assert index.between(venue='Zagreb') == [event(5, 'Zagreb')]
+    assert index.between(start, discipline='SL') == [event(12, 'Wengen')]
+    assert index.between(season='2020–21 World Cup') == [EVENTS[3]]
+    assert index.on(datetime.date(2020, 1, 12)) == [event(12, 'Adelboden', 'GS'), event(12, 'Wengen')]
+    assert index.next(datetime.date(2020, 1, 5)) == event(12, 'Adelboden', 'GS')
+    assert index.next(datetime.date(2020, 1, 5), discipline='DH') == EVENTS[3]
+    assert index.next(datetime.date(2020, 1, 19)) is None
+
+def test_update_replaces_whole_seasons():
+    index = EventIndex(EVENTS)
+    index.between(venue='Wengen')
+    index.update({'2019–20 World Cup': [event(12, 'Adelboden', 'GS')]})
+    assert list(index) == [event(12, 'Adelboden', 'GS'), EVENTS[3]]
+    assert index.between(venue='Wengen') == []
+
+def test_ics_lines_are_folded():
+    lines = list(ics_lines([event(12, 'W' * 100)], 'Calendar', stamp=datetime.datetime(2020, 1, 1)))
+    assert lines[0] == 'BEGIN:VCALENDAR\r' and lines[-1] == 'END:VCALENDAR\r'
+    assert all(len(line.rstrip('\r').encode('utf-8')) <= 75 for line in lines)
+    assert any(line.startswith(' ') for line in lines)
+
+def test_export_writes_only_changed_seasons(tmp_path):
+    folder = str(tmp_path)
+    index = EventIndex(EVENTS)
+    assert CalendarExport(folder).export(index) == ['2019–20 World Cup', '2020–21 World Cup']
+    assert CalendarExport(folder).export(index) == []
+
+    index.add([event(26, 'Schladming', season='2020–21 World Cup')])
+    assert CalendarExport(folder).export(index) == ['2020–21 World Cup']
+    export = CalendarExport(folder)
+    os.remove(export.paths('2019–20 World Cup')[1])
+    assert export.export(index) == ['2019–20 World Cup']
+    assert export.export(index, force=True) == index.seasons()
+
+def test_seasons_differing_in_replaced_characters_get_different_files(tmp_path):
+    export = CalendarExport(str(tmp_path), formats=['.csv'])
+    names = {export.paths(season)[0] for season in ['2019–20 World Cup', '2019-20 World Cup', '2019_20_World_Cup', '2019 20 World Cup']}
+    assert len(names) == 4
+    assert os.path.join(str(tmp_path), '2019_20_World_Cup.csv') in names
+
+def test_export_compressed_formats(tmp_path):
+    export = CalendarExport(str(tmp_path), formats=['.ics.gz', '.csv.gz'])
+    export.export(EventIndex(EVENTS))
+    (ics, csv) = export.paths('2020–21 World Cup')
+    assert gzip.decompress(open(ics, 'rb').read()).startswith(b'BEGIN:VCALENDAR\r\n')
+    assert gzip.decompress(open(csv, 'rb').read()).decode('utf-8').splitlines() == ['date,venue,discipline,season',
+                                                                                   '2020-01-19,Kitzbühel,DH,2020–21 World Cup']
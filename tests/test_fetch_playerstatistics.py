@@ -0,0 +1,122 @@
+# test_fetch_playerstatistics.py
+
+from concurrent.futures import ThreadPoolExecutor
+import re
+import lxml.html
+import benchmark
+import fetch_playerstatistics
+from benchmark import PLAYOFFS_URL, FixtureServer
+from conftest import Responses
+from fetch_playerstatistics import _parse_player_statistics, _parse_roster
+from revision_store import RevisionStore
+from test_revision_store import MediaWikiApi
+
+def playoffs(players=3):
+    pages = benchmark.synthetic_fixtures(races=2, players=players)
+    revisions = {path[len('/wiki/'):].replace('_', ' '): 1 for path in pages if path.startswith('/wiki/')}
+    pages['/w/api.php'] = MediaWikiApi(revisions)
+    return pages
+
+def count_process_pools(monkeypatch):
+    started = []
+    def pool(max_workers):
+        started.append(max_workers)
+        return ThreadPoolExecutor(max_workers)
+    monkeypatch.setattr(fetch_playerstatistics, 'ProcessPoolExecutor', pool)
+    return started
+
+def test_process_pool_is_only_started_to_parse_pages(fetching, monkeypatch, tmp_path):
+    started = count_process_pools(monkeypatch)
+    store = RevisionStore(str(tmp_path / 'revisions.sqlite'))
+    with FixtureServer(playoffs()):
+        first = fetch_playerstatistics.extract_teams(PLAYOFFS_URL, plot=False, store=store)
+        assert started == [8]
+        # Every page is unchanged, so nothing is parsed
+        second = fetch_playerstatistics.extract_teams(PLAYOFFS_URL, plot=False, store=store)
+    assert started == [8]
+    assert second.to_records() == first.to_records()
+    assert len(first) == 8 * 3
+
+def test_parse_pool_of_caller_is_used_and_left_running(fetching, monkeypatch):
+    started = count_process_pools(monkeypatch)
+    with FixtureServer(playoffs()), ThreadPoolExecutor(2) as parsePool:
+        teams = fetch_playerstatistics.extract_teams(PLAYOFFS_URL, plot=False, parsePool=parsePool)
+        assert parsePool.submit(len, 'pool').result() == 4
+    assert started == []
+    assert sorted(set(teams['team'])) == [f'Team {team}' for team in range(8)]
+
+def test_team_page_that_cannot_be_fetched_is_left_out(fetching):
+    pages = playoffs()
+    pages['/wiki/Team_3'] = Responses((503, {}, b''))
+    with FixtureServer(pages):
+        teams = fetch_playerstatistics.extract_teams(PLAYOFFS_URL, plot=False, parsePool=ThreadPoolExecutor(2))
+    assert sorted(set(teams['team'])) == [f'Team {team}' for team in range(8) if team != 3]
+
+def full_roster(content):
+    '''
+    The roster of a team page, from a parse of the whole page.
+    '''
+    tree = lxml.html.fromstring(content.decode('utf-8'))
+    captions = [caption for caption in tree.iter('caption') if caption.text_content().strip() == 'Roster listing']
+    if not captions:
+        return None
+    tables = captions[-1].xpath("following::table[contains(concat(' ', @class, ' '), ' sortable ')]")
+    if not tables:
+        return None
+    rows = tables[0].xpath('.//tr')[1:]
+    return [(re.sub(r"\(\w*\)", '', ''.join(text.strip() for text in row.xpath('.//td')[2].itertext())), row.xpath('.//td')[2].xpath('.//a/@href')[0])
+            for row in rows]
+
+def full_statistics(content):
+    '''
+    The (PPG, BPG, RPG) of a player page, from a parse of the whole page.
+    '''
+    tree = lxml.html.fromstring(content.decode('utf-8'))
+    tables = tree.xpath("//table[@class='wikitable sortable']")
+    if not tables:
+        return None
+    rows = [row for row in tables[0].xpath('.//tr') if any(re.match(r".*2019.*20.*", link.text_content()) for link in row.xpath('.//a[@href]'))]
+    if not rows:
+        return ('', '', '')
+    cells = rows[-1].xpath('.//td')
+    return tuple(re.sub(r"[\*\-]", '', ''.join(text.strip() for text in cells[index].itertext())) for index in (12, 11, 8))
+
+def page(body):
+    return benchmark._wiki_page('Page', body)
+
+def statistics_row(season, values):
+    return f'<tr><td><a href="/wiki/{season}">{season}</a></td>' + ''.join(f'<td>{value}</td>' for value in values) + '</tr>'
+
+STATISTICS = [str(value) for value in range(13)]
+
+ROSTER_PAGES = [
+    page('<table class="wikitable sortable"><tr><td>decoy</td></tr></table>'
+         '<table class="toccolours"><caption>Roster listing </caption><tr><td><table class="sortable jquery-tablesorter">'
+         '<tr><th>Pos.</th><th>No.</th><th>Name</th></tr>'
+         '<tr><td>G</td><td>1</td><td><a href="/wiki/A_B">A B</a> (C)</td></tr>'
+         '<tr><td>F</td><td>2</td><td><i><a href="/wiki/C%C3%A9">Cé</a></i></td></tr></table></td></tr></table>'),
+    page('<table class="sortable"><tr><th>Name</th></tr></table>'),
+    page('<table><caption>Roster listing</caption></table>'),
+]
+
+PLAYER_PAGES = [
+    page('<table class="wikitable"><tr><td><a href="/wiki/2019">2019–20</a></td></tr></table>'
+         '<table class="wikitable sortable">' + statistics_row('2018–19', STATISTICS) +
+         statistics_row('2019–20', STATISTICS[:7] + ['7.1*', '0', '0', '0.5-', '<b>25.3</b>*']) + '</table>'),
+    page('<table class="wikitable sortable">' + statistics_row('2018–19', STATISTICS) + '</table>'),
+    page('<table class="wikitable sortable"><tr><td><table class="wikitable sortable">' + statistics_row('2019–20', STATISTICS) +
+         '</table></td></tr></table>'),
+    page('<p>No statistics</p>'),
+]
+
+def test_partial_parse_matches_full_parse():
+    pages = benchmark.synthetic_fixtures(races=2, players=4)
+    for content in ROSTER_PAGES + [pages[f'/wiki/Team_{team}'] for team in range(8)]:
+        assert _parse_roster(content) == full_roster(content)
+    for content in PLAYER_PAGES + [pages[f'/wiki/Player_{team}_{number}'] for team in range(8) for number in range(4)]:
+        assert _parse_player_statistics(content) == full_statistics(content)
+
+def test_partial_parse_of_edge_cases():
+    assert _parse_roster(ROSTER_PAGES[0]) == [('A B', '/wiki/A_B'), ('Cé', '/wiki/C%C3%A9')]
+    assert _parse_roster(ROSTER_PAGES[1]) is None and _parse_roster(ROSTER_PAGES[2]) is None
+    assert [_parse_player_statistics(content) for content in PLAYER_PAGES] == [('25.3', '0.5', '7.1'), ('', '', ''), ('11', '10', '7'), None]
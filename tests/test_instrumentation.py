@@ -0,0 +1,35 @@
+# test_instrumentation.py
+
+import io
+import instrumentation
+
+def report(recorder):
+    file = io.StringIO()
+    recorder.report(file)
+    return file.getvalue().splitlines()
+
+def test_hit_rates():
+    recorder = instrumentation.StatsRecorder()
+    recorder.count('cache.hit', 3)
+    recorder.count('cache.revalidated', 1)
+    recorder.count('cache.miss', 4)
+    recorder.count('revision_store.hit', 9, kind='roster')
+    recorder.count('revision_store.miss', 1, kind='roster')
+    recorder.count('revision_store.hit', 1, kind='player_statistics')
+    recorder.count('revision_store.miss', 3, kind='player_statistics')
+    lines = report(recorder)
+    assert 'cache.hit rate: 37.5%' in lines
+    assert 'revision_store.hit rate[kind=roster]: 90.0%' in lines
+    assert 'revision_store.hit rate[kind=player_statistics]: 25.0%' in lines
+
+def test_stages_are_timed_per_attributes():
+    recorder = instrumentation.StatsRecorder()
+    with recorder.stage('fetch', host='a'):
+        pass
+    with recorder.stage('fetch', host='a'):
+        pass
+    with recorder.stage('fetch', host='b'):
+        pass
+    lines = report(recorder)
+    assert any(line.startswith('fetch[host=a]') and line.split()[1] == '2' for line in lines)
+    assert any(line.startswith('fetch[host=b]') and line.split()[1] == '1' for line in lines)
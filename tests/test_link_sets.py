@@ -0,0 +1,72 @@
+# test_link_sets.py
+
+import random
+import numpy as np
+import pytest
+import link_sets
+from link_sets import LinkSet, TitleIndex
+
+def random_sets(seed, count=6, universe=300):
+    rng = random.Random(seed)
+    return [set(rng.sample(range(universe), rng.randrange(0, universe // 3))) for _ in range(count)] + [set()]
+
+@pytest.mark.parametrize('seed', range(4))
+def test_set_operations_match_python_sets(seed):
+    sets = random_sets(seed)
+    for a in sets:
+        for b in sets:
+            (x, y) = (LinkSet(list(a) * 2), LinkSet(sorted(b), isSorted=True))
+            assert list(x | y) == sorted(a | b)
+            assert list(x & y) == sorted(a & b)
+            assert list(x - y) == sorted(a - b)
+            assert list(x ^ y) == sorted(a ^ b)
+            assert [list(part) for part in x.diff(y)] == [sorted(b - a), sorted(a - b)]
+            assert x.jaccard(y) == (len(a & b) / len(a | b) if a | b else 0.0)
+            assert (x == y) == (a == b)
+            assert hash(x) == hash(y) or a != b
+        assert len(LinkSet(list(a))) == len(a)
+        assert all(id in LinkSet(list(a)) for id in a)
+        assert not any(id in LinkSet(list(a)) for id in set(range(-1, 301)) - a)
+
+@pytest.mark.parametrize('ids', [[], [0], [5, 6, 7], [0, 300, 70000], [1, 2 ** 31 - 1], random.Random(1).sample(range(10 ** 6), 5000)])
+def test_bytes_round_trip(ids):
+    links = LinkSet(ids)
+    data = links.to_bytes()
+    assert LinkSet.from_bytes(data) == links
+    assert list(LinkSet.from_bytes(data)) == sorted(ids)
+
+def test_gaps_are_packed_small():
+    dense = LinkSet(range(0, 20000, 3))
+    assert len(dense.to_bytes()) < dense.nbytes // 10
+
+def test_title_index_round_trip(tmp_path):
+    index = TitleIndex()
+    urls = ['https://en.wikipedia.org/wiki/Slalom', 'https://de.wikipedia.org/wiki/Slalom', 'https://en.wikipedia.org/wiki/Downhill',
+            'https://en.wikipedia.org/wiki/Slalom']
+    links = LinkSet.from_urls(urls, index)
+    assert list(index.ids_of(urls)) == [0, 1, 2, 0]
+    assert links.urls(index) == urls[:3]
+
+    path = str(tmp_path / 'index' / 'titles.json')
+    index.save(path)
+    loaded = TitleIndex.load(path)
+    assert (loaded.origin, loaded.titles) == (index.origin, ['Slalom', 'https://de.wikipedia.org/wiki/Slalom', 'Downhill'])
+    assert loaded.id('https://en.wikipedia.org/wiki/Downhill') == 2
+    assert loaded.id('https://en.wikipedia.org/wiki/Super-G') == 3
+    assert links.urls(loaded) == urls[:3]
+
+@pytest.mark.parametrize('chunk', [4, 65536])
+def test_intersection_counts_match_python_sets(monkeypatch, chunk):
+    monkeypatch.setattr(link_sets, '_CHUNK_COLUMNS', chunk)
+    sets = random_sets(7)
+    links = [LinkSet(list(ids)) for ids in sets]
+    counts = link_sets.intersection_counts(links)
+    similarities = link_sets.jaccard_matrix(links)
+    for (i, a) in enumerate(sets):
+        for (j, b) in enumerate(sets):
+            assert counts[i, j] == len(a & b)
+            assert similarities[i, j] == pytest.approx(len(a & b) / len(a | b) if a | b else 0.0)
+
+def test_intersection_counts_of_empty_sets():
+    assert link_sets.intersection_counts([]).shape == (0, 0)
+    assert np.array_equal(link_sets.intersection_counts([LinkSet(), LinkSet([1])]), [[0, 0], [0, 1]])
@@ -0,0 +1,68 @@
+# test_normalize_urls.py
+
+import random
+import pytest
+from normalize_urls import find_base, normalize_url, resolve_url, resolve_urls
+
+# Reference resolution examples of RFC 3986 section 5.4, in canonical form: fragments are dropped and an empty path is '/'.
+# 'http:g' resolves as a relative reference, which section 5.4.2 allows for backward compatibility.
+RFC_BASE = 'http://a/b/c/d;p?q'
+RFC_EXAMPLES = {
+    'g:h': 'g:h', 'g': 'http://a/b/c/g', './g': 'http://a/b/c/g', 'g/': 'http://a/b/c/g/', '/g': 'http://a/g', '//g': 'http://g/',
+    '?y': 'http://a/b/c/d;p?y', 'g?y': 'http://a/b/c/g?y', '#s': 'http://a/b/c/d;p?q', 'g#s': 'http://a/b/c/g', 'g?y#s': 'http://a/b/c/g?y',
+    ';x': 'http://a/b/c/;x', 'g;x': 'http://a/b/c/g;x', 'g;x?y#s': 'http://a/b/c/g;x?y', '': 'http://a/b/c/d;p?q', '.': 'http://a/b/c/',
+    './': 'http://a/b/c/', '..': 'http://a/b/', '../': 'http://a/b/', '../g': 'http://a/b/g', '../..': 'http://a/', '../../': 'http://a/',
+    '../../g': 'http://a/g',
+    # Abnormal examples (section 5.4.2)
+    '../../../g': 'http://a/g', '../../../../g': 'http://a/g', '/./g': 'http://a/g', '/../g': 'http://a/g', 'g.': 'http://a/b/c/g.',
+    '.g': 'http://a/b/c/.g', 'g..': 'http://a/b/c/g..', '..g': 'http://a/b/c/..g', './../g': 'http://a/b/g', './g/.': 'http://a/b/c/g/',
+    'g/./h': 'http://a/b/c/g/h', 'g/../h': 'http://a/b/c/h', 'g;x=1/./y': 'http://a/b/c/g;x=1/y', 'g;x=1/../y': 'http://a/b/c/y',
+    'g?y/./x': 'http://a/b/c/g?y/./x', 'g?y/../x': 'http://a/b/c/g?y/../x', 'g#s/./x': 'http://a/b/c/g', 'g#s/../x': 'http://a/b/c/g',
+    'http:g': 'http://a/b/c/g',
+}
+
+@pytest.mark.parametrize('ref, expected', RFC_EXAMPLES.items())
+def test_resolve_url_follows_rfc_3986(ref, expected):
+    assert resolve_url(RFC_BASE, ref) == expected
+    assert resolve_urls(RFC_BASE, [ref]) == [expected]
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTPS://EN.Wikipedia.org:443/wiki/slalom skiing', 'https://en.wikipedia.org/wiki/Slalom_skiing'),
+    ('https://en.wikipedia.org/wiki/Caf%c3%a9%7e', 'https://en.wikipedia.org/wiki/Caf%C3%A9~'),
+    ('http://example.com:8080', 'http://example.com:8080/'),
+    ('http://example.com/100%', 'http://example.com/100%25'),
+    ('http://example.com/%zz?q=%', 'http://example.com/%25zz?q=%25'),
+    ('http://example.com/%%6161', 'http://example.com/%25a61'),
+    ('http://example.com/a%2Fb%41', 'http://example.com/a%2FbA'),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+def test_normalize_url_is_idempotent():
+    rng = random.Random(3)
+    alphabet = ['%', '%2', '%25', '%41', '%7e', '%c3%a9', '%zz', 'a', 'F', '6', ' ', 'é', '/', '?', '&', '=', '#', '.', '~', '+']
+    for _ in range(3000):
+        url = 'http://Example.com/' + ''.join(rng.choice(alphabet) for _ in range(rng.randrange(12)))
+        once = normalize_url(url, keepFragment=True)
+        assert normalize_url(once, keepFragment=True) == once, url
+
+def test_resolve_urls_fast_path_matches_slow_path():
+    refs = ['/wiki/Slalom', '/wiki/slalom', '/wiki/Slalom_skiing?action=edit', '/wiki/A%20B', '/wiki/%C3%A9', '/wiki/Caf%c3%a9', '/w/index.php?a=1&amp;b=2',
+            '//en.wikipedia.org/wiki/Downhill', 'https://de.wikipedia.org/wiki/Abfahrt', 'https://EN.wikipedia.org/wiki/X', 'http://example.com/a/./b',
+            'http://example.com', 'https://example.com/%7e', '/wiki/100%', '/wiki/Slalom#History', '/wiki/Slalom?', '../wiki/Super-G', 'Giant_slalom',
+            ' /wiki/Padded ', '/wiki/Slalom']
+    for base in ('https://en.wikipedia.org/wiki/Alpine_skiing', 'https://example.com/dir/page', 'file:///tmp/page.html'):
+        assert resolve_urls(base, refs) == [resolve_url(base, ref) for ref in refs]
+
+@pytest.mark.parametrize('html, expected', [
+    ('<html><head><base href="https://example.com/docs/"></head><body><a href="x">', 'https://example.com/docs/'),
+    ("<head><BASE target=_blank HREF = '/mirror/'></head>", 'https://en.wikipedia.org/mirror/'),
+    ('<head><base href="?a=1&amp;b=2"></head>', 'https://en.wikipedia.org/wiki/Page?a=1&b=2'),
+    ('<head><base href=""></head>', 'https://en.wikipedia.org/wiki/Page'),
+    ('<head></head><body><base href="https://example.com/">', 'https://en.wikipedia.org/wiki/Page'),
+    ('<head><title>No base</title></head>', 'https://en.wikipedia.org/wiki/Page'),
+])
+def test_find_base(html, expected):
+    url = 'https://en.wikipedia.org/wiki/Page'
+    assert find_base(url, html) == expected
+    assert find_base(url, html.encode('utf-8')) == expected
@@ -0,0 +1,56 @@
+# test_output_writers.py
+
+import gzip
+import os
+import pytest
+import output_writers
+
+def test_sink_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        output_writers.Sink(str(tmp_path / 'out.txt'))
+    assert not os.listdir(tmp_path)
+
+def test_save_picks_format_from_extension(tmp_path):
+    records = [{'url': 'a', 'n': 1}, {'url': 'b', 'n': 2}]
+    output_writers.save(str(tmp_path / 'out.csv'), ['unused'], records)
+    output_writers.save(str(tmp_path / 'out.txt.gz'), ['a', 'b'], records)
+    assert (tmp_path / 'out.csv').read_text(encoding='utf-8').splitlines() == ['url,n', 'a,1', 'b,2']
+    assert gzip.decompress((tmp_path / 'out.txt.gz').read_bytes()) == b'a\nb\n'
+
+def test_failed_sink_leaves_target(tmp_path):
+    path = str(tmp_path / 'out.jsonl')
+    output_writers.save(path, (), [{'n': 1}])
+    with pytest.raises(RuntimeError):
+        with output_writers.open_sink(path) as sink:
+            sink.write({'n': 2})
+            raise RuntimeError('failed half way')
+    assert (tmp_path / 'out.jsonl').read_text(encoding='utf-8') == '{"n": 1}\n'
+    assert os.listdir(tmp_path) == ['out.jsonl']
+
+def test_append_adds_to_target(tmp_path):
+    for (name, read) in (('out.csv', lambda path: path.read_bytes()), ('out.csv.gz', lambda path: gzip.decompress(path.read_bytes()))):
+        path = tmp_path / name
+        output_writers.save(str(path), (), [{'n': 1}], append=True)
+        output_writers.save(str(path), (), [{'n': 2}, {'n': 3}], append=True)
+        assert read(path) == b'n\r\n1\r\n2\r\n3\r\n'
+    assert sorted(os.listdir(tmp_path)) == ['out.csv', 'out.csv.gz']
+
+def test_failed_append_leaves_target(tmp_path, monkeypatch):
+    path = str(tmp_path / 'out.jsonl')
+    output_writers.save(path, (), [{'n': 1}])
+    copied = []
+    def copyfileobj(source, target, length):
+        # Fails half way, after copying the target
+        if copied:
+            raise OSError('disk full')
+        copied.append(target.write(source.read()))
+    monkeypatch.setattr(output_writers.shutil, 'copyfileobj', copyfileobj)
+    with pytest.raises(OSError):
+        output_writers.save(path, (), [{'n': 2}], append=True)
+    assert (tmp_path / 'out.jsonl').read_text(encoding='utf-8') == '{"n": 1}\n'
+    assert os.listdir(tmp_path) == ['out.jsonl']
+
+def test_csv_columns_are_written_without_records(tmp_path):
+    with output_writers.CsvSink(str(tmp_path / 'out.csv'), columns=['a', 'b']) as sink:
+        sink.write_many([])
+    assert (tmp_path / 'out.csv').read_bytes() == b'a,b\r\n'
@@ -0,0 +1,119 @@
+# test_requesting_urls.py
+
+import asyncio
+import time
+import pytest
+from benchmark import ORIGIN, FixtureServer
+from conftest import Responses
+
+OK = (200, {}, b'<html>ok</html>')
+UNAVAILABLE = (503, {}, b'<html>unavailable</html>')
+
+def test_one_failing_url_does_not_open_circuit(fetching):
+    pages = {'/dead': Responses(UNAVAILABLE), '/ok': Responses(OK)}
+    with FixtureServer(pages):
+        (dead, ok) = fetching.get_many([f'{ORIGIN}/dead', f'{ORIGIN}/ok'], concurrency=1)
+        assert (dead.reason, dead.status, dead.attempts) == ('status', 503, fetching.RETRIES + 1)
+        assert ok.ok
+        assert pages['/dead'].calls == fetching.RETRIES + 1
+
+        (dead, ok) = asyncio.run(fetching.get_many_async([f'{ORIGIN}/dead', f'{ORIGIN}/ok']))
+        assert dead.reason == 'status' and ok.ok
+
+def test_circuit_opens_after_failed_requests_and_recovers(fetching, monkeypatch):
+    monkeypatch.setattr(fetching, 'BREAKER_COOLDOWN', 0.2)
+    pages = {f'/dead{number}': Responses(UNAVAILABLE) for number in range(fetching.BREAKER_THRESHOLD)}
+    pages['/ok'] = Responses(OK)
+    with FixtureServer(pages):
+        for number in range(fetching.BREAKER_THRESHOLD):
+            assert fetching.request(f'{ORIGIN}/dead{number}').reason == 'status'
+
+        failure = fetching.request(f'{ORIGIN}/ok')
+        assert (failure.reason, failure.attempts) == ('circuit_open', 0)
+        assert pages['/ok'].calls == 0
+
+        # After the cooldown a probe is let through, and its success closes the circuit
+        time.sleep(0.25)
+        assert fetching.request(f'{ORIGIN}/ok').ok
+        assert fetching.request(f'{ORIGIN}/ok').ok
+        assert pages['/ok'].calls == 2
+
+def test_failed_probe_keeps_circuit_open(fetching, monkeypatch):
+    monkeypatch.setattr(fetching, 'BREAKER_COOLDOWN', 0.2)
+    pages = {'/dead': Responses(UNAVAILABLE)}
+    with FixtureServer(pages):
+        for _ in range(fetching.BREAKER_THRESHOLD):
+            fetching.request(f'{ORIGIN}/dead')
+        calls = pages['/dead'].calls
+        time.sleep(0.25)
+        # The probe gets a single attempt, and then the circuit refuses its retries
+        assert fetching.request(f'{ORIGIN}/dead').reason == 'circuit_open'
+        assert pages['/dead'].calls == calls + 1
+        assert fetching.request(f'{ORIGIN}/dead').attempts == 0
+
+def test_iter_text_retries_and_sniffs_meta_charset(fetching):
+    html = '<html><head><meta charset="iso-8859-1"></head><body>Zürich</body></html>'.encode('iso-8859-1')
+    pages = {'/latin': Responses(UNAVAILABLE, (200, {'Content-Type': 'text/html'}, html))}
+    with FixtureServer(pages):
+        assert ''.join(fetching.iter_text(f'{ORIGIN}/latin', chunkSize=16)).endswith('Zürich</body></html>')
+    assert pages['/latin'].calls == 2
+
+def test_iter_urls_raises_on_error_page(fetching):
+    import filter_urls
+    pages = {'/busy': Responses((429, {'Retry-After': '3600'}, b'<html><a href="/wiki/Error_page">x</a></html>'))}
+    with FixtureServer(pages):
+        with pytest.raises(fetching.FetchError) as error:
+            next(filter_urls.iter_urls(f'{ORIGIN}/busy'))
+        assert (error.value.failure.reason, error.value.failure.status) == ('status', 429)
+    # A Retry-After longer than BACKOFF_MAX is not waited for
+    assert pages['/busy'].calls == 1
+
+def test_iter_text_refused_while_circuit_open(fetching):
+    fetching._breaker('en.wikipedia.org')._openUntil = time.monotonic() + 60
+    pages = {'/ok': Responses(OK)}
+    with FixtureServer(pages):
+        with pytest.raises(fetching.FetchError) as error:
+            list(fetching.iter_text(f'{ORIGIN}/ok'))
+        assert error.value.failure.reason == 'circuit_open'
+    assert pages['/ok'].calls == 0
+
+def test_retries_until_success(fetching):
+    pages = {'/flaky': Responses(UNAVAILABLE, (502, {}, b''), OK)}
+    with FixtureServer(pages):
+        response = fetching.request(f'{ORIGIN}/flaky')
+    assert response.ok and response.text == '<html>ok</html>'
+    assert pages['/flaky'].calls == 3
+
+def test_retry_after_is_honoured(fetching):
+    pages = {'/limited': Responses((429, {'Retry-After': '0.3'}, b''), OK)}
+    with FixtureServer(pages):
+        start = time.perf_counter()
+        assert fetching.request(f'{ORIGIN}/limited').ok
+        assert time.perf_counter() - start >= 0.3
+    assert pages['/limited'].calls == 2
+
+def test_client_errors_are_not_retried(fetching):
+    pages = {'/missing': Responses((404, {}, b'not found'))}
+    with FixtureServer(pages):
+        response = fetching.request(f'{ORIGIN}/missing')
+    assert response.status_code == 404 and pages['/missing'].calls == 1
+
+def test_get_many_returns_failures_in_place(fetching):
+    pages = {'/a': Responses(OK), '/dead': Responses(UNAVAILABLE), '/b': Responses((200, {}, b'<html>b</html>'))}
+    urls = [f'{ORIGIN}/a', f'{ORIGIN}/dead', f'{ORIGIN}/b']
+    with FixtureServer(pages):
+        responses = fetching.get_many(urls)
+        with pytest.raises(fetching.FetchError):
+            fetching.get_html(f'{ORIGIN}/dead')
+    assert [bool(response) for response in responses] == [True, False, True]
+    assert isinstance(responses[1], fetching.FetchFailure) and responses[1].url == urls[1]
+    assert responses[2].text == '<html>b</html>'
+
+def test_stale_cache_is_served_when_fetch_fails(fetching, tmp_path):
+    cache = fetching.enable_cache(str(tmp_path), ttl=0)
+    pages = {'/page': Responses(OK, UNAVAILABLE)}
+    with FixtureServer(pages):
+        assert fetching.get_html(f'{ORIGIN}/page').text == '<html>ok</html>'
+        assert fetching.get_html(f'{ORIGIN}/page').text == '<html>ok</html>'
+    assert pages['/page'].calls == 1 + fetching.RETRIES + 1
+    assert cache.size() > 0
@@ -0,0 +1,64 @@
+# test_requesting_urls_async.py
+
+import asyncio
+import threading
+import time
+import pytest
+from benchmark import ORIGIN, FixtureServer
+
+class SlowPage:
+    '''
+    A page of a benchmark.FixtureServer that answers after a delay, recording the most requests it had in flight at once.
+    '''
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.inFlight = 0
+        self.peak = 0
+        self.starts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        with self._lock:
+            self.inFlight += 1
+            self.peak = max(self.peak, self.inFlight)
+            self.starts.append(time.monotonic())
+        time.sleep(self.delay)
+        with self._lock:
+            self.inFlight -= 1
+        return (200, {}, path.encode('utf-8'))
+
+def test_responses_in_order_with_bounded_concurrency(fetching):
+    page = SlowPage()
+    urls = [f'{ORIGIN}/slow?page={number}' for number in range(12)]
+    with FixtureServer({'/slow': page}):
+        responses = asyncio.run(fetching.get_many_async(urls, concurrency=3))
+    assert [response.text for response in responses] == [f'/slow?page={number}' for number in range(12)]
+    assert 1 < page.peak <= 3
+
+def test_per_host_limit(fetching):
+    page = SlowPage()
+    with FixtureServer({'/slow': page}):
+        asyncio.run(fetching.get_many_async([f'{ORIGIN}/slow?page={number}' for number in range(8)], concurrency=8, perHost=2))
+    assert page.peak <= 2
+
+def test_rate_limit_spaces_out_requests(fetching):
+    page = SlowPage(delay=0)
+    with FixtureServer({'/slow': page}):
+        asyncio.run(fetching.get_many_async([f'{ORIGIN}/slow?page={number}' for number in range(5)], rate=20))
+    starts = sorted(page.starts)
+    assert starts[-1] - starts[0] >= 4 / 20 * 0.9
+
+def test_get_html_async_raises_fetch_error(fetching):
+    with FixtureServer({'/dead': lambda path: (503, {}, b'')}):
+        with pytest.raises(fetching.FetchError):
+            asyncio.run(fetching.get_html_async(f'{ORIGIN}/dead'))
+        (failure,) = asyncio.run(fetching.get_many_async([f'{ORIGIN}/dead']))
+    assert (failure.reason, failure.status) == ('status', 503)
+
+def test_concurrency_is_not_capped_by_shared_pool(fetching, monkeypatch):
+    monkeypatch.setattr(fetching, 'ASYNC_CONCURRENCY', 2)
+    monkeypatch.setattr(fetching, '_async_executor', None)
+    page = SlowPage(delay=0.2)
+    with FixtureServer({'/slow': page}):
+        asyncio.run(fetching.get_many_async([f'{ORIGIN}/slow?page={number}' for number in range(6)], concurrency=6, perHost=6))
+    assert page.peak > 2
@@ -0,0 +1,47 @@
+# test_response_cache.py
+
+import os
+import requests as req
+from requests.structures import CaseInsensitiveDict
+from response_cache import ResponseCache
+
+def response(content, etag=None):
+    '''
+    Builds a 200 response with the given body.
+    '''
+    result = req.models.Response()
+    result.status_code = 200
+    result.headers = CaseInsensitiveDict({'Content-Type': 'text/html; charset=utf-8', **({'ETag': etag} if etag else {})})
+    result.encoding = 'utf-8'
+    result._content = content
+    return result
+
+def bodies(cache):
+    return cache._db.execute('SELECT digest, refs FROM bodies').fetchall()
+
+def test_store_same_body_again(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store('https://a/page', response(b'<html>same</html>'))
+    cache.store('https://a/page', response(b'<html>same</html>', etag='"v2"'))
+    (cached, fresh) = cache.lookup('https://a/page')
+    assert cached.content == b'<html>same</html>' and fresh
+    assert cached.headers['ETag'] == '"v2"'
+    assert [refs for (_, refs) in bodies(cache)] == [1]
+
+def test_store_changed_body_removes_old_body(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store('https://a/page', response(b'old'))
+    (oldDigest, _) = bodies(cache)[0]
+    cache.store('https://a/page', response(b'new'))
+    assert cache.lookup('https://a/page')[0].content == b'new'
+    assert [digest for (digest, _) in bodies(cache)] != [oldDigest]
+    assert not os.path.exists(cache._path(oldDigest))
+
+def test_shared_body_is_kept_while_referenced(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store('https://a/one', response(b'shared'))
+    cache.store('https://a/two', response(b'shared'))
+    cache.store('https://a/one', response(b'other'))
+    assert cache.lookup('https://a/two')[0].content == b'shared'
+    assert cache.lookup('https://a/one')[0].content == b'other'
+    assert sorted(refs for (_, refs) in bodies(cache)) == [1, 1]
@@ -0,0 +1,118 @@
+# test_revision_store.py
+
+import json
+from urllib.parse import parse_qs, urlsplit
+from benchmark import ORIGIN, FixtureServer
+from conftest import Responses
+from revision_store import RevisionStore
+
+class MediaWikiApi:
+    '''
+    Stand-in for the revisions query of the MediaWiki API, answering with the current revision id of each known title.
+    '''
+    def __init__(self, revisions, redirects=None):
+        self.revisions = revisions
+        self.redirects = redirects or {}
+        self.calls = 0
+        self.status = 200
+
+    def __call__(self, path):
+        self.calls += 1
+        if self.status != 200:
+            return (self.status, {}, b'')
+        titles = parse_qs(urlsplit(path).query)['titles'][0].split('|')
+        redirects = [{'from': title, 'to': self.redirects[title]} for title in titles if title in self.redirects]
+        pages = []
+        for title in {self.redirects.get(title, title) for title in titles}:
+            if title in self.revisions:
+                pages.append({'title': title, 'revisions': [{'revid': self.revisions[title]}]})
+            else:
+                pages.append({'title': title, 'missing': True})
+        body = json.dumps({'query': {'redirects': redirects, 'pages': pages}}).encode('utf-8')
+        return (200, {'Content-Type': 'application/json'}, body)
+
+def parse(content):
+    '''
+    A parser storing the text of a page.
+    '''
+    return content.decode('utf-8')
+
+def wiki(titles, api):
+    pages = {f'/wiki/{title}': Responses((200, {}, f'<p>{title}</p>'.encode('utf-8'))) for title in titles}
+    pages['/w/api.php'] = api
+    return pages
+
+def urls(*titles):
+    return [f'{ORIGIN}/wiki/{title}' for title in titles]
+
+def test_refresh_fetches_only_changed_pages(fetching, tmp_path):
+    api = MediaWikiApi({'A': 1, 'B': 1, 'C': 1})
+    pages = wiki('ABC', api)
+    store = RevisionStore(str(tmp_path / 'revisions.sqlite'), batchSize=2)
+    with FixtureServer(pages):
+        assert store.refresh('text', urls('A', 'B', 'C'), parse) == ['<p>A</p>', '<p>B</p>', '<p>C</p>']
+        assert [pages[f'/wiki/{title}'].calls for title in 'ABC'] == [1, 1, 1]
+        # Two batches of titles
+        assert api.calls == 2
+
+        assert store.refresh('text', urls('A', 'B', 'C'), parse) == ['<p>A</p>', '<p>B</p>', '<p>C</p>']
+        assert [pages[f'/wiki/{title}'].calls for title in 'ABC'] == [1, 1, 1]
+
+        api.revisions['B'] = 2
+        store.refresh('text', urls('A', 'B', 'C'), parse)
+        assert [pages[f'/wiki/{title}'].calls for title in 'ABC'] == [1, 2, 1]
+
+def test_kinds_are_stored_apart(fetching, tmp_path):
+    pages = wiki('A', MediaWikiApi({'A': 1}))
+    store = RevisionStore(str(tmp_path / 'revisions.sqlite'))
+    with FixtureServer(pages):
+        store.refresh('text', urls('A'), parse)
+        assert store.refresh('length', urls('A'), len) == [len('<p>A</p>')]
+    assert pages['/wiki/A'].calls == 2
+
+def test_redirects_get_the_revision_of_their_target(fetching, tmp_path):
+    api = MediaWikiApi({'Target': 7}, redirects={'Old': 'Target'})
+    pages = wiki(['Old'], api)
+    store = RevisionStore(str(tmp_path / 'revisions.sqlite'))
+    with FixtureServer(pages):
+        store.refresh('text', urls('Old'), parse)
+        assert store.lookup('text', 'Old', 7) == (True, '<p>Old</p>')
+        store.refresh('text', urls('Old'), parse)
+    assert pages['/wiki/Old'].calls == 1
+
+def test_failed_pages_are_not_stored(fetching, tmp_path):
+    pages = wiki('A', MediaWikiApi({'A': 1, 'B': 1}))
+    pages['/wiki/B'] = Responses(*[(503, {}, b'')] * (fetching.RETRIES + 1), (200, {}, b'<p>B</p>'))
+    store = RevisionStore(str(tmp_path / 'revisions.sqlite'))
+    with FixtureServer(pages):
+        (a, b) = store.refresh('text', urls('A', 'B'), parse)
+        assert a == '<p>A</p>'
+        assert isinstance(b, fetching.FetchFailure) and b.status == 503
+        assert store.lookup('text', 'B', 1) == (False, None)
+        assert store.refresh('text', urls('A', 'B'), parse) == ['<p>A</p>', '<p>B</p>']
+    assert pages['/wiki/A'].calls == 1
+
+def test_unanswered_revisions_fetch_again(fetching, tmp_path):
+    api = MediaWikiApi({'A': 1})
+    pages = wiki('A', api)
+    store = RevisionStore(str(tmp_path / 'revisions.sqlite'))
+    with FixtureServer(pages):
+        store.refresh('text', urls('A'), parse)
+        api.status = 404
+        assert store.refresh('text', urls('A'), parse) == ['<p>A</p>']
+    assert pages['/wiki/A'].calls == 2
+
+def test_changed_pages_are_fetched_past_the_cache(fetching, tmp_path):
+    api = MediaWikiApi({'A': 1})
+    pages = wiki('', api)
+    pages['/wiki/A'] = Responses((200, {}, b'<p>first</p>'), (200, {}, b'<p>second</p>'))
+    fetching.enable_cache(str(tmp_path / 'cache'))
+    store = RevisionStore(str(tmp_path / 'revisions.sqlite'))
+    with FixtureServer(pages):
+        assert store.refresh('text', urls('A'), parse) == ['<p>first</p>']
+        api.revisions['A'] = 2
+        assert store.refresh('text', urls('A'), parse) == ['<p>second</p>']
+        assert store.lookup('text', 'A', 2) == (True, '<p>second</p>')
+        # The new revision replaced the cached page
+        assert fetching.get_html(urls('A')[0]).text == '<p>second</p>'
+    assert pages['/wiki/A'].calls == 2
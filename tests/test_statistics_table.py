@@ -0,0 +1,84 @@
+# test_statistics_table.py
+
+import math
+import random
+import statistics
+import pytest
+from statistics_table import StatisticsTable
+
+def test_to_csv_writes_missing_values_as_empty_cells(tmp_path):
+    table = StatisticsTable.from_records([{'team': 'A', 'name': 'x', 'ppg': 20.5, 'bpg': math.nan, 'rpg': 7.0}])
+    table.to_csv(str(tmp_path / 'players.csv'))
+    StatisticsTable.from_records([]).to_csv(str(tmp_path / 'empty.csv'))
+    assert (tmp_path / 'players.csv').read_bytes() == b'team,name,ppg,bpg,rpg\r\nA,x,20.5,,7.0\r\n'
+    assert (tmp_path / 'empty.csv').read_bytes() == b'team,name,ppg,bpg,rpg\r\n'
+
+def rows(seed, count=200, teams=7):
+    '''
+    Random player records with many ties and missing values.
+    '''
+    rng = random.Random(seed)
+    values = [0.0, 1.5, 2.0, 2.0, 7.25, math.nan, '', 'n/a']
+    return [{'team': f'Team {rng.randrange(teams)}', 'name': f'Player {number}', 'ppg': rng.choice(values), 'bpg': rng.choice(values),
+             'rpg': str(rng.choice(values))} for number in range(count)]
+
+def number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def ranking(record, column):
+    value = number(record[column])
+    return -math.inf if math.isnan(value) else value
+
+def names(table):
+    return list(table['name'])
+
+@pytest.mark.parametrize('seed', range(5))
+def test_top_k_matches_sorted_lists(seed):
+    records = rows(seed)
+    table = StatisticsTable.from_records(records)
+    teams = list(dict.fromkeys(record['team'] for record in records))
+    for (column, k) in [('ppg', 3), ('bpg', 1), ('rpg', 0), ('ppg', 1000)]:
+        expected = [record['name'] for team in teams
+                    for record in sorted((record for record in records if record['team'] == team), key=lambda record: -ranking(record, column))[:k]]
+        assert names(table.top_k(column, k)) == expected
+
+        expected = [record['name'] for record in sorted(records, key=lambda record: -ranking(record, column))[:k]]
+        assert names(table.top_k_overall(column, k)) == expected
+
+@pytest.mark.parametrize('seed', range(3))
+def test_ranks_and_sort_match_sorted_lists(seed):
+    records = rows(seed)
+    table = StatisticsTable.from_records(records)
+    top = table.top_k('ppg', 4)
+    teams = list(top['team'])
+    assert list(top.ranks()) == [teams[:position].count(team) for (position, team) in enumerate(teams)]
+    assert names(table.sort('bpg')) == [record['name'] for record in sorted(records, key=lambda record: -ranking(record, 'bpg'))]
+    assert names(table.sort('bpg', descending=False)) == [record['name'] for record in sorted(records, key=lambda record: ranking(record, 'bpg'))]
+
+@pytest.mark.parametrize('func, reference', [('mean', statistics.fmean), ('sum', math.fsum), ('count', len), ('max', max), ('min', min)])
+def test_aggregate_matches_python(func, reference):
+    records = rows(1)
+    table = StatisticsTable.from_records(records)
+    result = table.aggregate('rpg', func)
+    assert list(result) == list(dict.fromkeys(record['team'] for record in records))
+    for (team, value) in result.items():
+        present = [number(record['rpg']) for record in records if record['team'] == team and not math.isnan(number(record['rpg']))]
+        assert value == pytest.approx(reference(present)) if present or func == 'count' else math.isnan(value)
+
+def test_aggregate_of_groups_without_values():
+    table = StatisticsTable.from_records([{'team': 'A', 'name': 'x', 'ppg': ''}, {'team': 'B', 'name': 'y', 'ppg': '3'}])
+    assert table.aggregate('ppg', 'count') == {'A': 0.0, 'B': 1.0}
+    assert all(math.isnan(table.aggregate('ppg', func)['A']) for func in ('mean', 'max', 'min'))
+    with pytest.raises(ValueError):
+        table.aggregate('ppg', 'median')
+
+def test_concat_skips_none_and_merges_categories():
+    records = rows(2)
+    parts = [StatisticsTable.from_records(records[:50]), None, StatisticsTable.from_records([]), StatisticsTable.from_records(records[50:])]
+    table = StatisticsTable.concat(parts)
+    assert str(table.to_records()) == str(StatisticsTable.from_records(records).to_records())
+    assert table.codes('team')[1] == list(dict.fromkeys(record['team'] for record in records))
+    assert len(StatisticsTable.concat([None, None])) == 0
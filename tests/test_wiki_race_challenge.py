@@ -0,0 +1,104 @@
+# test_wiki_race_challenge.py
+
+import json
+import pytest
+import cli
+import requesting_urls
+import wiki_race_challenge
+from benchmark import FixtureServer
+from wiki_race_challenge import LinkGraph, RaceError, WikiRace
+
+ORIGIN = 'https://en.wikipedia.org'
+
+class StubRace(WikiRace):
+    '''
+    WikiRace over fixed links and backlinks by title. Titles mapped to None fail to fetch, and the backlinks of the titles in cut are incomplete.
+    '''
+    def __init__(self, links, backlinks, cut=(), graph=None, **kwargs):
+        super().__init__(graph or LinkGraph(ORIGIN), maxWorkers=2, **kwargs)
+        self.stubLinks = links
+        self.stubBacklinks = backlinks
+        self.cut = set(cut)
+
+    def _fetch(self, titles, node):
+        result = titles.get(self.graph.titles[node], [])
+        if result is None:
+            raise requesting_urls.FetchError(requesting_urls.FetchFailure(self.graph.url(node), 'status', status=503, attempts=5))
+        return (result, self.graph.titles[node] not in self.cut)
+
+    def _links(self, node):
+        return self._fetch(self.stubLinks, node)
+
+    def _backlinks(self, node):
+        return self._fetch(self.stubBacklinks, node)
+
+def url(title):
+    return f'{ORIGIN}/wiki/{title}'
+
+def test_failed_page_past_end_of_adjacency_is_dead_end():
+    # The goal's backlinks fail before the backlinks adjacency was ever grown
+    race = StubRace({'A': ['B', 'C']}, {'G': None})
+    assert race.shortest_path(url('A'), url('G')) is None
+
+def test_failed_page_has_no_neighbours():
+    # B fails in the same level that C is expanded, so B's slice would otherwise run over C's links
+    race = StubRace({'A': ['B', 'C'], 'B': None, 'C': ['D', 'Y']}, {'G': ['D', 'E', 'F']})
+    assert race.shortest_path(url('A'), url('G')) == [url('A'), url('C'), url('D'), url('G')]
+    assert not race.graph.links.expanded(race.graph.ids['B'])
+
+def test_start_is_goal():
+    race = StubRace({}, {})
+    assert race.shortest_path(url('A'), url('A')) == [url('A')]
+
+def test_search_goes_on_forward_after_cut_backlinks():
+    # Only X of the goal's backlinks was fetched, and X is a dead end: the backward search running out proves nothing
+    race = StubRace({'A': ['B'], 'B': ['D'], 'D': ['G']}, {'G': ['X']}, cut={'G'})
+    assert race.shortest_path(url('A'), url('G')) == [url('A'), url('B'), url('D'), url('G')]
+
+def test_cut_backlinks_are_not_saved_as_expanded(tmp_path):
+    race = StubRace({'A': ['B', 'C'], 'B': ['D'], 'D': ['G']}, {'G': ['X'], 'X': []}, cut={'G'})
+    race.shortest_path(url('A'), url('G'))
+    path = str(tmp_path / 'graph.bin')
+    race.graph.save(path)
+
+    graph = LinkGraph.load(path)
+    assert not graph.backlinks.expanded(graph.ids['G'])
+    assert graph.backlinks.expanded(graph.ids['X'])
+    assert graph.links.expanded(graph.ids['A'])
+    # A later race fetches the cut backlinks again, and finds all of them this time
+    race = StubRace({'A': ['B'], 'B': ['D']}, {'G': ['X', 'D']}, graph=graph)
+    assert race.shortest_path(url('A'), url('G')) == [url('A'), url('B'), url('D'), url('G')]
+    assert race.graph.backlinks.expanded(graph.ids['G']) and not race.graph.backlinks.partial
+
+def backlinks_api(pages):
+    '''
+    Returns a stand-in of the backlinks API serving pages (lists of titles) one after another, with a 'continue' before every page but the last.
+    '''
+    def serve(path):
+        position = int(path.partition('blcontinue=')[2].partition('&')[0] or 0)
+        response = {'query': {'backlinks': [{'title': title} for title in pages[position]]}}
+        if position + 1 < len(pages):
+            response['continue'] = {'blcontinue': str(position + 1), 'continue': '-||'}
+        return (200, {'Content-Type': 'application/json'}, json.dumps(response).encode('utf-8'))
+    return serve
+
+@pytest.mark.parametrize('maxBacklinks, complete', [(5, True), (4, True), (3, False)])
+def test_backlinks_past_limit_are_incomplete(maxBacklinks, complete):
+    with FixtureServer({'/w/api.php': backlinks_api([['B', 'C'], ['D', 'E']])}):
+        race = WikiRace(LinkGraph(ORIGIN), maxBacklinks=maxBacklinks)
+        (titles, fetchedAll) = race._backlinks(race.graph.id('G'))
+    assert titles == ['B', 'C', 'D', 'E'][:maxBacklinks]
+    assert fetchedAll is complete
+
+def test_too_many_pages_raise_race_error():
+    race = StubRace({'A': ['B', 'C'], 'B': ['D'], 'C': ['E']}, {'G': ['X'], 'X': ['Y']}, maxPages=3)
+    with pytest.raises(RaceError):
+        race.shortest_path(url('A'), url('G'))
+
+def test_race_error_is_a_clean_command_line_error(monkeypatch, capsys):
+    def giveUp(start, goal):
+        raise RaceError('Gave up after fetching 5000 pages (maxPages=5000)')
+    monkeypatch.setattr(wiki_race_challenge, 'race', giveUp)
+    with pytest.raises(SystemExit) as exit:
+        cli.main(['race', url('A'), url('G')])
+    assert exit.value.code == f'No path from {url("A")} to {url("G")}: Gave up after fetching 5000 pages (maxPages=5000)'
@@ -0,0 +1,90 @@
+# test_wikitables.py
+
+import re
+import lxml.html
+import pytest
+import wikitables
+from wikitables import Column
+
+def table(html):
+    return lxml.html.fragment_fromstring(html)
+
+def texts(grid):
+    return [[None if cell is None else wikitables.cell_text(cell) for cell in row] for row in grid]
+
+def test_grid_repeats_spanning_cells():
+    grid = wikitables.table_grid(table(
+        '<table>'
+        '<tr><th rowspan="2">Date</th><th colspan="2">Place</th></tr>'
+        '<tr><th>Venue</th><th>Country</th></tr>'
+        '<tr><td>1</td><td rowspan="3">Wengen</td><td>SUI</td></tr>'
+        '<tr><td>2</td><td>SUI</td></tr>'
+        '<tr><td>3</td><td>AUT</td></tr>'
+        '<tr><td colspan="2">4</td></tr>'
+        '</table>'))
+    assert texts(grid) == [['Date', 'Place', 'Place'], ['Date', 'Venue', 'Country'], ['1', 'Wengen', 'SUI'], ['2', 'Wengen', 'SUI'],
+                           ['3', 'Wengen', 'AUT'], ['4', '4']]
+
+def test_grid_of_ragged_rows_and_bad_spans():
+    grid = wikitables.table_grid(table(
+        '<table><tbody>'
+        '<tr><td rowspan="x">a</td><td colspan="0">b</td><td rowspan="2">c</td></tr>'
+        '<tr><td>d</td></tr>'
+        '<tr></tr>'
+        '</tbody></table>'))
+    assert texts(grid) == [['a', 'b', 'c'], ['d', None, 'c'], []]
+
+def test_grid_leaves_out_nested_tables():
+    grid = wikitables.table_grid(table('<table><tr><td><table><tr><td>inner</td><td>x</td></tr></table></td><td>outer</td></tr></table>'))
+    assert texts(grid) == [['innerx', 'outer']]
+    assert len(wikitables.table_rows(grid[0][0].getparent().getparent())) == 1
+
+def test_colspan_is_capped():
+    (row,) = wikitables.table_grid(table(f'<table><tr><td colspan="{10 ** 9}">wide</td></tr></table>'))
+    assert len(row) == wikitables.MAX_COLSPAN
+
+def test_span_skips_nested_tables():
+    content = (b'<p>intro</p><table class="infobox"><tr><td>x</td></tr></table>'
+               b'<table class="wikitable"><tr><td><table class="inner"><tr><td><TABLE><tr><td>deep</td></tr></TABLE></td></tr></table></td></tr></table>'
+               b'<table class="wikitable sortable"></table>')
+    (start, end) = wikitables.table_span(content, re.compile(rb'class="wikitable'))
+    assert content[start:end].startswith(b'<table class="wikitable">') and content[end:].startswith(b'<table class="wikitable sortable">')
+    # A nested table can be matched too, and its span is its own
+    (start, end) = wikitables.table_span(content, re.compile(rb'class="inner"'))
+    assert content[start:end].endswith(b'</TABLE></td></tr></table>') and content[end:].startswith(b'</td></tr></table>')
+    assert wikitables.table_span(content, re.compile(rb'sortable'), start=end) == (content.index(b'<table class="wikitable sortable">'), len(content))
+    assert wikitables.table_span(content, re.compile(rb'class="navbox"')) is None
+
+def test_span_of_unclosed_table_runs_to_the_end():
+    content = b'<table class="wikitable"><tr><td><table></table>'
+    assert wikitables.table_span(content, re.compile(rb'wikitable')) == (0, len(content))
+
+def test_parse_table_matches_full_parse():
+    content = '<html><body><table class="wikitable"><tr><th>Venue</th></tr><tr><td>Kitzbühel</td></tr></table></body></html>'.encode('utf-8')
+    (full,) = wikitables.find_tables(lxml.html.fromstring(content.decode('utf-8')), 'wikitable')
+    partial = wikitables.parse_table(content, re.compile(rb'wikitable'))
+    assert texts(wikitables.table_grid(partial)) == texts(wikitables.table_grid(full)) == [['Venue'], ['Kitzbühel']]
+
+def test_find_tables_needs_every_class():
+    tree = lxml.html.fromstring('<div><table class="wikitable"></table><table class=" sortable  wikitable x"></table><table class="wikitables"></table></div>')
+    assert [element.get('class') for element in wikitables.find_tables(tree, 'wikitable sortable')] == [' sortable  wikitable x']
+    assert len(wikitables.find_tables(tree)) == 2
+
+COLUMNS = [Column('date', ['Date']), Column('venue', ['venue', 'Location']), Column('number', ['No.'], int)]
+
+def test_records_map_headers_to_columns():
+    rows = wikitables.records(table(
+        '<table>'
+        '<tr><th rowspan="2">No.</th><th colspan="2">Race</th></tr>'
+        '<tr><th>DATE</th><th>Location</th></tr>'
+        '<tr><td>1</td><td>12 January 2020</td><td rowspan="2">Wengen</td></tr>'
+        '<tr><td>2</td><td>13 January 2020</td></tr>'
+        '<tr><td colspan="3">Cancelled races are not listed</td></tr>'
+        '<tr><td>n/a</td><td>19 January 2020</td><td>Kitzbühel</td></tr>'
+        '<tr><td>4</td><td>26 January 2020</td></tr>'
+        '</table>'), COLUMNS)
+    assert rows == [{'date': '12 January 2020', 'venue': 'Wengen', 'number': 1}, {'date': '13 January 2020', 'venue': 'Wengen', 'number': 2}]
+
+def test_records_need_every_column():
+    with pytest.raises(ValueError):
+        wikitables.records(table('<table><tr><th>Date</th><th>No.</th></tr><tr><td>1 May 2020</td><td>1</td></tr></table>'), COLUMNS)
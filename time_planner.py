@@ -1,68 +1,82 @@
-from bs4 import BeautifulSoup
-import requesting_urls
+import datetime
+from document import Document
+from event_calendar import Event, EventIndex
+from functools import lru_cache
+import instrumentation
+import itertools
+import os
+import output_writers
 import re
+import sys
+from urllib.parse import urlsplit
+import wikitables
+
+# Regex to find the date (D(D) Month YYYY) in a date cell
+_REGEX_DATE = re.compile(r"([\d]{1,2} [\w]+ [\d]{4})")
+
+# Regex matching the opening tag of the events table in raw html (class 'wikitable plainrowheaders', the classes in any order)
+_REGEX_EVENTS_TABLE = re.compile(rb'class="(?=[^"]*\bwikitable\b)(?=[^"]*\bplainrowheaders\b)')
+
+# Month numbers by name and three letter abbreviation
+_MONTHS = {name: number for (number, month) in enumerate(['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August',
+                                                          'September', 'October', 'November', 'December'], 1)
+           for name in (month, month[:3])}
+
+# Regex matching the race number (or 'cnx' for cancelled races) after the event key in a type cell
+_REGEX_TYPE_NUMBER = re.compile(r"([\dcnx]{3})")
+
+def _format_date(text):
+    '''
+    Extracts the date string (D(D) Month YYYY) of a date cell. Raises ValueError if there is none, so rows without a date are skipped.
+    '''
+    match = _REGEX_DATE.search(text)
+    if match is None:
+        raise ValueError(f'no date in {text!r}')
+    return match.group(1)
+
+def _format_type(text):
+    '''
+    Formats a type cell as its event key (removes the numbers after the event key).
+    '''
+    return _REGEX_TYPE_NUMBER.sub('', text).strip()
+
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    '''
+    Parses a date string (D(D) Month YYYY, as extracted by extract_events()) into a datetime.date.
+    Memoized, as the races of a season fall on a few hundred days at most. Raises ValueError if text is not such a date.
+    '''
+    (day, month, year) = text.split()
+    if month not in _MONTHS:
+        raise ValueError(f'unknown month in {text!r}')
+    return datetime.date(int(year), _MONTHS[month], int(day))
+
+# The (date, venue, type) columns of the events table
+_EVENT_COLUMNS = [wikitables.Column('date', ['Date'], _format_date),
+                  wikitables.Column('venue', ['Venue', 'Place', 'Location']),
+                  wikitables.Column('type', ['Type', 'Discipline'], _format_type)]
 
 def extract_events(url, createSlip=True):
     '''
     Takes a url and extracts data (date, venue, type) from the main table.
+    The table is read with wikitables on the lxml tree of the page, so venues spanning several races (rowspan) are given to each of them.
     If createSlip is True (default), creates an empty betting slip, saved to datetime_filter/betting_slip_empty.md
     Returns the data as an array of (date, venue, type) arrays.
 
     Args:
-        url:        The url of which site to extract events from.
+        url:        The url of which site to extract events from, or a Document.
         createSlip: (Optional) Whether to create a betting slip with the extracted data. Defaults to True.
     Returns:
         Array<Array<String>> data:  Returns the set of data (array of each (date, venue, type) for each row) extracted.
     '''
-    response = requesting_urls.get_html(url)
-    document = BeautifulSoup(response.content, "lxml")
-    table = document.find('table', {"class": 'wikitable plainrowheaders'})
-    rows = table.find_all("tr")
-
-    # Remove filler rows
-    for row in rows:
-        if (len(row.find_all(["td"])) < 2):
-            rows.remove(row)
-
-    # Array to keep (date, venue, type) values for each row
-    data = []
-
-    # Extract date, venue and type for each row
-    for i in range(0, len(rows)):
-        cells = rows[i].find_all(["td"])
-        cells = cells[0:5] # Limit to first 5 data cells
+    if not isinstance(url, Document):
+        url = Document(url)
+    tree = url.tree
+    with instrumentation.stage('extract_events.table'):
+        table = wikitables.find_tables(tree, 'wikitable plainrowheaders')[0]
 
-        cells_text = [cell.get_text(strip=True) for cell in cells] # Strip for html tags
-
-        # Use regex to filter out the first cells until date, this being '#' 'event' and empty cells. Makes date the first cell
-        while re.search(r"^[\d]*$", cells_text[0], flags=re.VERBOSE | re.MULTILINE):
-            cells_text.pop(0)
-
-        # Use regex to filter out all cells after type. Makes type the last cell
-        for j in range(len(cells_text)):
-            if re.search(r"[A-Z]{2}[\dcnx]{3}", cells_text[j]):
-                cells_text = cells_text[:j+1]
-                break
-
-        # Check length of cells_text. If 2, venue is missing and is set equals to previous row's venue
-        if (len(cells_text) == 2 and i != 1):
-            venue = data[i-1][1]
-            cells_text.insert(1, venue)
-
-        # Add to data
-        data.append(cells_text)
-
-    # Format data
-    for cells in data:
-        (date, venue, type) = cells
-
-        # Format date (extract only date string as D(D) Month YYYY)
-        date = re.findall(r"([\d]{1,2} [\w]+ [\d]{4})", date, flags=0)[0]
-        cells[0] = date
-
-        # Format type (remove numbers after event key)
-        type = re.sub(r"([\dcnx]{3})", '', type)
-        cells[2] = type
+        # Array to keep (date, venue, type) values for each row
+        data = [[record['date'], record['venue'], record['type']] for record in wikitables.records(table, _EVENT_COLUMNS)]
 
     # Call createBettingSlip to create empty betting slip if createSlip==True
     if createSlip:
@@ -71,23 +85,100 @@ def extract_events(url, createSlip=True):
     # Always return data
     return data
 
-def createBettingSlip(data):
+def createBettingSlip(data, output='betting_slip_empty.md', saveToFolder='datetime_filter'):
     '''
     Takes an array of (date, venue, type) arrays and formats an empty betting slip to ./datetime_filter/betting_slip_empty.md
+    Other extensions of output save one {'date', 'venue', 'type'} record per event in that format instead (see output_writers), e.g. 'slip.csv'.
 
     Args:
-        data: An array of arrays (date, venue, type) of the data to include in the betting slip
+        data:           An array of arrays (date, venue, type) of the data to include in the betting slip
+        output:         (Optional) The filename for where to save the betting slip. Defaults to 'betting_slip_empty.md'.
+        saveToFolder:   (Optional) The folder for where to save the betting slip. Defaults to 'datetime_filter'.
+    '''
+    header = ['BETTING SLIP', '', 'Name:', '',
+              'Event Key: DH – Downhill, SL – Slalom, GS – Giant Slalom, SG – Super Giant Slalom, AC – Alpine Combined, PG – Parallel Giant Slalom', '',
+              '| **DATE** | **VENUE** | **DISCIPLINE** | **Who wins?** |',
+              '| --- | --- | --- | --- |']
+    lines = itertools.chain(header, (f'| {date} | {venue} | {type} |  |' for (date, venue, type) in data))
+    records = ({'date': date, 'venue': venue, 'type': type} for (date, venue, type) in data)
+    output_writers.save(os.path.join(saveToFolder, output), lines, records)
+
+def _parse_events(content):
+    '''
+    Parses the events table of a season page into (date, venue, type) rows, with each date parsed once (see parse_date()) into ISO format.
+    Only the events table is parsed, out of the raw html of the page (see wikitables.parse_table()).
+    Module level (and only taking bytes) so it can run on a process pool, and its rows can be kept in a RevisionStore.
+
+    Args:
+        content:    The html of the season page, as bytes.
+    Returns:
+        <Array<Array<String>>> rows:    The (ISO date, venue, type) of each event. None if the page has no events table.
+    '''
+    table = wikitables.parse_table(content, _REGEX_EVENTS_TABLE)
+    if table is None:
+        return None
+    rows = []
+    for record in wikitables.records(table, _EVENT_COLUMNS):
+        try:
+            rows.append([parse_date(record['date']).isoformat(), record['venue'], record['type']])
+        except ValueError:
+            continue
+    return rows
+
+def extract_seasons(urls, maxWorkers=8, parsePool=None, store=None, index=None):
+    '''
+    Batch mode of extract_events(): extracts the events of many season pages (of any number of competitions) into one EventIndex.
+    The pages are fetched concurrently (see requesting_urls.get_many()), and only their events tables are parsed, on parsePool if given.
+    If store is given, the events are looked up in it by page revision, and only pages that changed are fetched and parsed.
+    Each page is a season, named by its title. The events of a season replace the ones the index held for it,
+    while seasons whose page could not be fetched (see requesting_urls.FetchFailure) or has no events table keep their events.
+
+    Args:
+        urls:       The urls of the season pages.
+        maxWorkers: (Optional) The number of pages to fetch at once. Defaults to 8.
+        parsePool:  (Optional) An executor to parse the pages on, e.g. a ProcessPoolExecutor. Defaults to None (parse in this thread).
+        store:      (Optional) A revision_store.RevisionStore to reuse the events of unchanged pages from. Defaults to None (fetch every page).
+        index:      (Optional) The EventIndex to update. Defaults to None (a new one).
+    Returns:
+        <EventIndex> index: The index, holding the events of every season extracted.
     '''
-    with open (f'./datetime_filter/betting_slip_empty.md', 'w', encoding='utf-8') as f:
-        f.write('BETTING SLIP\n\nName:\n\n')
-        f.write('Event Key: DH – Downhill, SL – Slalom, GS – Giant Slalom, SG – Super Giant Slalom, AC – Alpine Combined, PG – Parallel Giant Slalom\n\n')
-        f.write('| **DATE** | **VENUE** | **DISCIPLINE** | **Who wins?** |\n')
-        f.write('| --- | --- | --- | --- |\n')
-        for row in data:
-            (date, venue, type) = row
-            f.write(f'| {date} | {venue} | {type} |  |\n')
+    import requesting_urls
+    from revision_store import RevisionStore
+    urls = list(dict.fromkeys(urls))
+    values = [None] * len(urls)
+
+    if store is not None:
+        # A store asks revisions from one Wikipedia at a time
+        hosts = {}
+        for (position, url) in enumerate(urls):
+            hosts.setdefault(urlsplit(url).netloc, []).append(position)
+        for positions in hosts.values():
+            for (position, value) in zip(positions, store.refresh('events', [urls[position] for position in positions], _parse_events,
+                                                                  parsePool=parsePool, concurrency=maxWorkers)):
+                values[position] = value
+    else:
+        responses = requesting_urls.get_many(urls, concurrency=maxWorkers)
+        fetched = [position for (position, response) in enumerate(responses) if not isinstance(response, requesting_urls.FetchFailure)]
+        contents = [responses[position].content for position in fetched]
+        with instrumentation.stage('extract_events.table'):
+            parsed = list(parsePool.map(_parse_events, contents)) if parsePool is not None else [_parse_events(content) for content in contents]
+        for (position, rows) in zip(fetched, parsed):
+            values[position] = rows
+
+    seasons = {}
+    for (url, rows) in zip(urls, values):
+        if rows is None or isinstance(rows, requesting_urls.FetchFailure):
+            continue
+        season = RevisionStore.title(url)
+        seasons[season] = [Event(datetime.date.fromisoformat(day), venue, type, season) for (day, venue, type) in rows]
+
+    index = index if index is not None else EventIndex()
+    with instrumentation.stage('extract_events.index'):
+        index.update(seasons)
+    return index
 
 
 if __name__ == "__main__":
     url = 'https://en.wikipedia.org/wiki/2019%E2%80%9320_FIS_Alpine_Ski_World_Cup'
-    extract_events(url)
+    with instrumentation.profiling('--profile' in sys.argv):
+        extract_events(url)
@@ -0,0 +1,372 @@
+# wiki_race_challenge.py
+
+import json
+import os
+import sys
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+import filter_urls
+import instrumentation
+import normalize_urls
+import requesting_urls
+
+# Namespaces of non-article pages. filter_urls.find_articles() cuts urls at ':', so links to e.g. 'File:X.jpg' come out as 'File'
+_NAMESPACES = frozenset(['Wikipedia', 'File', 'Help', 'Template', 'Template_talk', 'Special', 'Category', 'Portal', 'Talk',
+                         'User', 'User_talk', 'Draft', 'Module', 'MediaWiki', 'Book', 'TimedText', 'Media', 'Wikipedia_talk'])
+
+# Where the crawled link graph is saved between runs
+GRAPH_FILE = './wiki_race_challenge/link_graph.bin'
+
+class RaceError(RuntimeError):
+    '''
+    Raised when a race gives up, after fetching more pages than its maxPages allows.
+    '''
+
+class _Adjacency:
+    '''
+    Array backed adjacency lists of a directed graph over integer node ids.
+    The neighbours of all expanded nodes are stored back to back in one flat 'targets' array, and each node has the offset and length
+    of its slice (CSR with rows in expansion order). A length of -1 means the node has not been expanded yet.
+    Nodes whose neighbours are known only in part (e.g. backlinks cut at a limit) are 'partial': usable in the race that fetched them,
+    but saved as not expanded, so later races fetch them again.
+    '''
+    def __init__(self):
+        self.start = array('q')
+        self.count = array('q')
+        self.targets = array('i')
+        self.partial = set()
+
+    def grow(self, size):
+        '''
+        Makes room for node ids up to size - 1.
+        '''
+        missing = size - len(self.count)
+        if missing > 0:
+            self.start.extend([0] * missing)
+            self.count.extend([-1] * missing)
+
+    def expanded(self, node):
+        '''
+        Returns whether the neighbours of node are known.
+        '''
+        return node < len(self.count) and self.count[node] >= 0
+
+    def neighbours(self, node):
+        '''
+        Returns the neighbours of an expanded node, as a read-only slice of the targets array.
+        '''
+        start = self.start[node]
+        return memoryview(self.targets)[start:start + self.count[node]]
+
+    def set_neighbours(self, node, neighbours, complete=True):
+        '''
+        Stores the neighbours of node, all of them unless complete is False.
+        '''
+        self.start[node] = len(self.targets)
+        self.count[node] = len(neighbours)
+        self.targets.extend(neighbours)
+        if complete:
+            self.partial.discard(node)
+        else:
+            self.partial.add(node)
+
+    def saved_count(self):
+        '''
+        Returns the lengths to save: those of partial nodes are saved as -1 (not expanded).
+        '''
+        if not self.partial:
+            return self.count
+        count = array('q', self.count)
+        for node in self.partial:
+            count[node] = -1
+        return count
+
+class LinkGraph:
+    '''
+    Graph of the links between Wikipedia articles crawled so far, both forward (the links on a page) and backward (the pages linking to a page).
+    Titles are interned to integer ids, and the adjacency is kept in compact arrays, so the graph stays small enough to persist
+    and reload between races (see save() and load()).
+
+    Args:
+        origin: The 'scheme://host' of the Wikipedia the titles belong to.
+    '''
+    def __init__(self, origin):
+        self.origin = origin
+        self.titles = []
+        self.ids = {}
+        self.links = _Adjacency()
+        self.backlinks = _Adjacency()
+
+    def __len__(self):
+        return len(self.titles)
+
+    def id(self, title):
+        '''
+        Returns the integer id of a title, assigning the next id to titles not seen before.
+
+        Args:
+            title:  The title, as in the canonical url of the article.
+        Returns:
+            <int>:  The id of the title.
+        '''
+        node = self.ids.get(title)
+        if node is None:
+            node = self.ids[title] = len(self.titles)
+            self.titles.append(title)
+        return node
+
+    def url(self, node):
+        '''
+        Returns the url of the article with the given id.
+        '''
+        return f'{self.origin}/wiki/{self.titles[node]}'
+
+    def title(self, url):
+        '''
+        Returns the title of an article url on this graph's Wikipedia, or None if url is not an article on it.
+        '''
+        url = normalize_urls.normalize_url(url)
+        prefix = f'{self.origin}/wiki/'
+        if not url.startswith(prefix):
+            return None
+        title = url[len(prefix):]
+        if not title or '?' in title or title in _NAMESPACES:
+            return None
+        return title
+
+    def save(self, path=GRAPH_FILE):
+        '''
+        Saves the graph to a file: a json header line (origin and titles), followed by the raw adjacency arrays.
+
+        Args:
+            path:   (Optional) The file to save to. Defaults to GRAPH_FILE.
+        '''
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp = f'{path}.tmp'
+        with open(temp, 'wb') as f:
+            header = {'origin': self.origin, 'titles': self.titles,
+                      'links': len(self.links.targets), 'backlinks': len(self.backlinks.targets)}
+            f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n')
+            for adjacency in (self.links, self.backlinks):
+                adjacency.grow(len(self.titles))
+                adjacency.start.tofile(f)
+                adjacency.saved_count().tofile(f)
+                adjacency.targets.tofile(f)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path=GRAPH_FILE):
+        '''
+        Loads a graph saved with save().
+
+        Args:
+            path:   (Optional) The file to load from. Defaults to GRAPH_FILE.
+        Returns:
+            <LinkGraph> graph:  The loaded graph.
+        '''
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            graph = cls(header['origin'])
+            graph.titles = header['titles']
+            graph.ids = {title: node for (node, title) in enumerate(graph.titles)}
+            for (adjacency, edges) in ((graph.links, header['links']), (graph.backlinks, header['backlinks'])):
+                adjacency.start.fromfile(f, len(graph.titles))
+                adjacency.count.fromfile(f, len(graph.titles))
+                adjacency.targets.fromfile(f, edges)
+        return graph
+
+class WikiRace:
+    '''
+    Finds shortest paths of links between Wikipedia articles with bidirectional breadth first search:
+    forward from the start article over the links on each page (filter_urls.find_articles()),
+    and backward from the goal article over the pages linking to it (the MediaWiki backlinks API).
+    Each step expands the smaller of the two frontiers, fetching its pages concurrently.
+    Visited articles are tracked by integer id, and every page crawled is kept in the LinkGraph, so later races reuse it.
+    Backlinks are only fetched up to maxBacklinks per article. An article with more is kept in the graph as partial (see _Adjacency),
+    and once the backward search runs out after cutting a list, the forward search carries on alone, so a path is still found when there is one.
+    A path found through cut backlink lists may however be longer than the shortest.
+
+    Args:
+        graph:          The LinkGraph to crawl into (and reuse).
+        maxWorkers:     (Optional) The number of pages to fetch at once. Defaults to 16.
+        maxBacklinks:   (Optional) The maximum number of backlinks fetched per article. Defaults to 500.
+        maxPages:       (Optional) The maximum number of pages to fetch in one race. Defaults to 5000.
+    '''
+    def __init__(self, graph, maxWorkers=16, maxBacklinks=500, maxPages=5000):
+        self.graph = graph
+        self.maxWorkers = maxWorkers
+        self.maxBacklinks = maxBacklinks
+        self.maxPages = maxPages
+        self.fetched = 0
+        self.truncated = False
+
+    def _links(self, node):
+        '''
+        Fetches the titles of the articles linked from an article. Returns the (titles, complete) of the links (always complete).
+        '''
+        titles = (self.graph.title(url) for url in filter_urls.find_articles(self.graph.url(node)))
+        return (list(dict.fromkeys(title for title in titles if title is not None)), True)
+
+    def _backlinks(self, node):
+        '''
+        Fetches the titles of (up to maxBacklinks) articles linking to an article, with the MediaWiki API.
+        Returns the (titles, complete) of the backlinks, where complete is False if there were more than maxBacklinks.
+        '''
+        params = {'action': 'query', 'list': 'backlinks', 'bltitle': unquote(self.graph.titles[node]),
+                  'blnamespace': 0, 'bllimit': min(self.maxBacklinks, 500), 'format': 'json'}
+        titles = []
+        complete = False
+        while len(titles) < self.maxBacklinks:
+            response = requesting_urls.get_html(f'{self.graph.origin}/w/api.php', params=params).json()
+            for backlink in response.get('query', {}).get('backlinks', []):
+                title = self.graph.title(f"{self.graph.origin}/wiki/{backlink['title']}")
+                if title is not None:
+                    titles.append(title)
+            if 'continue' not in response:
+                complete = True
+                break
+            params.update(response['continue'])
+        return (titles[:self.maxBacklinks], complete and len(titles) <= self.maxBacklinks)
+
+    def _expand(self, frontier, adjacency, fetch, parents, others):
+        '''
+        Expands one level of one direction of the search. Pages not in the graph yet are fetched concurrently.
+        A page that cannot be fetched (requesting_urls.FetchError) is treated as a dead end, and left out of the graph so a later race fetches it again.
+
+        Args:
+            frontier:   The node ids at the current level.
+            adjacency:  The graph adjacency of this direction (links or backlinks).
+            fetch:      The function fetching the (titles, complete) of the neighbours of a node in this direction.
+            parents:    The (parent, distance) of every node visited in this direction.
+            others:     The (parent, distance) of every node visited in the other direction.
+        Returns:
+            <Tuple<Array<int>, Array<int>>> (frontier, meetings):   The next level, and the nodes on it already visited by the other direction.
+        '''
+        missing = [node for node in frontier if not adjacency.expanded(node)]
+        if adjacency.partial and not adjacency.partial.isdisjoint(frontier):
+            self.truncated = True
+        if self.fetched + len(missing) > self.maxPages:
+            raise RaceError(f'Gave up after fetching {self.fetched} pages (maxPages={self.maxPages})')
+        self.fetched += len(missing)
+
+        def fetchNode(node):
+            try:
+                return fetch(node)
+            except requesting_urls.FetchError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            for (node, result) in zip(missing, executor.map(fetchNode, missing)):
+                if result is None:
+                    continue
+                (titles, complete) = result
+                neighbours = [self.graph.id(title) for title in titles]
+                adjacency.grow(len(self.graph))
+                adjacency.set_neighbours(node, neighbours, complete=complete)
+                if not complete:
+                    self.truncated = True
+
+        nextFrontier = []
+        meetings = []
+        for node in frontier:
+            # Pages that could not be fetched have no neighbours (and may be past the end of the adjacency)
+            if not adjacency.expanded(node):
+                continue
+            for neighbour in adjacency.neighbours(node):
+                if neighbour not in parents:
+                    parents[neighbour] = (node, parents[node][1] + 1)
+                    nextFrontier.append(neighbour)
+                    if neighbour in others:
+                        meetings.append(neighbour)
+        return (nextFrontier, meetings)
+
+    def shortest_path(self, start, goal):
+        '''
+        Finds a shortest path of links from the start article to the goal article.
+
+        Args:
+            start:  The url of the start article.
+            goal:   The url of the goal article.
+        Returns:
+            <Array<String>> path:   The urls of the articles on the path, from start to goal. None if there is no path.
+        '''
+        (startTitle, goalTitle) = (self.graph.title(start), self.graph.title(goal))
+        if startTitle is None or goalTitle is None:
+            raise ValueError('start and goal must be article urls on the same Wikipedia as the graph')
+        (source, target) = (self.graph.id(startTitle), self.graph.id(goalTitle))
+        self.fetched = 0
+        self.truncated = False
+
+        forward = {source: (None, 0)}
+        backward = {target: (None, 0)}
+        (forwardFrontier, backwardFrontier) = ([source], [target])
+        meetings = [source] if source == target else []
+
+        # The backward search running out only proves there is no path if it saw every backlink; else the forward search goes on alone
+        while not meetings and forwardFrontier and (backwardFrontier or self.truncated):
+            if not backwardFrontier or len(forwardFrontier) <= len(backwardFrontier):
+                (forwardFrontier, meetings) = self._expand(forwardFrontier, self.graph.links, self._links, forward, backward)
+            else:
+                (backwardFrontier, meetings) = self._expand(backwardFrontier, self.graph.backlinks, self._backlinks, backward, forward)
+
+        if not meetings:
+            return None
+
+        # The meetings were all reached on the same level of the direction just expanded, so the shortest path goes through
+        # the meeting closest to the other end
+        meeting = min(meetings, key=lambda node: forward[node][1] + backward[node][1])
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = forward[node][0]
+        path.reverse()
+        node = backward[meeting][0]
+        while node is not None:
+            path.append(node)
+            node = backward[node][0]
+        return [self.graph.url(node) for node in path]
+
+def race(start, goal, graphFile=GRAPH_FILE, maxWorkers=16):
+    '''
+    Finds a shortest path of links between two Wikipedia articles, reusing (and extending) the link graph saved in graphFile.
+    Raises RaceError if it fetches too many pages without finding a path; the graph crawled so far is still saved.
+
+    Args:
+        start:      The url of the start article.
+        goal:       The url of the goal article.
+        graphFile:  (Optional) The file the link graph is loaded from and saved to. Defaults to GRAPH_FILE.
+        maxWorkers: (Optional) The number of pages to fetch at once. Defaults to 16.
+    Returns:
+        <Array<String>> path:   The urls of the articles on the path, from start to goal. None if there is no path.
+    '''
+    (scheme, netloc, _, _, _) = urlsplit(normalize_urls.normalize_url(start))
+    origin = f'{scheme}://{netloc}'
+    graph = LinkGraph.load(graphFile) if os.path.exists(graphFile) else None
+    if graph is None or graph.origin != origin:
+        graph = LinkGraph(origin)
+
+    try:
+        return WikiRace(graph, maxWorkers=maxWorkers).shortest_path(start, goal)
+    finally:
+        graph.save(graphFile)
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--profile']
+    if len(args) == 2:
+        (start, goal) = args
+    else:
+        (start, goal) = ('https://en.wikipedia.org/wiki/Nobel_Prize', 'https://en.wikipedia.org/wiki/Bundesliga')
+
+    try:
+        with instrumentation.profiling('--profile' in sys.argv):
+            path = race(start, goal)
+    except RaceError as error:
+        sys.exit(f'No path from {start} to {goal}: {error}')
+    if path is None:
+        print(f'No path from {start} to {goal}')
+    else:
+        print(f'Shortest path ({len(path) - 1} clicks):')
+        for url in path:
+            print(url)
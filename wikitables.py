@@ -0,0 +1,196 @@
+# wikitables.py
+
+import re
+import lxml.html
+from lxml import etree
+
+# Tables having a class, rows of a table (directly or in its row groups), and cells of a row. Compiled once, as they run on every table.
+_XPATH_TABLES = etree.XPath("//table[contains(concat(' ', normalize-space(@class), ' '), concat(' ', $name, ' '))]")
+_XPATH_ROWS = etree.XPath("./tr | ./thead/tr | ./tbody/tr | ./tfoot/tr")
+_XPATH_CELLS = etree.XPath("./td | ./th")
+
+# Regex matching the opening and closing tags of tables in raw html
+_REGEX_TABLE_TAG = re.compile(rb"<(/?)table\b[^>]*>", flags=re.IGNORECASE)
+
+# Upper bound on a cell's colspan, so malformed tables cannot blow up the grid
+MAX_COLSPAN = 1000
+
+class Column:
+    '''
+    A column to extract from a table with records(): the column whose header matches one of 'headers', converted with 'convert'.
+
+    Args:
+        name:       The key of the column in the records.
+        headers:    The header texts the column may have (case insensitive).
+        convert:    (Optional) A function from the cell text to the value. May raise ValueError to skip the row. Defaults to None (the text).
+    '''
+    def __init__(self, name, headers, convert=None):
+        self.name = name
+        self.headers = frozenset(header.lower() for header in headers)
+        self.convert = convert
+
+def find_tables(tree, classes='wikitable'):
+    '''
+    Returns the tables of a page that have all the given classes, in document order.
+
+    Args:
+        tree:       The lxml tree of the page (e.g. Document.tree).
+        classes:    (Optional) The space separated classes the tables must have. Defaults to 'wikitable'.
+    Returns:
+        <Array<Element>> tables:    The tables found.
+    '''
+    (first, *rest) = classes.split()
+    return [table for table in _XPATH_TABLES(tree, name=first) if set(rest) <= set(table.get('class', '').split())]
+
+def table_span(content, pattern, start=0):
+    '''
+    Scans raw html for the first table whose opening tag matches pattern, without parsing the page.
+    Nested tables are skipped over, so the span ends at the table's own closing tag (or at the end of the html, if it is not closed).
+
+    Args:
+        content:    The raw html, as bytes.
+        pattern:    A compiled bytes regex searched for in the opening tag, e.g. re.compile(rb'class="wikitable sortable"').
+        start:      (Optional) The offset to scan from. Defaults to 0.
+    Returns:
+        <Tuple<int, int>> (start, end): The byte span of the table, or None if no table matches.
+    '''
+    for match in _REGEX_TABLE_TAG.finditer(content, start):
+        if match.group(1) or not pattern.search(match.group()):
+            continue
+        depth = 0
+        for tag in _REGEX_TABLE_TAG.finditer(content, match.start()):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                return (match.start(), tag.end())
+        return (match.start(), len(content))
+    return None
+
+def parse_table(content, pattern, start=0, encoding='utf-8'):
+    '''
+    Parses only the first table whose opening tag matches pattern (see table_span()), instead of the whole page.
+
+    Args:
+        content:    The raw html, as bytes.
+        pattern:    A compiled bytes regex searched for in the opening tag.
+        start:      (Optional) The offset to scan from. Defaults to 0.
+        encoding:   (Optional) The encoding of content. Defaults to 'utf-8'.
+    Returns:
+        <Element> table:    The lxml table element, or None if no table matches.
+    '''
+    span = table_span(content, pattern, start)
+    if span is None:
+        return None
+    return lxml.html.fragment_fromstring(content[span[0]:span[1]].decode(encoding, errors='replace'))
+
+def cell_text(cell):
+    '''
+    Returns the text of a cell, with each piece of text stripped (as BeautifulSoup's get_text(strip=True)).
+    '''
+    return ''.join(text.strip() for text in cell.itertext())
+
+def table_rows(table):
+    '''
+    Returns the rows of a table (directly in it, or in its thead, tbody and tfoot), without the rows of nested tables.
+    '''
+    return _XPATH_ROWS(table)
+
+def _span(cell, attribute):
+    '''
+    Returns the rowspan or colspan of a cell, as a number of at least 1.
+    '''
+    try:
+        return max(1, int(cell.get(attribute, 1)))
+    except ValueError:
+        return 1
+
+def table_grid(table):
+    '''
+    Expands a table into a grid: one list per row, with the cell in each column of that row.
+    Cells spanning several rows or columns (rowspan/colspan) appear in every position they cover, so columns line up on every row.
+    Positions no cell covers (in ragged rows) are None.
+
+    Args:
+        table:  The lxml table element.
+    Returns:
+        <Array<Array<Element>>> grid:   The cells of each row.
+    '''
+    grid = []
+    # For each column, the cell spanning down into it and the number of rows it still covers
+    spans = []
+    for tr in _XPATH_ROWS(table):
+        row = []
+        for cell in _XPATH_CELLS(tr):
+            # Skip over the columns taken by cells from the rows above
+            while len(row) < len(spans) and spans[len(row)][1] > 0:
+                spans[len(row)][1] -= 1
+                row.append(spans[len(row)][0])
+
+            rowspan = _span(cell, 'rowspan')
+            for _ in range(min(_span(cell, 'colspan'), MAX_COLSPAN)):
+                if len(row) == len(spans):
+                    spans.append(None)
+                spans[len(row)] = [cell, rowspan - 1]
+                row.append(cell)
+
+        # Cells from the rows above may still cover columns after the last cell of this row
+        for column in range(len(row), len(spans)):
+            if spans[column][1] > 0:
+                spans[column][1] -= 1
+                row.append(spans[column][0])
+            else:
+                row.append(None)
+        while row and row[-1] is None:
+            row.pop()
+        grid.append(row)
+    return grid
+
+def records(table, columns):
+    '''
+    Extracts records from a table: one dict per data row, with the (converted) text of each of the columns.
+    Columns are found by their header text in the leading header rows (rows of only th cells), and looked up on the expanded grid
+    (see table_grid()), so a cell spanning several rows gives its value to each of them.
+    Filler rows (with less than two td cells, e.g. notes spanning the table) and rows a column's convert rejects with ValueError are skipped.
+
+    Args:
+        table:      The lxml table element.
+        columns:    The Columns to extract.
+    Returns:
+        <Array<Dict>> records:  The records of the data rows, in table order.
+    '''
+    grid = table_grid(table)
+
+    # Header rows are the leading rows of only th cells. Their texts name each column.
+    headers = []
+    start = 0
+    for row in grid:
+        if not row or any(cell is None or cell.tag != 'th' for cell in row):
+            break
+        for (index, cell) in enumerate(row):
+            if index == len(headers):
+                headers.append(set())
+            headers[index].add(cell_text(cell).lower())
+        start += 1
+
+    indices = []
+    for column in columns:
+        index = next((index for (index, texts) in enumerate(headers) if texts & column.headers), None)
+        if index is None:
+            raise ValueError(f"table has no '{column.name}' column")
+        indices.append(index)
+    width = max(indices, default=-1) + 1
+
+    result = []
+    for row in grid[start:]:
+        if len(row) < width or len({id(cell) for cell in row if cell is not None and cell.tag == 'td'}) < 2:
+            continue
+        try:
+            record = {}
+            for (column, index) in zip(columns, indices):
+                if row[index] is None:
+                    raise ValueError(f"row has no '{column.name}' cell")
+                text = cell_text(row[index])
+                record[column.name] = column.convert(text) if column.convert is not None else text
+        except ValueError:
+            continue
+        result.append(record)
+    return result